@@ -1,98 +1,956 @@
+import argparse
+import datetime
+import hashlib
+import numbers
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
 import mysql.connector
+import numpy as np
 import pandas as pd
 
-# MySQL connection details (update as needed)
-MYSQL_HOST = "localhost"
-MYSQL_USER = "root"
-MYSQL_PASSWORD = "12345678"  # Update with actual MySQL password
-MAIN_DATABASE = "TE_Email_Custom_Database"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from row_cache import mark_reloaded, match_key
+from snapshot import SNAPSHOT_DIR, SnapshotWriter
+from storage import SQLITE_PATH, SQLiteCursor
+from tables import TABLE_LOOKUPS
+
+# MySQL connection details (same environment variables as db_pool)
+MYSQL_HOST = os.environ.get("MYSQL_HOST", "localhost")
+MYSQL_USER = os.environ.get("MYSQL_USER", "root")
+MYSQL_PASSWORD = os.environ.get("MYSQL_PASSWORD", "12345678")
+MAIN_DATABASE = os.environ.get("MYSQL_DATABASE", "TE_Email_Custom_Database")
+
+EXCEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cleaned_Email_dataset.xlsx")
 
 # Maximum value for BIGINT UNSIGNED in MySQL
 MAX_BIGINT_UNSIGNED = 18446744073709551615
 
-# Connect to MySQL server
-conn = mysql.connector.connect(
-    host=MYSQL_HOST,
-    user=MYSQL_USER,
-    password=MYSQL_PASSWORD
-)
-cursor = conn.cursor()
-
-# Delete the database if it exists, then create a new one
-cursor.execute(f"DROP DATABASE IF EXISTS {MAIN_DATABASE}")
-cursor.execute(f"CREATE DATABASE {MAIN_DATABASE}")
-cursor.execute(f"USE {MAIN_DATABASE}")
-
-# Load the Excel file
-excel_file = "Cleaned_Email_dataset.xlsx"
-xls = pd.ExcelFile(excel_file)
-sheet_names = xls.sheet_names
-print("Sheets found:", sheet_names)
-
-# Function to map pandas dtypes to MySQL datatypes
-def map_dtype(dtype, col_name):
-    if col_name == "quote_id":
+# Short text columns with at most this many distinct values (statuses, Yes/No) become ENUMs
+ENUM_MAX_VALUES = 16
+ENUM_MAX_LENGTH = 20
+
+# Hidden column with a hash of the row's values, used by the incremental load
+HASH_COLUMN = "_row_hash"
+# Rows per DELETE / upsert statement in an incremental load
+UPSERT_BATCH = 1000
+# How an incremental load brings a table in line with its sheet (see plan_sync)
+PATCH, REBUILD, REPLACE = "patch", "rebuild", "replace"
+# Rows per INSERT chunk (one commit each), and per CSV file on the LOAD DATA path
+CHUNK_ROWS = int(os.environ.get("LOADER_CHUNK_ROWS", "5000"))
+LOAD_DATA_ROWS = int(os.environ.get("LOADER_LOAD_DATA_ROWS", "100000"))
+
+# Key columns the reply service looks rows up by, per table, from the same
+# tables.TABLE_LOOKUPS as the category specs so the indexes always match the queries
+LOOKUP_KEYS = {table: [lookup.columns for lookup in lookups] for table, lookups in TABLE_LOOKUPS.items()}
+
+
+def table_name_for(sheet):
+    return sheet.strip().replace(" ", "_").lower()
+
+
+def clean_name(name):
+    return name.strip().replace(" ", "_").replace("&", "and").lower()
+
+
+def clean_columns(df):
+    df.columns = [clean_name(str(col)) for col in df.columns]
+    return df
+
+
+def coerce_quote_id(df):
+    """Store numeric quote IDs as integers; QTE-style IDs stay text."""
+    if 'quote_id' not in df.columns:
+        return df
+    numeric = pd.to_numeric(df['quote_id'], errors='coerce')
+    if numeric[df['quote_id'].notna()].isna().any():
+        return df
+    df['quote_id'] = numeric
+    df = df.dropna(subset=['quote_id'])
+    df = df[df['quote_id'] >= 0]
+    df = df[df['quote_id'] <= MAX_BIGINT_UNSIGNED]
+    df['quote_id'] = df['quote_id'].astype('int64')
+    return df
+
+
+def sql_string(value):
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+class ColumnProfile:
+    """Running summary of one column's values: enough to choose its MySQL type without keeping them."""
+
+    def __init__(self, numeric_check=False):
+        self.kinds = set()
+        self.count = 0
+        self.longest = 0
+        self.minimum = self.maximum = None
+        self.midnight = True
+        self.distinct = set()
+        # Only quote_id needs it: numeric text ("5008486211") is stored as a number too
+        self.numeric = numeric_check
+
+    def update(self, value):
+        if value is None:
+            return
+        self.count += 1
+        if isinstance(value, bool):
+            kind = "text"
+        elif isinstance(value, numbers.Integral):
+            kind = "int"
+            self.minimum = value if self.minimum is None else min(self.minimum, value)
+            self.maximum = value if self.maximum is None else max(self.maximum, value)
+        elif isinstance(value, numbers.Real):
+            kind = "float"
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            kind = "datetime"
+            if isinstance(value, datetime.datetime) and value.time() != datetime.time():
+                self.midnight = False
+        else:
+            kind = "text"
+        self.kinds.add(kind)
+
+        text = str(value)
+        self.longest = max(self.longest, len(text))
+        if len(self.distinct) <= ENUM_MAX_VALUES:
+            self.distinct.add(text)
+        if self.numeric and kind == "text":
+            try:
+                float(text)
+            except ValueError:
+                self.numeric = False
+
+
+# Function to map a column to the most compact MySQL datatype for its values
+def map_dtype(profile, col_name, is_key=False):
+    kinds = profile.kinds
+    if col_name == "quote_id" and kinds and profile.numeric:
         return "BIGINT UNSIGNED"
-    if pd.api.types.is_integer_dtype(dtype):
-        return "INT"
-    elif pd.api.types.is_float_dtype(dtype):
+    if kinds == {"int"}:
+        fits_int = profile.minimum >= -2 ** 31 and profile.maximum < 2 ** 31
+        return "INT" if fits_int else "BIGINT"
+    elif not kinds or kinds <= {"int", "float"}:
         return "FLOAT"
-    elif pd.api.types.is_datetime64_any_dtype(dtype):
-        return "DATETIME"
-    else:
-        return "VARCHAR(255)"
+    elif kinds == {"datetime"}:
+        return "DATE" if profile.midnight else "DATETIME"
 
-# Process each sheet in the Excel file
-for sheet in sheet_names:
-    print(f"\nProcessing sheet: {sheet}")
+    if is_key:
+        # IDs have a fixed format (OPP123456, PN-123456, ...)
+        return f"CHAR({max(profile.longest, 1)})" if profile.longest <= 255 else f"VARCHAR({profile.longest})"
+    distinct = sorted(profile.distinct)
+    if len(distinct) <= ENUM_MAX_VALUES and profile.longest <= ENUM_MAX_LENGTH and profile.count >= 2 * len(distinct):
+        return f"ENUM({', '.join(sql_string(value) for value in distinct)})"
+    return "VARCHAR(255)" if profile.longest <= 255 else "TEXT"
+
+
+class SheetProfile:
+    """Column profiles of one sheet, and whether its primary lookup key is unique."""
+
+    def __init__(self, table_name, columns):
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.profiles = [ColumnProfile(numeric_check=col == "quote_id") for col in self.columns]
+        self.lookups = [cols for cols in LOOKUP_KEYS.get(table_name, []) if all(c in self.columns for c in cols)]
+        self._key_positions = [self.columns.index(c) for c in self.lookups[0]] if self.lookups else []
+        # 64-bit hashes of the primary lookup key: 8 bytes per row instead of the keys themselves
+        self._key_hashes = array("q")
+        self._key_missing = False
+        self.rows = 0
+
+    @classmethod
+    def of_frame(cls, table_name, df):
+        profile = cls(table_name, df.columns)
+        for row in df.astype(object).where(pd.notnull(df), None).itertuples(index=False, name=None):
+            profile.update(row)
+        return profile
+
+    def update(self, row):
+        self.rows += 1
+        for profile, value in zip(self.profiles, row):
+            profile.update(value)
+        if self._key_positions:
+            key = tuple(row[i] for i in self._key_positions)
+            if None in key:
+                self._key_missing = True
+            else:
+                self._key_hashes.append(hash(tuple(match_key(key))))
+
+    def column(self, col):
+        return self.profiles[self.columns.index(col)]
+
+    def key_unique(self):
+        hashes = np.frombuffer(self._key_hashes, dtype=np.int64)
+        return not self._key_missing and np.unique(hashes).size == hashes.size
+
+
+def index_name(columns):
+    return "idx_" + "_".join(column.replace("-", "_") for column in columns)
+
+
+def table_keys(profile):
+    """(lookup key column tuples present in the sheet, primary key or None)."""
+    lookups, primary = profile.lookups, None
+    if lookups:
+        if profile.key_unique():
+            primary = lookups[0]
+        else:
+            print(f"  '{profile.table_name}': {list(lookups[0])} is not unique, "
+                  f"indexing it instead of making it the primary key")
+    return lookups, primary
+
+
+def column_types(profile, lookups):
+    key_columns = {column for columns in lookups for column in columns}
+    return ([(col, map_dtype(column, col, col in key_columns)) for col, column in zip(profile.columns, profile.profiles)]
+            + [(HASH_COLUMN, "CHAR(32)")])
+
+
+def table_definition(table_name, profile, keys=None):
+    """CREATE TABLE with compact column types, the lookup key as primary key and the fallback keys indexed."""
+    lookups, primary = keys or table_keys(profile)
+    definitions = []
+    for col, col_type in column_types(profile, lookups):
+        definition = f"`{col}` {col_type}"
+        if (primary and col in primary) or col == HASH_COLUMN:
+            definition += " NOT NULL"
+        definitions.append(definition)
+    if primary:
+        definitions.append(f"PRIMARY KEY ({', '.join(f'`{c}`' for c in primary)})")
+    for columns in lookups:
+        if columns != primary:
+            definitions.append(f"INDEX `{index_name(columns)}` ({', '.join(f'`{c}`' for c in columns)})")
+    return f"CREATE TABLE `{table_name}` ({', '.join(definitions)})"
+
+
+def sqlite_type(col_type):
+    # SQLite has type affinities only; text compares case-insensitively like MySQL's default collation
+    if col_type in ("INT", "BIGINT", "BIGINT UNSIGNED"):
+        return "INTEGER"
+    if col_type == "FLOAT":
+        return "REAL"
+    if col_type in ("DATE", "DATETIME"):
+        return "TEXT"
+    return "TEXT COLLATE NOCASE"
+
+
+def sqlite_definition(table_name, profile, keys=None):
+    """table_definition for the SQLite backend: CREATE TABLE, then one CREATE INDEX per fallback key."""
+    lookups, primary = keys or table_keys(profile)
+    definitions = []
+    for col, col_type in column_types(profile, lookups):
+        definition = f"`{col}` {sqlite_type(col_type)}"
+        if (primary and col in primary) or col == HASH_COLUMN:
+            definition += " NOT NULL"
+        definitions.append(definition)
+    if primary:
+        definitions.append(f"PRIMARY KEY ({', '.join(f'`{c}`' for c in primary)})")
+    # Index names are per database in SQLite, not per table
+    return [f"CREATE TABLE `{table_name}` ({', '.join(definitions)})"] + [
+        f"CREATE INDEX `{table_name}__{index_name(columns)}` ON `{table_name}` "
+        f"({', '.join(f'`{c}`' for c in columns)})"
+        for columns in lookups if columns != primary]
+
+
+def rows_with_text_dates(profile, data_tuples):
+    """Rows with dates as text, formatted the way str() shows the values MySQL returns (SQLite, snapshots)."""
+    types = column_types(profile, profile.lookups)
+    dates = [i for i, (_, col_type) in enumerate(types) if col_type == "DATE"]
+    datetimes = [i for i, (_, col_type) in enumerate(types) if col_type == "DATETIME"]
+    for row in data_tuples:
+        if dates or datetimes:
+            row = list(row)
+            for i in dates:
+                if row[i] is not None:
+                    row[i] = str(row[i].date())
+            for i in datetimes:
+                if row[i] is not None:
+                    row[i] = str(row[i])
+            row = tuple(row)
+        yield row
+
+
+def read_sheet(excel_file, sheet):
     df = pd.read_excel(excel_file, sheet_name=sheet)
-    
-    # Clean column names
-    df.columns = (
-        df.columns.str.strip()
-                  .str.replace(" ", "_")
-                  .str.replace("&", "and")
-                  .str.lower()
-    )
-    
-    # Process 'quote_id' column if it exists
-    if 'quote_id' in df.columns:
-        df['quote_id'] = pd.to_numeric(df['quote_id'], errors='coerce')
-        df = df.dropna(subset=['quote_id'])
-        df = df[df['quote_id'] >= 0]
-        df = df[df['quote_id'] <= MAX_BIGINT_UNSIGNED]
-        df['quote_id'] = df['quote_id'].astype('int64')
-    
-    # Generate table name
-    table_name = sheet.strip().replace(" ", "_").lower()
-    
-    # Create table schema
-    columns_def = [f"`{col}` {map_dtype(df[col].dtype, col)}" for col in df.columns]
-    create_table_query = f"CREATE TABLE `{table_name}` ({', '.join(columns_def)})"
-    cursor.execute(create_table_query)
-    
-    # Prepare data for insertion
+    return coerce_quote_id(clean_columns(df))
+
+
+def row_hash(row):
+    """Fingerprint of a row's values, stored in HASH_COLUMN to detect updates on the next load."""
+    text = "\x1f".join("\x00" if value is None else str(value) for value in row)
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def prepare_rows(df):
+    """Column names and row tuples ready for INSERT, each row ending with its hash."""
     df = df.where(pd.notnull(df), None)
-    placeholders = ", ".join(["%s"] * len(df.columns))
-    columns_str = ", ".join([f"`{col}`" for col in df.columns])
-    insert_query = f"INSERT INTO `{table_name}` ({columns_str}) VALUES ({placeholders})"
     data_tuples = [tuple(x) for x in df.to_numpy()]
-    
-    # Insert data with batch handling
+    return list(df.columns) + [HASH_COLUMN], [row + (row_hash(row),) for row in data_tuples]
+
+
+# -------------------------- Streaming read --------------------------
+def sheet_header(header):
+    """Clean column names for a header row, suffixing duplicates like pandas ("quote_id.1")."""
+    seen = {}
+    names = []
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(clean_name(name))
+    return names
+
+
+def iter_sheet(excel_file, sheet):
+    """Yield the cleaned header, then every non-empty row, from a read-only (streaming) workbook."""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        columns = sheet_header(next(rows, ()))
+        yield columns
+        width = len(columns)
+        for row in rows:
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if any(value is not None for value in row):
+                yield row
+    finally:
+        workbook.close()
+
+
+def profile_sheet(excel_file, sheet, table_name):
+    """First streaming pass: column types and key uniqueness."""
+    rows = iter_sheet(excel_file, sheet)
+    profile = SheetProfile(table_name, next(rows))
+    for row in rows:
+        profile.update(row)
+    return profile
+
+
+def stream_rows(excel_file, sheet, profile):
+    """Second streaming pass: rows ready for INSERT (quote IDs coerced, hash appended)."""
+    rows = iter_sheet(excel_file, sheet)
+    next(rows)
+    quote = profile.columns.index("quote_id") if "quote_id" in profile.columns else None
+    coerce = quote is not None and profile.column("quote_id").numeric
+    for row in rows:
+        if coerce:
+            value = row[quote]
+            if value is None:
+                continue
+            value = value if isinstance(value, int) else int(float(value))
+            if not 0 <= value <= MAX_BIGINT_UNSIGNED:
+                continue
+            row = row[:quote] + (value,) + row[quote + 1:]
+        yield row + (row_hash(row),)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def insert_rows(conn, cursor, table_name, columns, data_tuples, chunk_rows=CHUNK_ROWS):
+    """Insert ``data_tuples`` (any iterable) ``chunk_rows`` at a time, one commit per chunk.
+
+    A chunk that fails is rolled back and retried row by row, so a bad row
+    costs only its own chunk. Returns ``(inserted, failed)`` row counts.
+    """
+    placeholders = ", ".join(["%s"] * len(columns))
+    columns_str = ", ".join([f"`{col}`" for col in columns])
+    insert_query = f"INSERT INTO `{table_name}` ({columns_str}) VALUES ({placeholders})"
+
+    inserted = failed = 0
+    for chunk in chunked(data_tuples, chunk_rows):
+        try:
+            cursor.executemany(insert_query, chunk)
+            conn.commit()
+            inserted += len(chunk)
+        except Exception as e:
+            conn.rollback()
+            print(f"Error inserting rows {inserted + failed}-{inserted + failed + len(chunk) - 1} "
+                  f"into '{table_name}': {e}")
+            for i, row in enumerate(chunk, inserted + failed):
+                try:
+                    cursor.execute(insert_query, row)
+                    inserted += 1
+                except Exception as inner_e:
+                    failed += 1
+                    print(f"Error inserting row {i}: {row} -> {inner_e}")
+            conn.commit()
+    return inserted, failed
+
+
+def csv_field(value):
+    # Matches the LOAD DATA options below: unquoted NULL is NULL, no escape character
+    if value is None:
+        return "NULL"
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        value = value.isoformat(" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def load_data_rows(conn, cursor, table_name, columns, data_tuples, chunk_rows=LOAD_DATA_ROWS):
+    """Bulk path: each chunk goes through a temporary CSV and LOAD DATA LOCAL INFILE.
+
+    Needs ``local_infile=ON`` on the server. A chunk LOAD DATA rejects falls
+    back to chunked INSERTs. Returns ``(inserted, failed)`` row counts.
+    """
+    columns_str = ", ".join([f"`{col}`" for col in columns])
+    inserted = failed = 0
+    for chunk in chunked(data_tuples, chunk_rows):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", newline="", delete=False) as f:
+            for row in chunk:
+                f.write(",".join(csv_field(value) for value in row) + "\n")
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table_name}` CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '\\n' ({columns_str})", (f.name,))
+            conn.commit()
+            inserted += len(chunk)
+        except mysql.connector.Error as e:
+            conn.rollback()
+            print(f"LOAD DATA failed for a chunk of '{table_name}' ({e}), inserting it instead")
+            chunk_inserted, chunk_failed = insert_rows(conn, cursor, table_name, columns, chunk)
+            inserted += chunk_inserted
+            failed += chunk_failed
+        finally:
+            os.remove(f.name)
+    return inserted, failed
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def sheet_rows(excel_file, sheet, stream=False):
+    """(table name, profile, columns, rows) of a sheet, read with openpyxl when ``stream`` or else pandas."""
+    table_name = table_name_for(sheet)
+    if stream:
+        profile = profile_sheet(excel_file, sheet, table_name)
+        return table_name, profile, profile.columns + [HASH_COLUMN], stream_rows(excel_file, sheet, profile)
+    df = read_sheet(excel_file, sheet)
+    columns, data_tuples = prepare_rows(df)
+    return table_name, SheetProfile.of_frame(table_name, df), columns, data_tuples
+
+
+def load_sheet(conn, cursor, excel_file, sheet, stream=False, load_data=False, sqlite=False):
+    """Create and fill the table for one sheet; returns the table name.
+
+    ``stream`` reads the sheet twice with openpyxl in read-only mode (types
+    first, then rows) instead of loading it into pandas, so memory stays flat
+    however long the sheet is. ``load_data`` sends rows with LOAD DATA.
+    ``sqlite`` creates the table in a SQLite file (``conn`` and ``cursor``
+    from ``load_sqlite``) instead.
+    """
+    print(f"\nProcessing sheet: {sheet}")
+    start = time.perf_counter()
+    table_name, profile, columns, data_tuples = sheet_rows(excel_file, sheet, stream)
+
+    # Create table schema
+    if sqlite:
+        statements, data_tuples = sqlite_definition(table_name, profile), rows_with_text_dates(profile, data_tuples)
+    else:
+        statements = [table_definition(table_name, profile)]
+    for statement in statements:
+        print(statement)
+        cursor.execute(statement)
+
+    load = load_data_rows if load_data else insert_rows
+    inserted, failed = load(conn, cursor, table_name, columns, data_tuples)
+    elapsed = time.perf_counter() - start
+    print(f"Data inserted into '{table_name}': {inserted} rows in {elapsed:.1f}s "
+          f"({inserted / elapsed:.0f} rows/s), {failed} failed, peak RSS {peak_rss_mb():.0f} MB")
+    return table_name
+
+
+# -------------------------- Incremental load --------------------------
+def normalize_type(col_type):
+    # information_schema reports e.g. "enum('No','Yes')" for "ENUM('No', 'Yes')"
+    name, paren, rest = col_type.partition("(")
+    return name.lower() + paren + rest.replace("', '", "','")
+
+
+def current_schema(cursor, table_name):
+    """([(column, type)], primary key columns) of the live table, or None if it does not exist."""
+    cursor.execute(
+        "SELECT COLUMN_NAME, COLUMN_TYPE, COLUMN_KEY FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (table_name,))
+    rows = [tuple(value.decode() if isinstance(value, bytes) else value for value in row)
+            for row in cursor.fetchall()]
+    if not rows:
+        return None
+    return [(name, normalize_type(col_type)) for name, col_type, _ in rows], \
+        tuple(name for name, _, key in rows if key == "PRI")
+
+
+def diff_rows(cursor, table_name, columns, data_tuples, primary, key_columns):
+    """Inserted, updated and deleted primary keys against the live table, and the change set for caches."""
+    positions = [columns.index(col) for col in primary]
+    key_positions = {col: columns.index(col) for col in key_columns}
+    new = {match_key(row[i] for i in positions): row for row in data_tuples}
+
+    select = ", ".join(f"`{col}`" for col in list(primary) + sorted(key_columns) + [HASH_COLUMN])
+    cursor.execute(f"SELECT {select} FROM `{table_name}`")
+    old = {}
+    for row in cursor.fetchall():
+        pk = tuple(row[:len(primary)])
+        old[match_key(pk)] = (pk, dict(zip(sorted(key_columns), row[len(primary):-1])), row[-1])
+
+    inserted = [key for key in new if key not in old]
+    deleted = [key for key in old if key not in new]
+    updated = [key for key in new if key in old and old[key][2] != new[key][-1]]
+
+    # Every key a cached lookup could have used, before and after the change
+    changes = {col: set() for col in key_columns}
+    for key in inserted + updated:
+        for col, i in key_positions.items():
+            changes[col].add(new[key][i])
+    for key in updated + deleted:
+        for col, value in old[key][1].items():
+            changes[col].add(value)
+    changes = {col: sorted(str(value) for value in values if value is not None) for col, values in changes.items()}
+    return ([new[key] for key in inserted], [new[key] for key in updated], [old[key][0] for key in deleted]), changes
+
+
+def apply_changes(conn, cursor, table_name, columns, primary, inserted, updated, deleted):
+    """Apply the diff in one transaction (readers never see half of it), UPSERT_BATCH rows per statement."""
+    pk_list = ", ".join(f"`{col}`" for col in primary)
+    pk_placeholder = "(" + ", ".join(["%s"] * len(primary)) + ")"
+    upsert_query = (f"INSERT INTO `{table_name}` ({', '.join(f'`{col}`' for col in columns)}) "
+                    f"VALUES ({', '.join(['%s'] * len(columns))}) ON DUPLICATE KEY UPDATE "
+                    + ", ".join(f"`{col}` = VALUES(`{col}`)" for col in columns if col not in primary))
+    upserts = inserted + updated
     try:
-        cursor.executemany(insert_query, data_tuples)
+        for start in range(0, len(deleted), UPSERT_BATCH):
+            chunk = deleted[start:start + UPSERT_BATCH]
+            cursor.execute(f"DELETE FROM `{table_name}` WHERE ({pk_list}) IN ({', '.join([pk_placeholder] * len(chunk))})",
+                           [value for key in chunk for value in key])
+        for start in range(0, len(upserts), UPSERT_BATCH):
+            cursor.executemany(upsert_query, upserts[start:start + UPSERT_BATCH])
         conn.commit()
-        print(f"Data inserted into '{table_name}' successfully.")
-    except Exception as e:
-        print(f"Error inserting into '{table_name}': {e}")
-        for i, row in enumerate(data_tuples):
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def create_shadow(cursor, table_name, profile, keys):
+    """Create the empty shadow table a table is rebuilt in, dropping any left over by a failed sync."""
+    shadow, retired = f"{table_name}__shadow", f"{table_name}__old"
+    cursor.execute(f"DROP TABLE IF EXISTS `{shadow}`, `{retired}`")
+    cursor.execute(table_definition(shadow, profile, keys))
+
+
+def swap_shadow(cursor, table_name, exists=True):
+    """Swap the filled shadow table in for the live one with one atomic RENAME."""
+    shadow, retired = f"{table_name}__shadow", f"{table_name}__old"
+    if exists:
+        cursor.execute(f"RENAME TABLE `{table_name}` TO `{retired}`, `{shadow}` TO `{table_name}`")
+        cursor.execute(f"DROP TABLE `{retired}`")
+    else:
+        cursor.execute(f"RENAME TABLE `{shadow}` TO `{table_name}`")
+
+
+def plan_sync(cursor, table_name, profile):
+    """How a table is brought in line with its sheet: ``(keys, exists, mode)``.
+
+    ``PATCH`` applies the row diff in place; ``REBUILD`` diffs the rows for
+    the change set, then rebuilds the table in a shadow table because its
+    column types changed; ``REPLACE`` rebuilds it without a usable diff (a
+    new table, or no primary key or row hash to diff by).
+    """
+    keys = table_keys(profile)
+    lookups, primary = keys
+    schema = current_schema(cursor, table_name)
+    expected = ([(col, normalize_type(col_type)) for col, col_type in column_types(profile, lookups)],
+                tuple(primary or ()))
+    if primary and schema is not None and HASH_COLUMN in dict(schema[0]) and schema[1] == expected[1]:
+        mode = PATCH if schema == expected else REBUILD
+    else:
+        mode = REPLACE
+    return keys, schema is not None, mode
+
+
+def sync_rows(conn, cursor, table_name, columns, data_tuples, reread, plan):
+    """Patch a table, or fill its shadow table (``create_shadow``), as ``plan_sync`` planned.
+
+    Returns the change set: each lookup key column mapped to the values of
+    rows inserted, updated or deleted, or None when the table was replaced
+    without a usable diff. Streamed rows can be read once, so a second pass
+    over the sheet reads ``reread()``.
+    """
+    (lookups, primary), exists, mode = plan
+    key_columns = {column for columns in lookups for column in columns}
+    changes = None
+    if mode != REPLACE:
+        (inserted, updated, deleted), changes = diff_rows(cursor, table_name, columns, data_tuples, primary,
+                                                          key_columns)
+        print(f"'{table_name}': {len(inserted)} inserted, {len(updated)} updated, {len(deleted)} deleted")
+        if mode == PATCH:
+            apply_changes(conn, cursor, table_name, columns, primary, inserted, updated, deleted)
+            return changes
+        print(f"'{table_name}': column types changed, rebuilding it in a shadow table")
+        data_tuples = reread()
+    elif not exists:
+        # New table: every key is new, including any cached as not found
+        positions = {col: columns.index(col) for col in key_columns}
+        found = {col: set() for col in key_columns}
+        for row in data_tuples:
+            for col, i in positions.items():
+                if row[i] is not None:
+                    found[col].add(str(row[i]))
+        changes = {col: sorted(values) for col, values in found.items()}
+        data_tuples = reread()
+    insert_rows(conn, cursor, f"{table_name}__shadow", columns, data_tuples)
+    return changes
+
+
+def sync_sheet(conn, cursor, excel_file, sheet, stream=False):
+    """Bring one table in line with its sheet without dropping it.
+
+    Returns ``(table name, change set)`` (see ``sync_rows``). ``stream``
+    reads the sheet with openpyxl as ``load_sheet`` does.
+    """
+    print(f"\nSyncing sheet: {sheet}")
+    table_name, profile, columns, data_tuples = sheet_rows(excel_file, sheet, stream)
+    plan = plan_sync(cursor, table_name, profile)
+    keys, exists, mode = plan
+    if mode != PATCH:
+        create_shadow(cursor, table_name, profile, keys)
+    reread = partial(stream_rows, excel_file, sheet, profile) if stream else lambda: data_tuples
+    changes = sync_rows(conn, cursor, table_name, columns, data_tuples, reread, plan)
+    if mode != PATCH:
+        swap_shadow(cursor, table_name, exists)
+    return table_name, changes
+
+
+# -------------------------- Parallel load --------------------------
+def connect(database=None, load_data=False):
+    config = dict(host=MYSQL_HOST, user=MYSQL_USER, password=MYSQL_PASSWORD, allow_local_infile=load_data)
+    if database:
+        config["database"] = database
+    return mysql.connector.connect(**config)
+
+
+def plan_sheet(excel_file, sheet, stream=False):
+    """Worker task: profile a sheet so the parent can create its table."""
+    table_name = table_name_for(sheet)
+    if stream:
+        return table_name, profile_sheet(excel_file, sheet, table_name)
+    return table_name, SheetProfile.of_frame(table_name, read_sheet(excel_file, sheet))
+
+
+def fill_sheet(excel_file, sheet, table_name, profile, database, stream=False, load_data=False):
+    """Worker task: fill an already created table over the worker's own connection."""
+    start = time.perf_counter()
+    conn = connect(database, load_data)
+    cursor = conn.cursor()
+    try:
+        if stream:
+            columns, data_tuples = profile.columns + [HASH_COLUMN], stream_rows(excel_file, sheet, profile)
+        else:
+            columns, data_tuples = prepare_rows(read_sheet(excel_file, sheet))
+        load = load_data_rows if load_data else insert_rows
+        inserted, failed = load(conn, cursor, table_name, columns, data_tuples)
+    finally:
+        cursor.close()
+        conn.close()
+    return {"inserted": inserted, "failed": failed, "seconds": time.perf_counter() - start, "rss_mb": peak_rss_mb()}
+
+
+def plan_sync_task(excel_file, sheet, database, stream=False):
+    """Worker task: profile a sheet and plan its table's sync (``plan_sync``) for the parent."""
+    table_name, profile = plan_sheet(excel_file, sheet, stream)
+    conn = connect(database)
+    cursor = conn.cursor()
+    try:
+        plan = plan_sync(cursor, table_name, profile)
+    finally:
+        cursor.close()
+        conn.close()
+    profile._key_hashes = array("q")  # only needed for the keys; don't ship it back
+    return table_name, profile, plan
+
+
+def sync_rows_task(excel_file, sheet, table_name, profile, plan, database, stream=False):
+    """Worker task: diff and patch a table, or fill its shadow table, over the worker's own connection."""
+    start = time.perf_counter()
+    conn = connect(database)
+    cursor = conn.cursor()
+    try:
+        if stream:
+            columns, data_tuples = profile.columns + [HASH_COLUMN], stream_rows(excel_file, sheet, profile)
+            reread = partial(stream_rows, excel_file, sheet, profile)
+        else:
+            columns, data_tuples = prepare_rows(read_sheet(excel_file, sheet))
+            reread = lambda: data_tuples
+        changes = sync_rows(conn, cursor, table_name, columns, data_tuples, reread, plan)
+    finally:
+        cursor.close()
+        conn.close()
+    return changes, time.perf_counter() - start
+
+
+def load_parallel(cursor, excel_file, sheet_names, database, workers, stream=False, load_data=False):
+    """Load every sheet with a pool of ``workers`` processes, one connection each.
+
+    Sheets are profiled in parallel, then their tables are created here in
+    workbook order, then filled in parallel, longest sheet first so it
+    bounds the total time. A sheet that fails is reported and the others
+    carry on. Returns the tables that loaded.
+    """
+    total = len(sheet_names)
+    start = time.perf_counter()
+    report = {sheet: {"table": table_name_for(sheet)} for sheet in sheet_names}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        plans = {sheet: pool.submit(plan_sheet, excel_file, sheet, stream) for sheet in sheet_names}
+        profiles = {}
+        for sheet in sheet_names:
+            try:
+                table_name, profile = plans[sheet].result()
+                cursor.execute(table_definition(table_name, profile))
+                profiles[sheet] = profile
+                print(f"Created '{table_name}' ({profile.rows} rows to load)")
+            except Exception as e:
+                report[sheet]["error"] = f"create: {e}"
+                print(f"Error creating the table for '{sheet}': {e}")
+
+        fills = {}
+        for sheet in sorted(profiles, key=lambda name: -profiles[name].rows):
+            profile = profiles[sheet]
+            profile._key_hashes = array("q")  # only needed for the DDL; don't ship it to the worker
+            fills[pool.submit(fill_sheet, excel_file, sheet, report[sheet]["table"], profile, database,
+                              stream, load_data)] = sheet
+        for done, future in enumerate(as_completed(fills), total - len(fills) + 1):
+            sheet = fills[future]
             try:
-                cursor.execute(insert_query, row)
-            except Exception as inner_e:
-                print(f"Error inserting row {i}: {row} -> {inner_e}")
+                report[sheet].update(future.result())
+                result = report[sheet]
+                print(f"[{done}/{total}] '{result['table']}': {result['inserted']} rows in {result['seconds']:.1f}s, "
+                      f"{result['failed']} failed")
+            except Exception as e:
+                report[sheet]["error"] = f"fill: {e}"
+                print(f"[{done}/{total}] '{report[sheet]['table']}' failed: {e}")
+
+    print(f"\n{'table':<36} {'rows':>9} {'failed':>7} {'seconds':>8} {'worker RSS MB':>14}")
+    for sheet in sheet_names:
+        result = report[sheet]
+        if "error" in result:
+            print(f"{result['table']:<36} ERROR {result['error']}")
+        else:
+            print(f"{result['table']:<36} {result['inserted']:>9} {result['failed']:>7} "
+                  f"{result['seconds']:>8.1f} {result['rss_mb']:>14.0f}")
+    slowest = max((result.get("seconds", 0) for result in report.values()), default=0)
+    print(f"{total} sheets in {time.perf_counter() - start:.1f}s with {workers} workers "
+          f"(slowest sheet {slowest:.1f}s)")
+    return [report[sheet]["table"] for sheet in sheet_names if "error" not in report[sheet]]
+
+
+def sync_parallel(cursor, excel_file, sheet_names, database, workers, stream=False):
+    """Incremental sync of every sheet with a pool of ``workers`` processes; returns {table: change set}.
+
+    As in ``load_parallel``, the DDL runs here and the workers only read:
+    sheets are profiled and planned in parallel, shadow tables for the
+    tables to rebuild are created here in workbook order, the workers diff
+    and patch their tables or fill the shadows, longest sheet first, and
+    the shadows are swapped in here in workbook order once filled. A sheet
+    that fails is reported and the others carry on.
+    """
+    total = len(sheet_names)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {sheet: pool.submit(plan_sync_task, excel_file, sheet, database, stream) for sheet in sheet_names}
+        plans = {}
+        for sheet in sheet_names:
+            try:
+                table_name, profile, plan = futures[sheet].result()
+                keys, exists, mode = plan
+                if mode != PATCH:
+                    create_shadow(cursor, table_name, profile, keys)
+                plans[sheet] = table_name, profile, plan
+            except Exception as e:
+                print(f"Error planning the sync of '{sheet}': {e}")
+
+        syncs = {pool.submit(sync_rows_task, excel_file, sheet, *plans[sheet], database, stream): sheet
+                 for sheet in sorted(plans, key=lambda name: -plans[name][1].rows)}
+        synced = {}
+        for done, future in enumerate(as_completed(syncs), total - len(syncs) + 1):
+            sheet = syncs[future]
+            try:
+                synced[sheet], seconds = future.result()
+                print(f"[{done}/{total}] '{plans[sheet][0]}' synced in {seconds:.1f}s")
+            except Exception as e:
+                print(f"[{done}/{total}] '{plans[sheet][0]}' failed: {e}")
+
+    changes = {}
+    for sheet in sheet_names:
+        if sheet in synced:
+            table_name, _, (keys, exists, mode) = plans[sheet]
+            if mode != PATCH:
+                swap_shadow(cursor, table_name, exists)
+            changes[table_name] = synced[sheet]
+    return changes
+
+
+# -------------------------- SQLite backend --------------------------
+def load_sqlite(excel_file=EXCEL_FILE, path=SQLITE_PATH, stream=False):
+    """Write every sheet to a new SQLite file for the embedded backend and swap it in atomically.
+
+    The file is built next to ``path`` and renamed over it, so services
+    reading the old file keep a consistent copy until they reopen it.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    # A half-written file is simply thrown away, so skip the journal and fsyncs
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    cursor = SQLiteCursor(conn)
+    try:
+        sheet_names = sheet_names_of(excel_file, stream)
+        print("Sheets found:", sheet_names)
+        loaded_tables = [load_sheet(conn, cursor, excel_file, sheet, stream, sqlite=True) for sheet in sheet_names]
+        cursor.close()
         conn.commit()
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, path)
+
+    mark_reloaded(loaded_tables)
+    print(f"Data upload complete: {path}. Peak RSS {peak_rss_mb():.0f} MB.")
+    return {}
+
+
+# -------------------------- Snapshot export --------------------------
+# Snapshot column kinds per MySQL type; dates and everything else are stored as text
+SNAPSHOT_KINDS = {"INT": "int", "BIGINT": "int", "BIGINT UNSIGNED": "uint", "FLOAT": "float"}
+
+
+def export_snapshot(excel_file=EXCEL_FILE, root=SNAPSHOT_DIR, stream=False):
+    """Export every sheet as a new columnar snapshot version and make it current."""
+    writer = SnapshotWriter(root)
+    sheet_names = sheet_names_of(excel_file, stream)
+    print("Sheets found:", sheet_names)
+    for sheet in sheet_names:
+        start = time.perf_counter()
+        table_name, profile, columns, data_tuples = sheet_rows(excel_file, sheet, stream)
+        kinds = [SNAPSHOT_KINDS.get(col_type, "text") for _, col_type in column_types(profile, profile.lookups)]
+        written, failed = writer.add_table(table_name, columns, kinds, rows_with_text_dates(profile, data_tuples),
+                                           profile.lookups)
+        print(f"Exported '{table_name}': {written} rows in {time.perf_counter() - start:.1f}s, {failed} failed")
+    writer.publish()
+
+    mark_reloaded(writer.tables)
+    print(f"Snapshot {writer.version} published in {writer.root}. Peak RSS {peak_rss_mb():.0f} MB.")
+    return {}
+
+
+def sheet_names_of(excel_file, stream=False):
+    if stream:
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(excel_file, read_only=True)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+    return pd.ExcelFile(excel_file).sheet_names
+
+
+def main(excel_file=EXCEL_FILE, incremental=False, stream=False, load_data=False, database=MAIN_DATABASE,
+         workers=1, backend="mysql", sqlite_path=SQLITE_PATH, snapshot_dir=SNAPSHOT_DIR):
+    if backend == "sqlite":
+        return load_sqlite(excel_file, sqlite_path, stream)
+    if backend == "snapshot":
+        return export_snapshot(excel_file, snapshot_dir, stream)
+
+    # Connect to MySQL server
+    conn = connect(load_data=load_data)
+    cursor = conn.cursor()
+
+    if incremental:
+        # Keep the database (and the reply service) up; tables are diffed and patched
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+    else:
+        # Delete the database if it exists, then create a new one
+        cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+        cursor.execute(f"CREATE DATABASE {database}")
+    cursor.execute(f"USE {database}")
+
+    # Load the Excel file
+    sheet_names = sheet_names_of(excel_file, stream)
+    print("Sheets found:", sheet_names)
+
+    changes = {}
+    if incremental:
+        if workers > 1:
+            changes = sync_parallel(cursor, excel_file, sheet_names, database, workers, stream)
+        else:
+            for sheet in sheet_names:
+                table_name, table_changes = sync_sheet(conn, cursor, excel_file, sheet, stream)
+                changes[table_name] = table_changes
+        loaded_tables = list(changes)
+        changes = {table: keys for table, keys in changes.items() if keys is not None}
+    elif workers > 1:
+        loaded_tables = load_parallel(cursor, excel_file, sheet_names, database, workers, stream, load_data)
+    else:
+        loaded_tables = [load_sheet(conn, cursor, excel_file, sheet, stream, load_data) for sheet in sheet_names]
+
+    # Cleanup
+    cursor.close()
+    conn.close()
+
+    # Running email services drop their cached rows for these tables (or just the changed keys)
+    mark_reloaded(loaded_tables, changes=changes)
+    print(f"Data upload complete. Peak RSS {peak_rss_mb():.0f} MB.")
+    return changes
+
 
-# Cleanup
-cursor.close()
-conn.close()
-print("Data upload complete.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the support workbook into MySQL, SQLite or a snapshot.")
+    parser.add_argument("excel_file", nargs="?", default=EXCEL_FILE)
+    parser.add_argument("--incremental", action="store_true",
+                        help="diff each sheet against its live table instead of dropping the database")
+    parser.add_argument("--stream", action="store_true",
+                        help="read sheets row by row with openpyxl instead of pandas")
+    parser.add_argument("--load-data", action="store_true",
+                        help="send rows with LOAD DATA LOCAL INFILE (server needs local_infile=ON)")
+    parser.add_argument("--database", default=MAIN_DATABASE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="load sheets in this many worker processes, one connection each")
+    parser.add_argument("--backend", choices=("mysql", "sqlite", "snapshot"), default="mysql",
+                        help="storage backend to populate (STORAGE_BACKEND of the reply service), or a "
+                             "memory-mapped snapshot (SNAPSHOT_DIR)")
+    parser.add_argument("--sqlite-path", default=os.environ.get("SQLITE_PATH", SQLITE_PATH))
+    parser.add_argument("--snapshot-dir", default=os.environ.get("SNAPSHOT_DIR") or SNAPSHOT_DIR)
+    args = parser.parse_args()
+    if args.backend != "mysql" and (args.incremental or args.load_data or args.workers > 1):
+        parser.error("--incremental, --load-data and --workers apply to the mysql backend only")
+    main(args.excel_file, args.incremental, args.stream, args.load_data, args.database, args.workers,
+         args.backend, args.sqlite_path, args.snapshot_dir)
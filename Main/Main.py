@@ -1,10 +1,7 @@
-from typing import Literal
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.pydantic_v1 import BaseModel, Field
-from langchain_groq import ChatGroq
-from langgraph.graph import END, StateGraph, START
 import os
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
@@ -26,122 +23,52 @@ from helper_functions import (
     process_loa_related_queries,
     process_sd_claim_rejection_query,
     process_agreement_pn_query,
-    process_te_com_issues_query
+    process_te_com_issues_query,
+    LOOKUP_ENGINES,
+    process_lookup_batch
 )
-
-# Get API key from environment
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY is not set")
-
-# Initialize the LLM
-llm = ChatGroq(groq_api_key=GROQ_API_KEY, model_name="llama-3.3-70b-versatile")
-
-class RouteQuery(BaseModel):
-    """Route a user query to the correct processing logic."""
-    category: Literal[
-        "pos_replace",
-        "general_pricing_queries",
-        "piggyback_creation",
-        "adding_parts_to_piggyback",
-        "ship_and_debit_queries",
-        "opportunities_rejected_sfdc",
-        "pending_approval_sfdc",
-        "quote_closed_gpms_no_document",
-        "quote_not_reaching_pricing",
-        "customer_data_enquiries",
-        "quotes_pending_review_gpms",
-        "opportunities_pending_review_sfdc",
-        "opportunity_rejected_incorrectly_sfdc",
-        "loa_related_queries",
-        "s_and_d_claim_rejection",
-        "agreement_pn_addition_removal",
-        "te_com_issues",
-        "product_enquiry",
-        "feedback",
-        "complaint",
-        "fallback"
-    ] = Field(..., description="Classify the user query into one of 21 specific routes.")
-
-# Define routing prompt template
-router_prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are a routing assistant for TE Connectivity's support team.
-Your task is to analyze customer queries and classify them into the correct category.
-Available categories:
-1. pos_replace - Issues regarding POS replacement on quotes.
-2. general_pricing_queries - Queries about price adjustments, volume discounts, validity, extensions, etc.
-3. piggyback_creation - Requests to create a piggyback linked to an OEM agreement.
-4. adding_parts_to_piggyback - Requests to add parts or POS customers to an existing piggyback.
-5. ship_and_debit_queries - Queries about Ship & Debit, FSA to S&D conversion, or POS/END customer addresses.
-6. opportunities_rejected_sfdc - Queries about opportunities rejected in Salesforce.
-7. pending_approval_sfdc - Requests for approval of opportunities pending in Salesforce.
-8. quote_closed_gpms_no_document - Cases where quote is closed in GPMS but customer can't get the document.
-9. quote_not_reaching_pricing - Cases where a quote was raised but hasn't reached pricing.
-10. customer_data_enquiries - Requests for customer data.
-11. quotes_pending_review_gpms - Enquiries about quotes pending review in GPMS.
-12. opportunities_pending_review_sfdc - Enquiries about opportunities pending review in Salesforce.
-13. opportunity_rejected_incorrectly_sfdc - Cases where opportunities were incorrectly rejected in SFDC.
-14. loa_related_queries - Letters of Authorization (LOA) related queries.
-15. s_and_d_claim_rejection - Enquiries about Ship & Debit claim rejections.
-16. agreement_pn_addition_removal - Agreement-related part number addition or removal.
-17. te_com_issues - Issues with TE.com where customers can't raise SPRs or have issues with specific PNs.
-18. product_enquiry - General questions about TE products.
-19. feedback - Customer providing feedback.
-20. complaint - Customer making a complaint.
-21. fallback - Queries that don't fit any of the above categories.
-
-Analyze the query carefully and choose only one category.
-"""),
-    ("human", "{question}")
-])
-
-# Create a callable chain to route queries
-def route_with_llm(state):
-    """Use LLM to determine the category of the query."""
-    query = state["question"]
-    chain = router_prompt | llm
-    response = chain.invoke({"question": query})
-    
-    # Extract the category from the response
-    response_text = response.content.lower()
-    
-    # Define category mappings
-    category_mappings = {
-        "pos_replace": ["pos replace", "pos replacement", "pos update"],
-        "general_pricing_queries": ["pricing", "price adjust", "volume discount", "validity", "quote extension"],
-        "piggyback_creation": ["piggyback creation", "create piggyback", "new piggyback"],
-        "adding_parts_to_piggyback": ["add part", "add to piggyback", "existing piggyback"],
-        "ship_and_debit_queries": ["ship", "debit", "s&d", "fsa to s&d", "fsa conversion"],
-        "opportunities_rejected_sfdc": ["rejected opportunity", "sfdc rejection"],
-        "pending_approval_sfdc": ["pending approval", "approve opportunity"],
-        "quote_closed_gpms_no_document": ["closed quote", "no document", "quote document"],
-        "quote_not_reaching_pricing": ["quote not reaching", "not reached pricing"],
-        "customer_data_enquiries": ["customer data", "data enquiry", "data request"],
-        "quotes_pending_review_gpms": ["quote pending", "gpms review"],
-        "opportunities_pending_review_sfdc": ["opportunity pending", "sfdc review"],
-        "opportunity_rejected_incorrectly_sfdc": ["incorrectly rejected", "wrong rejection"],
-        "loa_related_queries": ["loa", "letter of authorization"],
-        "s_and_d_claim_rejection": ["claim rejection", "s&d claim", "rejected claim"],
-        "agreement_pn_addition_removal": ["agreement", "pn addition", "pn removal"],
-        "te_com_issues": ["te.com", "website issue", "spr"],
-        "product_enquiry": ["product", "product specs", "product details"],
-        "feedback": ["feedback", "suggestion"],
-        "complaint": ["complaint", "dissatisfied"]
-    }
-    
-    # Check if any category keywords are in the response
-    detected_category = "fallback"
-    for category, keywords in category_mappings.items():
-        if any(keyword in response_text for keyword in keywords):
-            detected_category = category
-            break
-    
-    # For rule-based overrides
+from entities import BARE_QUOTE_NUMBER, scan_entities
+from thread_stripper import strip_thread
+from router import keyword_router
+from routing_cache import routing_cache
+from routing_log import log_routing_decision
+from metrics import ROUTING_DECISIONS, configure_from_env, current_category, instrument_handler, timer
+
+# Optional /metrics endpoint (METRICS_PORT) and exit-time dump (METRICS_DUMP_PATH)
+configure_from_env()
+
+# Number of LLM-routed queries packed into a single batch request
+LLM_BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", "20"))
+
+# Route and answer only the new content of an email; STRIP_QUOTED_HISTORY=0 keeps the whole email
+STRIP_QUOTED_HISTORY = os.environ.get("STRIP_QUOTED_HISTORY", "1") != "0"
+
+def initial_state(query):
+    """State for a new email: its new content as the question, the email as received as "original"."""
+    if not STRIP_QUOTED_HISTORY:
+        return {"question": query, "original": query, "entities": scan_entities(query)}
+    email = strip_thread(query)
+    entities = scan_entities(email.text)
+    # No ID in the new content: look in everything above the quoted history, signatures included
+    if email.stripped and entities.empty:
+        entities = scan_entities(email.without_history())
+    return {"question": email.text, "original": query, "entities": entities}
+
+def entities_of(state):
+    """The email's Entities, made once and kept in the state for the router and the handler."""
+    entities = state.get("entities")
+    if entities is None:
+        entities = state["entities"] = scan_entities(state["question"])
+    return entities
+
+def apply_routing_overrides(query, detected_category, entities=None):
+    """Apply rule-based overrides on top of an LLM routing decision."""
     lower_query = query.lower()
+    if entities is None:
+        entities = scan_entities(query)
     
-    # S&D query detection
-    if any(keyword in lower_query for keyword in ["ship", "debit", "s&d", "fsa", "sandd"]) or re.search(r'\b\d{10}\b', lower_query):
+    # S&D query detection (a standalone 10-digit number is a quote ID)
+    if any(keyword in lower_query for keyword in ["ship", "debit", "s&d", "fsa", "sandd"]) or entities.first(BARE_QUOTE_NUMBER):
         if any(keyword in lower_query for keyword in ["claim", "reject"]):
             detected_category = "s_and_d_claim_rejection"
         else:
@@ -155,110 +82,206 @@ def route_with_llm(state):
     if "agreement" in lower_query and ("part" in lower_query or "pn" in lower_query):
         detected_category = "agreement_pn_addition_removal"
     
-    print(f"🧭 Routing result: {detected_category}")
     return detected_category
 
+def parse_routing_result(query, result, entities=None):
+    """Take the schema-validated category (fallback if unparseable), then apply rule overrides."""
+    parsed = result["parsed"]
+    category = parsed.category if parsed is not None else "fallback"
+    return apply_routing_overrides(query, category, entities)
+
+def route_without_llm(query, entities=None):
+    """The cached or confidently predicted category of a rule miss, else None (ask the LLM)."""
+    # Skip the LLM entirely for queries we have already classified (cached after the overrides)
+    cached_category = routing_cache.get(query)
+    if cached_category:
+        print(f"🧭 Routing cache hit: {cached_category} (stats: {routing_cache.stats})")
+        ROUTING_DECISIONS.inc(source="cache", category=cached_category)
+        return cached_category
+    
+    # Confident local predictions never reach the LLM
+    from fast_classifier import classify_locally
+    local_category = classify_locally(query)
+    if local_category:
+        # The same overrides as an LLM decision, so both route an email alike
+        local_category = apply_routing_overrides(query, local_category, entities)
+        ROUTING_DECISIONS.inc(source="local", category=local_category)
+    return local_category
+
+def record_rule_route(query, category):
+    """Count a rule-routed email and log it as classifier training data."""
+    ROUTING_DECISIONS.inc(source="rules", category=category)
+    log_routing_decision(query, category, "rules")
+
+def record_llm_route(query, category):
+    """Count an LLM routing decision, cache it and log it as classifier training data."""
+    ROUTING_DECISIONS.inc(source="llm", category=category)
+    routing_cache.put(query, category)
+    log_routing_decision(query, category, "llm")
+
+def parse_llm_route(state, result, started):
+    """Report the LLM call's usage and read its category for the state's query."""
+    from llm_router import record_llm_usage
+    record_llm_usage("LLM routing", result["raw"], time.perf_counter() - started)
+    return parse_routing_result(state["question"], result, entities_of(state))
+
+# Create a callable chain to route queries
+def route_with_llm(state):
+    """Use LLM to determine the category of the query."""
+    query = state["question"]
+    category = route_without_llm(query, entities_of(state))
+    if category:
+        return category
+    
+    from llm_router import get_router_chain
+    with timer("llm_routing") as labels:
+        started = time.perf_counter()
+        result = get_router_chain().invoke({"question": query})
+        category = labels["category"] = parse_llm_route(state, result, started)
+    record_llm_route(query, category)
+    print(f"🧭 Routing result: {category}")
+    return category
+
+async def route_with_llm_async(state):
+    """Async variant of route_with_llm; awaits the Groq call, cache and log I/O run on DB_EXECUTOR."""
+    query = state["question"]
+    category = await run_blocking(route_without_llm, query, entities_of(state))
+    if category:
+        return category
+    
+    from llm_router import get_router_chain
+    with timer("llm_routing") as labels:
+        started = time.perf_counter()
+        result = await get_router_chain().ainvoke({"question": query})
+        category = labels["category"] = parse_llm_route(state, result, started)
+    await run_blocking(record_llm_route, query, category)
+    print(f"🧭 Routing result: {category}")
+    return category
+
+def route_batch_with_llm(queries, entities=None):
+    """Use a single LLM call to determine the category of several queries (entities: their Entities, if made)."""
+    from llm_router import get_batch_router_chain, record_llm_usage
+    numbered = "\n\n".join(f"[{i}] {query}" for i, query in enumerate(queries))
+    with timer("llm_batch_routing", category="batch"):
+        started = time.perf_counter()
+        result = get_batch_router_chain().invoke({"count": len(queries), "questions": numbered})
+        record_llm_usage(f"Batch routing ({len(queries)} queries)", result["raw"], time.perf_counter() - started)
+    
+    # Anything the model skipped or mis-indexed falls back
+    categories = ["fallback"] * len(queries)
+    if result["parsed"] is not None:
+        for item in result["parsed"].routes:
+            if 0 <= item.index < len(queries):
+                categories[item.index] = item.category
+    
+    if entities is None:
+        entities = [scan_entities(query) for query in queries]
+    categories = [apply_routing_overrides(query, category, scan)
+                  for query, category, scan in zip(queries, categories, entities)]
+    print(f"🧭 Batch routing result: {categories}")
+    return categories
+
 # Handler functions for each category
 def handle_pos_replace(state):
     """Handle POS replacement queries"""
     query = state["question"]
-    response = process_pos_replacement_query(query)
+    response = process_pos_replacement_query(query, entities_of(state))
     return {"response": response}
 
 def handle_general_pricing(state):
     """Handle general pricing queries"""
     query = state["question"]
-    response = process_general_pricing_query(query)
+    response = process_general_pricing_query(query, entities_of(state))
     return {"response": response}
 
 def handle_piggyback_creation(state):
     """Handle piggyback creation queries"""
     query = state["question"]
-    response = process_piggyback_creation_query(query)
+    response = process_piggyback_creation_query(query, entities_of(state))
     return {"response": response}
 
 def handle_adding_parts_to_piggyback(state):
     """Handle adding parts to piggyback queries"""
     query = state["question"]
-    response = process_adding_parts_to_piggyback_query(query)
+    response = process_adding_parts_to_piggyback_query(query, entities_of(state))
     return {"response": response}
 
 def handle_ship_and_debit_queries(state):
     """Handle ship and debit queries"""
     query = state["question"]
-    response = process_ship_debit_query(query)
+    response = process_ship_debit_query(query, entities_of(state))
     return {"response": response}
 
 def handle_opportunities_rejected_sfdc(state):
     """Handle opportunities rejected in SFDC queries"""
     query = state["question"]
-    response = process_opportunities_rejected_sfdc_query(query)
+    response = process_opportunities_rejected_sfdc_query(query, entities_of(state))
     return {"response": response}
 
 def handle_pending_approval_sfdc(state):
     """Handle pending approval in SFDC queries"""
     query = state["question"]
-    response = process_pending_approval_sfdc_query(query)
+    response = process_pending_approval_sfdc_query(query, entities_of(state))
     return {"response": response}
 
 def handle_quote_closed_gpms_no_document(state):
     """Handle quote closed in GPMS with no document queries"""
     query = state["question"]
-    response = process_quote_closed_gpms_no_document_query(query)
+    response = process_quote_closed_gpms_no_document_query(query, entities_of(state))
     return {"response": response}
 
 def handle_quote_not_reaching_pricing(state):
     """Handle quote not reaching pricing queries"""
     query = state["question"]
-    response = process_quote_not_reaching_pricing_query(query)
+    response = process_quote_not_reaching_pricing_query(query, entities_of(state))
     return {"response": response}
 
 def handle_customer_data_enquiries(state):
     """Handle customer data enquiries"""
     query = state["question"]
-    response = process_customer_data_enquiries_query(query)
+    response = process_customer_data_enquiries_query(query, entities_of(state))
     return {"response": response}
 
 def handle_quotes_pending_review_gpms(state):
     """Handle quotes pending review in GPMS queries"""
     query = state["question"]
-    response = process_gpms_pending_quotes(query)
+    response = process_gpms_pending_quotes(query, entities_of(state))
     return {"response": response}
 
 def handle_opportunities_pending_review_sfdc(state):
     """Handle opportunities pending review in SFDC queries"""
     query = state["question"]
-    response = process_sfdc_pending_opportunities(query)
+    response = process_sfdc_pending_opportunities(query, entities_of(state))
     return {"response": response}
 
 def handle_opportunity_rejected_incorrectly_sfdc(state):
     """Handle opportunity rejected incorrectly in SFDC queries"""
     query = state["question"]
-    response = process_opportunity_rejected_incorrectly(query)
+    response = process_opportunity_rejected_incorrectly(query, entities_of(state))
     return {"response": response}
 
 def handle_loa_related_queries(state):
     """Handle LOA related queries"""
     query = state["question"]
-    response = process_loa_related_queries(query)
+    response = process_loa_related_queries(query, entities_of(state))
     return {"response": response}
 
 def handle_s_and_d_claim_rejection(state):
     """Handle S&D claim rejection queries"""
     query = state["question"]
-    response = process_sd_claim_rejection_query(query)
+    response = process_sd_claim_rejection_query(query, entities_of(state))
     return {"response": response}
 
 def handle_agreement_pn_addition_removal(state):
     """Handle agreement PN addition/removal queries"""
     query = state["question"]
-    response = process_agreement_pn_query(query)
+    response = process_agreement_pn_query(query, entities_of(state))
     return {"response": response}
 
 def handle_te_com_issues(state):
     """Handle TE.com issues queries"""
     query = state["question"]
-    response = process_te_com_issues_query(query)
+    response = process_te_com_issues_query(query, entities_of(state))
     return {"response": response}
 
 def handle_product_enquiry(state):
@@ -321,178 +344,260 @@ Thank you,
 TE Connectivity Support Team
 """}
 
-# Create state graph
-workflow = StateGraph(dict)
-
-# Add all nodes to the graph
-workflow.add_node("pos_replace", handle_pos_replace)
-workflow.add_node("general_pricing_queries", handle_general_pricing)
-workflow.add_node("piggyback_creation", handle_piggyback_creation)
-workflow.add_node("adding_parts_to_piggyback", handle_adding_parts_to_piggyback)
-workflow.add_node("ship_and_debit_queries", handle_ship_and_debit_queries)
-workflow.add_node("opportunities_rejected_sfdc", handle_opportunities_rejected_sfdc)
-workflow.add_node("pending_approval_sfdc", handle_pending_approval_sfdc)
-workflow.add_node("quote_closed_gpms_no_document", handle_quote_closed_gpms_no_document)
-workflow.add_node("quote_not_reaching_pricing", handle_quote_not_reaching_pricing)
-workflow.add_node("customer_data_enquiries", handle_customer_data_enquiries)
-workflow.add_node("quotes_pending_review_gpms", handle_quotes_pending_review_gpms)
-workflow.add_node("opportunities_pending_review_sfdc", handle_opportunities_pending_review_sfdc)
-workflow.add_node("opportunity_rejected_incorrectly_sfdc", handle_opportunity_rejected_incorrectly_sfdc)
-workflow.add_node("loa_related_queries", handle_loa_related_queries)
-workflow.add_node("s_and_d_claim_rejection", handle_s_and_d_claim_rejection)
-workflow.add_node("agreement_pn_addition_removal", handle_agreement_pn_addition_removal)
-workflow.add_node("te_com_issues", handle_te_com_issues)
-workflow.add_node("product_enquiry", handle_product_enquiry)
-workflow.add_node("feedback", handle_feedback)
-workflow.add_node("complaint", handle_complaint)
-workflow.add_node("fallback", handle_fallback)
-
-# Define rule-based routing function
-def route_question(state):
-    """Rule-based routing with LLM backup."""
-    question = state["question"]
+# Category -> handler; the single spec the graphs and direct dispatch are built from
+HANDLERS = {
+    "pos_replace": handle_pos_replace,
+    "general_pricing_queries": handle_general_pricing,
+    "piggyback_creation": handle_piggyback_creation,
+    "adding_parts_to_piggyback": handle_adding_parts_to_piggyback,
+    "ship_and_debit_queries": handle_ship_and_debit_queries,
+    "opportunities_rejected_sfdc": handle_opportunities_rejected_sfdc,
+    "pending_approval_sfdc": handle_pending_approval_sfdc,
+    "quote_closed_gpms_no_document": handle_quote_closed_gpms_no_document,
+    "quote_not_reaching_pricing": handle_quote_not_reaching_pricing,
+    "customer_data_enquiries": handle_customer_data_enquiries,
+    "quotes_pending_review_gpms": handle_quotes_pending_review_gpms,
+    "opportunities_pending_review_sfdc": handle_opportunities_pending_review_sfdc,
+    "opportunity_rejected_incorrectly_sfdc": handle_opportunity_rejected_incorrectly_sfdc,
+    "loa_related_queries": handle_loa_related_queries,
+    "s_and_d_claim_rejection": handle_s_and_d_claim_rejection,
+    "agreement_pn_addition_removal": handle_agreement_pn_addition_removal,
+    "te_com_issues": handle_te_com_issues,
+    "product_enquiry": handle_product_enquiry,
+    "feedback": handle_feedback,
+    "complaint": handle_complaint,
+    "fallback": handle_fallback
+}
+
+# Every handler runs with its category as the default metrics label
+HANDLERS = {category: instrument_handler(category, handler) for category, handler in HANDLERS.items()}
+
+def match_rules(question):
+    """Return the category of a rule-matched query, else None."""
     print(f"🧭 Processing question: {question}")
+    with timer("rule_routing") as labels:
+        matches = keyword_router.match(question)
+        if matches:
+            labels["category"] = matches[0][0]
+    if matches:
+        print(f"Rule-based routing to: {matches[0][0]} (candidates: {matches})")
+        return matches[0][0]
+    return None
+
+def route_by_rules(state):
+    """Return the category for a pre-routed or rule-matched query, else None."""
+    # Already routed upstream (e.g. by process_queries)
+    if state.get("category"):
+        return state["category"]
     
     # Use rule-based routing for clear cases
-    if "pos" in question and ("replace" in question or "update" in question):
-        print("Rule-based routing to: pos_replace")
-        return "pos_replace"
-    
-    elif "price" in question or "pricing" in question or "discount" in question or "validity" in question:
-        print("Rule-based routing to: general_pricing_queries")
-        return "general_pricing_queries"
-    
-    elif "piggyback" in question and ("create" in question or "creation" in question or "new" in question):
-        print("Rule-based routing to: piggyback_creation")
-        return "piggyback_creation"
-    
-    elif "add" in question and "piggyback" in question:
-        print("Rule-based routing to: adding_parts_to_piggyback")
-        return "adding_parts_to_piggyback"
-    
-    elif any(keyword in question for keyword in ["ship", "debit", "s&d", "fsa", "sandd"]) and not "claim" in question:
-        print("Rule-based routing to: ship_and_debit_queries")
-        return "ship_and_debit_queries"
+    category = match_rules(state["question"])
+    if category:
+        record_rule_route(state["question"], category)
+    return category
+
+async def route_by_rules_async(state):
+    """Async variant of route_by_rules; the routing log is written on DB_EXECUTOR."""
+    if state.get("category"):
+        return state["category"]
     
-    elif "reject" in question and "sfdc" in question and not "incorrect" in question:
-        print("Rule-based routing to: opportunities_rejected_sfdc")
-        return "opportunities_rejected_sfdc"
-    
-    elif "pending approval" in question and "sfdc" in question:
-        print("Rule-based routing to: pending_approval_sfdc")
-        return "pending_approval_sfdc"
-    
-    elif "closed" in question and "gpms" in question and "document" in question:
-        print("Rule-based routing to: quote_closed_gpms_no_document")
-        return "quote_closed_gpms_no_document"
-    
-    elif "not reach" in question and "pricing" in question:
-        print("Rule-based routing to: quote_not_reaching_pricing")
-        return "quote_not_reaching_pricing"
-    
-    elif "customer data" in question or "data enquiry" in question or "data request" in question:
-        print("Rule-based routing to: customer_data_enquiries")
-        return "customer_data_enquiries"
-    
-    elif "pending" in question and "gpms" in question:
-        print("Rule-based routing to: quotes_pending_review_gpms")
-        return "quotes_pending_review_gpms"
-    
-    elif "pending" in question and "sfdc" in question and "opportunity" in question:
-        print("Rule-based routing to: opportunities_pending_review_sfdc")
-        return "opportunities_pending_review_sfdc"
-    
-    elif "incorrect" in question and "reject" in question:
-        print("Rule-based routing to: opportunity_rejected_incorrectly_sfdc")
-        return "opportunity_rejected_incorrectly_sfdc"
-    
-    elif "loa" in question or "letter of authorization" in question:
-        print("Rule-based routing to: loa_related_queries")
-        return "loa_related_queries"
-    
-    elif "claim" in question and any(term in question for term in ["s&d", "ship", "debit", "reject"]):
-        print("Rule-based routing to: s_and_d_claim_rejection")
-        return "s_and_d_claim_rejection"
-    
-    elif "agreement" in question and ("part" in question or "pn" in question):
-        print("Rule-based routing to: agreement_pn_addition_removal")
-        return "agreement_pn_addition_removal"
-    
-    elif "te.com" in question or "website" in question or "spr" in question:
-        print("Rule-based routing to: te_com_issues")
-        return "te_com_issues"
-    
-    elif "product" in question and any(term in question for term in ["spec", "detail", "information", "available"]):
-        print("Rule-based routing to: product_enquiry")
-        return "product_enquiry"
-    
-    elif "feedback" in question or "suggestion" in question:
-        print("Rule-based routing to: feedback")
-        return "feedback"
-    
-    elif "complaint" in question or "dissatisfied" in question:
-        print("Rule-based routing to: complaint")
-        return "complaint"
+    category = match_rules(state["question"])
+    if category:
+        await run_blocking(record_rule_route, state["question"], category)
+    return category
+
+# Define rule-based routing function
+def route_question(state):
+    """Rule-based routing with LLM backup."""
+    category = route_by_rules(state)
+    if category:
+        return category
     
     # For more ambiguous cases, use LLM-based routing
-    else:
-        category = route_with_llm(state)
-        print(f"LLM-based routing to: {category}")
+    category = route_with_llm(state)
+    print(f"LLM-based routing to: {category}")
+    return category
+
+async def route_question_async(state):
+    """Rule-based routing with an awaited LLM backup."""
+    category = await route_by_rules_async(state)
+    if category:
         return category
-
-# Add conditional edges from START to all possible nodes
-workflow.add_conditional_edges(
-    START,
-    route_question,
-    {
-        "pos_replace": "pos_replace",
-        "general_pricing_queries": "general_pricing_queries",
-        "piggyback_creation": "piggyback_creation",
-        "adding_parts_to_piggyback": "adding_parts_to_piggyback",
-        "ship_and_debit_queries": "ship_and_debit_queries",
-        "opportunities_rejected_sfdc": "opportunities_rejected_sfdc",
-        "pending_approval_sfdc": "pending_approval_sfdc",
-        "quote_closed_gpms_no_document": "quote_closed_gpms_no_document",
-        "quote_not_reaching_pricing": "quote_not_reaching_pricing",
-        "customer_data_enquiries": "customer_data_enquiries",
-        "quotes_pending_review_gpms": "quotes_pending_review_gpms",
-        "opportunities_pending_review_sfdc": "opportunities_pending_review_sfdc",
-        "opportunity_rejected_incorrectly_sfdc": "opportunity_rejected_incorrectly_sfdc",
-        "loa_related_queries": "loa_related_queries",
-        "s_and_d_claim_rejection": "s_and_d_claim_rejection",
-        "agreement_pn_addition_removal": "agreement_pn_addition_removal",
-        "te_com_issues": "te_com_issues",
-        "product_enquiry": "product_enquiry",
-        "feedback": "feedback",
-        "complaint": "complaint",
-        "fallback": "fallback"
-    }
+    
+    category = await route_with_llm_async(state)
+    print(f"LLM-based routing to: {category}")
+    return category
+
+# Blocking handlers (MySQL lookups) run here when driven from asyncio
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("DB_MAX_WORKERS", "32")),
+    thread_name_prefix="db-lookup"
 )
 
-# Add edges from all nodes to END
-for node in [
-    "pos_replace", "general_pricing_queries", "piggyback_creation", 
-    "adding_parts_to_piggyback", "ship_and_debit_queries", 
-    "opportunities_rejected_sfdc", "pending_approval_sfdc",
-    "quote_closed_gpms_no_document", "quote_not_reaching_pricing",
-    "customer_data_enquiries", "quotes_pending_review_gpms",
-    "opportunities_pending_review_sfdc", "opportunity_rejected_incorrectly_sfdc",
-    "loa_related_queries", "s_and_d_claim_rejection",
-    "agreement_pn_addition_removal", "te_com_issues",
-    "product_enquiry", "feedback", "complaint", "fallback"
-]:
-    workflow.add_edge(node, END)
-
-# Compile the graph
-app = workflow.compile()
+async def run_blocking(fn, *args):
+    """Run blocking I/O (lookups, the routing cache's SQLite tier, the routing log) on DB_EXECUTOR."""
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, fn, *args)
+
+def make_async_handler(handler):
+    """Wrap a blocking handler so it runs on DB_EXECUTOR instead of the event loop."""
+    async def async_handler(state):
+        return await run_blocking(handler, state)
+    async_handler.__name__ = f"{handler.__name__}_async"
+    async_handler.__doc__ = handler.__doc__
+    return async_handler
+
+def build_graph(handlers, router):
+    """Compile a graph routing from START to one handler node per category, then END."""
+    from langgraph.graph import END, StateGraph, START
+    
+    workflow = StateGraph(dict)
+    for category, handler in handlers.items():
+        workflow.add_node(category, handler)
+        workflow.add_edge(category, END)
+    workflow.add_conditional_edges(START, router, {category: category for category in handlers})
+    return workflow.compile()
+
+# Graphs are compiled on first use so importing this module stays cheap
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+def get_app():
+    """Return the compiled sync graph."""
+    if "sync" not in _graphs:
+        with _graphs_lock:
+            if "sync" not in _graphs:
+                _graphs["sync"] = build_graph(HANDLERS, route_question)
+    return _graphs["sync"]
+
+def get_async_app():
+    """Return the compiled async graph."""
+    if "async" not in _graphs:
+        with _graphs_lock:
+            if "async" not in _graphs:
+                _graphs["async"] = build_graph(
+                    {category: make_async_handler(handler) for category, handler in HANDLERS.items()},
+                    route_question_async
+                )
+    return _graphs["async"]
+
+# "fast" dispatches straight from HANDLERS; "graph" runs the compiled StateGraph
+DISPATCH_MODE = os.environ.get("DISPATCH_MODE", "fast")
+
+def dispatch(state):
+    """Route a query and call its handler directly, without the StateGraph."""
+    category = route_question(state)
+    return HANDLERS[category](state)
+
+async def dispatch_async(state):
+    """Async variant of dispatch; the handler runs on DB_EXECUTOR."""
+    category = await route_question_async(state)
+    return await make_async_handler(HANDLERS[category])(state)
+
+def __getattr__(name):
+    """Keep `Main.app`, `Main.llm` and the routing schemas importable without eager construction."""
+    if name == "app":
+        return get_app()
+    if name == "async_app":
+        return get_async_app()
+    if name == "llm":
+        from llm_router import get_llm
+        return get_llm()
+    if name in ("Category", "RouteQuery", "BatchRouteItem", "BatchRouteQuery", "ROUTER_SYSTEM_PROMPT"):
+        import llm_router
+        return getattr(llm_router, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Function to process a query
-def process_query(query):
-    """Process a single query through the workflow."""
+def process_query(query, mode=None):
+    """Process a single query through the workflow ("fast" dispatch or "graph")."""
     print(f"📝 Processing query: {query}")
-    result = app.invoke({"question": query})
+    if (mode or DISPATCH_MODE) == "graph":
+        result = get_app().invoke(initial_state(query))
+    else:
+        result = dispatch(initial_state(query))
     return result["response"]
 
+def process_queries(queries, batch_size=LLM_BATCH_SIZE, mode=None):
+    """Process many queries, sharing one LLM routing call per batch of rule misses."""
+    # One Entities per email, shared by the router overrides and the handlers
+    states = [initial_state(query) for query in queries]
+    queries = [state["question"] for state in states]
+    entities = [state["entities"] for state in states]
+    with timer("rule_routing", category="batch"):
+        categories = [keyword_router.route(query) for query in queries]
+    for query, category in zip(queries, categories):
+        if category:
+            record_rule_route(query, category)
+    
+    # Rule misses that are neither cached nor confidently classified locally
+    # go to the LLM in batches
+    pending = []
+    for i, query in enumerate(queries):
+        if not categories[i]:
+            categories[i] = route_without_llm(query, entities[i])
+            if not categories[i]:
+                pending.append(i)
+    
+    print(f"📦 Processing {len(queries)} queries: {len(queries) - len(pending)} routed without LLM, "
+          f"{len(pending)} in batches of {batch_size}")
+    
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        for i, category in zip(chunk, route_batch_with_llm([queries[i] for i in chunk],
+                                                           [entities[i] for i in chunk])):
+            categories[i] = category
+            record_llm_route(queries[i], category)
+    
+    # Fan out to the category handlers
+    for state, category in zip(states, categories):
+        state["category"] = category
+    if (mode or DISPATCH_MODE) == "graph":
+        return [result["response"] for result in get_app().batch(states)]
+    
+    # Database-backed categories share one IN() query per table; the rest are dispatched
+    responses = [None] * len(states)
+    lookups = [i for i, category in enumerate(categories) if category in LOOKUP_ENGINES]
+    groups = {}
+    for i in lookups:
+        groups.setdefault(categories[i], []).append(i)
+    for category, group in groups.items():
+        # One table per category, so grouping keeps one IN() query per table and labels the metrics
+        token = current_category.set(category)
+        try:
+            with timer("handler", category):
+                replies = process_lookup_batch([(category, queries[i]) for i in group], [entities[i] for i in group])
+        finally:
+            current_category.reset(token)
+        for i, response in zip(group, replies):
+            responses[i] = response
+    others = [i for i in range(len(states)) if responses[i] is None]
+    for i, result in zip(others, DB_EXECUTOR.map(dispatch, [states[i] for i in others])):
+        responses[i] = result["response"]
+    return responses
+
+# Maximum number of emails process_queries_async keeps in flight
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", "200"))
+
+async def process_query_async(query, semaphore=None, mode=None):
+    """Process a single query through the async workflow ("fast" dispatch or "graph")."""
+    if semaphore is None:
+        print(f"📝 Processing query: {query}")
+        if (mode or DISPATCH_MODE) == "graph":
+            result = await get_async_app().ainvoke(initial_state(query))
+        else:
+            result = await dispatch_async(initial_state(query))
+        return result["response"]
+    async with semaphore:
+        return await process_query_async(query, mode=mode)
+
+async def process_queries_async(queries, max_concurrency=MAX_CONCURRENCY, mode=None):
+    """Process many queries concurrently, with at most max_concurrency in flight."""
+    import asyncio
+    
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(*(process_query_async(query, semaphore, mode) for query in queries))
+
 # Example usage
 if __name__ == "__main__":
     # Test queries
@@ -0,0 +1,88 @@
+"""Mailbox batches: one IN() query per table vs. one single-row query per email.
+
+Needs the MySQL server from ``db_pool.DB_CONFIG`` with the loaded database.
+The lookup tables are rebuilt with synthetic rows in the scratch database of
+``bench_projection.py``; each batch mixes emails across all categories, about
+one in ten with an ID that does not exist. The row cache is disabled so both
+paths go to the database. Run from the ``Main`` directory:
+
+    python benchmarks/bench_batch.py [rows_per_table] [emails]
+"""
+import contextlib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+
+import lookup_engine
+from bench_projection import BENCH_DATABASE, build_table, key_value
+from db_pool import DB_CONFIG
+from helper_functions import LOOKUP_ENGINES
+from row_cache import RowCache
+
+BATCH_SIZES = (10, 50, 200, 1000)
+
+
+def make_requests(rows, count):
+    requests = []
+    engines = list(LOOKUP_ENGINES.values())
+    for _ in range(count):
+        engine = random.choice(engines)
+        lookup = engine.spec.lookups[0]
+        i = random.randrange(rows) if random.random() > 0.1 else rows + random.randrange(rows)
+        ids = {id_pattern.name: None for id_pattern in engine.spec.ids}
+        ids.update((name, key_value(engine.spec.table, column, i))
+                   for name, column in zip(lookup.ids or lookup.columns, lookup.columns))
+        requests.append((engine, ids))
+    return requests
+
+
+def single_queries(connection, requests):
+    return [engine.fetch(connection, ids) for engine, ids in requests]
+
+
+def batched(connection, requests, batch_size):
+    results = []
+    for start in range(0, len(requests), batch_size):
+        results.extend(lookup_engine.resolve_batch(requests[start:start + batch_size]))
+    return results
+
+
+def emails_per_second(fn, *args):
+    start = time.perf_counter()
+    results = fn(*args)
+    return len(results) / (time.perf_counter() - start), results
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    emails = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    admin = mysql.connector.connect(host=DB_CONFIG["host"], user=DB_CONFIG["user"], password=DB_CONFIG["password"])
+    cursor = admin.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DATABASE}`")
+    for engine in LOOKUP_ENGINES.values():
+        build_table(cursor, engine.spec.table, engine.spec.lookups[0].columns, rows)
+        admin.commit()
+    cursor.close()
+    admin.close()
+
+    connection = mysql.connector.connect(**dict(DB_CONFIG, database=BENCH_DATABASE))
+    lookup_engine.row_cache = RowCache(max_size=0)
+    lookup_engine.db_connection = lambda: contextlib.nullcontext(connection)
+    requests = make_requests(rows, emails)
+    single_queries(connection, requests[:200])  # prepare every statement once
+
+    single, expected = emails_per_second(single_queries, connection, requests)
+    print(f"{emails} emails over {len(LOOKUP_ENGINES)} tables, {rows} rows per table")
+    print(f"{'single queries':<16} {single:9.0f} emails/s")
+    for batch_size in BATCH_SIZES:
+        rate, results = emails_per_second(batched, connection, requests, batch_size)
+        found = sum(1 for result in results if result) == sum(1 for result in expected if result)
+        print(f"{f'batch of {batch_size}':<16} {rate:9.0f} emails/s {rate / single:6.1f}x"
+              f"{'' if found else '  (found counts differ!)'}")
+    connection.close()
@@ -0,0 +1,92 @@
+"""Throughput: per-email process_query vs. batched process_queries.
+
+The Groq model and the database-backed helpers are replaced with stubs; the
+LLM stub sleeps for a fixed latency per request so the number of round trips
+dominates, as it does against the real API. Run from the ``Main`` directory:
+
+    python benchmarks/bench_batch_routing.py [n_emails] [llm_latency_seconds]
+"""
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GROQ_API_KEY", "stub")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+
+import Main
+import helper_functions
+import llm_router
+from routing_cache import RoutingCache
+
+LLM_LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.25
+
+
+class StubLLM(Runnable):
+    """Stands in for ChatGroq: fixed latency, always answers 'fallback'."""
+
+    calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        StubLLM.calls += 1
+        time.sleep(LLM_LATENCY)
+        return AIMessage(content="fallback")
+
+    def with_structured_output(self, schema, include_raw=False, **kwargs):
+        def classify(prompt_value):
+            StubLLM.calls += 1
+            time.sleep(LLM_LATENCY)
+            if schema is llm_router.BatchRouteQuery:
+                count = len(re.findall(r"^\[\d+\]", prompt_value.to_string(), re.MULTILINE))
+                parsed = schema(routes=[
+                    llm_router.BatchRouteItem(index=i, category="fallback") for i in range(count)
+                ])
+            else:
+                parsed = schema(category="fallback")
+            if not include_raw:
+                return parsed
+            return {"raw": AIMessage(content=""), "parsed": parsed, "parsing_error": None}
+        return RunnableLambda(classify)
+
+
+def make_emails(n):
+    """Half rule-routable, half ambiguous so they need the LLM."""
+    emails = []
+    for i in range(n):
+        if i % 2:
+            emails.append(f"Hi, quick question about order batch {i} from our warehouse team, thanks.")
+        else:
+            emails.append(f"My opportunity is pending review in sfdc, opp id OPP{100000 + i}")
+    return emails
+
+
+def run(label, fn, emails):
+    StubLLM.calls = 0
+    Main.routing_cache = RoutingCache(max_size=0)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(emails)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:7.2f}s  {len(emails) / elapsed:8.1f} emails/s  {StubLLM.calls:4d} LLM calls")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    emails = make_emails(n)
+
+    # The routing chains are built lazily around whatever client get_llm() returns
+    llm_router._llm = StubLLM()
+    # Handlers look up the DB helpers in Main's namespace at call time
+    for name in dir(helper_functions):
+        if name.startswith("process_"):
+            setattr(Main, name, lambda query: "stub response")
+
+    print(f"{n} emails, stubbed LLM latency {LLM_LATENCY * 1000:.0f} ms")
+    run("per-email process_query", lambda qs: [Main.process_query(q) for q in qs], emails)
+    for batch_size in (10, 20, 50):
+        run(f"process_queries (N={batch_size})", lambda qs: Main.process_queries(qs, batch_size), emails)
@@ -0,0 +1,74 @@
+"""Cold-start time for a fresh worker process, per serving path.
+
+Each scenario runs in a new interpreter under ``python -X importtime``; we
+report median wall time and the slowest first- and second-level imports. Run
+from the ``Main`` directory:
+
+    python benchmarks/bench_cold_start.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MAIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    # Worker that only serves rule-routed, DB-backed categories
+    "rule-only": (
+        "import Main\n"
+        "Main.route_question({'question': 'I need to update the POS on my quote QTID1'})\n"
+    ),
+    # Same worker once it compiles the LangGraph workflow
+    "graph": (
+        "import Main\n"
+        "Main.get_app()\n"
+    ),
+    # Worker that has to reach the Groq router
+    "llm": (
+        "import Main, llm_router\n"
+        "Main.get_app()\n"
+        "llm_router.get_router_chain()\n"
+    ),
+}
+
+
+def run_scenario(code):
+    env = dict(os.environ, GROQ_API_KEY=os.environ.get("GROQ_API_KEY", "cold-start-benchmark"))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=MAIN_DIR, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return elapsed, proc.stderr
+
+
+def slowest_imports(importtime_output, max_depth=1, limit=10):
+    """Parse -X importtime output into the slowest imports (cumulative us) up to max_depth."""
+    imports = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if cumulative.strip().isdigit() and depth <= max_depth:
+            imports.append((int(cumulative), "  " * depth + name.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, code in SCENARIOS.items():
+        try:
+            results = [run_scenario(code) for _ in range(runs)]
+        except RuntimeError as err:
+            print(f"\n{name}: failed ({err})")
+            continue
+        wall = statistics.median(elapsed for elapsed, _ in results)
+        print(f"\n{name}: median {wall * 1000:.0f} ms over {runs} runs")
+        for cumulative, module in slowest_imports(results[-1][1]):
+            print(f"  {cumulative / 1000:8.1f} ms  {module}")
@@ -0,0 +1,46 @@
+"""Per-email dispatch overhead: direct HANDLERS dispatch vs. the LangGraph graph.
+
+Handlers are replaced with trivial stubs and queries are pre-routed, so the
+measured time is pure dispatch machinery. Run from the ``Main`` directory:
+
+    python benchmarks/bench_dispatch.py [n_emails]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Main
+
+
+def stub_handler(state):
+    return {"response": "stub response"}
+
+
+def bench(label, fn, states):
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(states[0])  # warm up (graph compilation, imports)
+        start = time.perf_counter()
+        for state in states:
+            fn(state)
+        elapsed = time.perf_counter() - start
+    print(f"{label:<8} {elapsed / len(states) * 1e6:9.1f} us/email")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for category in Main.HANDLERS:
+        Main.HANDLERS[category] = stub_handler
+
+    categories = list(Main.HANDLERS)
+    states = [
+        {"question": f"stub email {i}", "category": categories[i % len(categories)]}
+        for i in range(n)
+    ]
+
+    print(f"{n} pre-routed emails, stubbed handlers")
+    bench("fast", Main.dispatch, states)
+    bench("graph", lambda state: Main.get_app().invoke(state), states)
@@ -0,0 +1,124 @@
+"""Micro-benchmark: ID extraction from long thread-quoted emails.
+
+Builds support threads: a short new message on top, then many quoted earlier
+replies (``>``-prefixed, with signatures) that mention other IDs. Each email
+is routed to a category and its IDs extracted the old way (the router's
+10-digit search, then each of the category's own patterns) and through one
+shared ``Entities`` bundle; the results must be identical. The last row is a
+single ``finditer`` pass of one alternation over every kind, the design
+``entities.py`` does not use: it is the floor for any one-pass scanner
+written with ``re``. Run from the ``Main`` directory:
+
+    python benchmarks/bench_entities.py [emails] [quoted replies per email]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import entities
+from entities import BARE_QUOTE_NUMBER, scan_entities
+from helper_functions import LOOKUP_ENGINES
+from metrics import timer
+
+BARE_NUMBER = re.compile(r'\b\d{10}\b')
+# The categories' own QTID(\d{1,width}) patterns
+QTID_PATTERNS = {width: re.compile(rf'QTID(\d{{1,{width}}})') for width in (3, 13)}
+# Every kind in one alternation, the prefixed IDs and digit runs first
+ONE_PASS = re.compile("|".join(f"(?P<{kind}>{pattern.pattern})" for kind, pattern in entities.ENTITY_PATTERNS.items()
+                               if kind not in (entities.QUOTE_NUMBER, entities.OPPORTUNITY_NUMBER,
+                                               entities.BARE_QUOTE_NUMBER)) + r"|(?P<digits>\d{9,})")
+
+OPENERS = [
+    "Hi team, any update on QTID{qtid}? The customer is asking again.",
+    "Please check opportunity OPP{opp} in SFDC, it was rejected this morning.",
+    "Following up on piggyback PGB-{pgb}, we still need ADD{add} added.",
+    "Can you confirm the status of LOA{loa}? Thanks.",
+    "Agreement AGR{agr} is missing part number PN-{pn}, please add it.",
+    "Our claim id: CLM-{claim} for quote id: {quote} was rejected, why?",
+    "Customer data request REQ{req} for quote {quote} is still open.",
+    "Website issue ticket: SPR-{issue} when searching part number PN-{pn}.",
+]
+QUOTED = [
+    "Thanks for reaching out. We have looked into the request and the pricing team "
+    "is reviewing it; expect an update within two business days.",
+    "Can you share the distributor name and the end customer for this one? "
+    "We need both before the quote can move forward.",
+    "Adding the regional manager on copy. The approval matrix for this account changed last quarter.",
+    "As discussed on the call, the volumes in the original request do not match the forecast.",
+    "Reference: quote {quote}, opportunity OPP{opp}, request PBK{pbk}.",
+]
+SIGNATURE = "\n> Best regards,\n> Jane Doe\n> Pricing Desk | TE Connectivity\n> Phone +1 555 0100 ext {ext}\n"
+
+
+def fill(template):
+    return template.format(qtid=random.randint(1, 999), opp=random.randint(100000, 999999),
+                           pgb=random.randint(1000, 9999), add=random.randint(10000, 99999),
+                           loa=random.randint(1000, 9999), agr=random.randint(1000, 9999),
+                           pn=random.randint(100, 999), claim=random.randint(100, 999),
+                           quote=random.randint(10 ** 9, 10 ** 10 - 1), req=random.randint(1000, 9999),
+                           issue=random.randint(100, 999), pbk=random.randint(10000, 99999),
+                           ext=random.randint(100, 999))
+
+
+def make_email(replies):
+    parts = [fill(random.choice(OPENERS)), "\n\nThanks,\nSam\n"]
+    for depth in range(replies):
+        quote_marks = ">" * (depth + 1)
+        parts.append(f"\n{quote_marks} On Mon, Jan {depth % 28 + 1} 2024, support wrote:\n")
+        for _ in range(random.randint(2, 5)):
+            parts.append(f"{quote_marks} {fill(random.choice(QUOTED))}\n")
+        parts.append(fill(SIGNATURE))
+    return "".join(parts)
+
+
+def per_pattern(email, engine):
+    """The original extraction: the router's search, then one search per pattern of the category."""
+    routed = bool(BARE_NUMBER.search(email.lower()))
+    with timer("id_extraction"):
+        ids = {}
+        for name, pattern, group, kind, width in engine.patterns:
+            match = QTID_PATTERNS.get(width, pattern).search(email) if kind == entities.QTID else pattern.search(email)
+            ids[name] = match.group(group).upper() if match else None
+    return routed, ids
+
+
+def shared_entities(email, engine):
+    found = scan_entities(email)
+    return bool(found.first(BARE_QUOTE_NUMBER)), engine.extract_ids(email, found)
+
+
+def one_pass(email, engine):
+    return list(ONE_PASS.finditer(email))
+
+
+def run(extract, workload, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [extract(email, engine) for email, engine in workload]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+if __name__ == "__main__":
+    emails = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    replies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(21)
+    engines = list(LOOKUP_ENGINES.values())
+    workload = [(make_email(replies), random.choice(engines)) for _ in range(emails)]
+    size = sum(len(email) for email, _ in workload) / emails
+
+    old_time, old_results = run(per_pattern, workload)
+    new_time, new_results = run(shared_entities, workload)
+    assert old_results == new_results, "Entities disagree with the per-pattern searches"
+    pass_time, _ = run(one_pass, workload)
+
+    print(f"{emails} emails, {replies} quoted replies each (avg {size / 1024:.1f} KiB), {len(engines)} categories")
+    print(f"{'extraction':<16} {'total ms':>10} {'us/email':>10}")
+    for name, elapsed in (("per-pattern", old_time), ("shared Entities", new_time), ("one-pass scan", pass_time)):
+        print(f"{name:<16} {elapsed * 1e3:10.1f} {elapsed / emails * 1e6:10.1f}")
+    print("per-pattern and shared Entities results identical")
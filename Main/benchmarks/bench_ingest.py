@@ -0,0 +1,72 @@
+"""Peak RSS and rows/sec when loading one large sheet: pandas vs. streaming vs. streaming + LOAD DATA.
+
+Needs the MySQL server from ``db_pool.DB_CONFIG`` (``local_infile=ON`` for the
+LOAD DATA run), pandas and openpyxl. A workbook with one sheet shaped like
+``06_sfdc_rejection_queries`` is generated once (cached next to this file),
+then every mode loads it into a scratch database in its own process, so each
+peak RSS is measured from a fresh interpreter. Run from the ``Main`` directory:
+
+    python benchmarks/bench_ingest.py [rows]
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DATABASE = os.environ.get("BENCH_DATABASE", "TE_Email_Bench")
+MAIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = (
+    ("pandas", {}),
+    ("stream", {"stream": True}),
+    ("stream + LOAD DATA", {"stream": True, "load_data": True}),
+)
+
+# Runs in the child process: load the workbook, report rows, seconds and peak RSS as JSON
+CHILD = """
+import contextlib, io, json, sys, time
+sys.path.insert(0, "Database")
+import database
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    database.main(sys.argv[1], database=sys.argv[2], **json.loads(sys.argv[3]))
+print(json.dumps({"seconds": time.perf_counter() - start, "rss_mb": database.peak_rss_mb()}))
+"""
+
+
+def build_workbook(path, rows):
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("06_sfdc_rejection_queries")
+    sheet.append(["Opportunity ID", "Rejection Reason", "Rejected By", "Next Action Required", "Additional Findings"])
+    reasons = ["Pricing mismatch", "Incomplete documentation", "Duplicate opportunity", "Customer not eligible"]
+    actions = ["Provide missing approvals and resubmit", "Escalate to DMM for review", "Correct pricing"]
+    for i in range(rows):
+        sheet.append([f"OPP{i:09d}", random.choice(reasons), random.choice(["DMM", "Internal Team"]),
+                      random.choice(actions), f"Reviewed on batch {i % 997}"])
+    workbook.save(path)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"ingest_{rows}.xlsx")
+    if not os.path.exists(path):
+        print(f"Writing {rows} rows to {path} ...")
+        build_workbook(path, rows)
+
+    # Keep the reply service's row-cache stamp out of it
+    env = dict(os.environ, ROW_CACHE_STAMP=os.path.join(tempfile.gettempdir(), "bench_ingest_versions.json"))
+    print(f"{rows} rows, one sheet")
+    print(f"{'mode':<20} {'seconds':>9} {'rows/s':>10} {'peak RSS MB':>12}")
+    for label, options in MODES:
+        output = subprocess.run([sys.executable, "-c", CHILD, path, BENCH_DATABASE, json.dumps(options)],
+                                cwd=MAIN_DIR, env=env, capture_output=True, text=True)
+        if output.returncode:
+            print(f"{label:<20} failed: {output.stderr.strip().splitlines()[-1]}")
+            continue
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{label:<20} {result['seconds']:9.1f} {rows / result['seconds']:10.0f} {result['rss_mb']:12.0f}")
@@ -0,0 +1,98 @@
+"""Multi-ID emails: one combined reply vs. one email (and lookup) per ID.
+
+An email lists N quote IDs (``QTID<n>``) for POS replacement, about a third
+of which exist. The combined path answers it with one IN() query and one
+reply; the per-ID path answers N single-ID emails, as customers had to send
+them before. Emails listing quote and opportunity numbers next to longer
+digit runs are checked first: the run must not be read as more IDs. The
+lookups read an SQLite copy of the workbook
+(``database.load_sqlite``) built into a temporary directory, with the row
+cache and the reply cache disabled. Run from the ``Main`` directory:
+
+    python benchmarks/bench_multi_id.py [repeats]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lookup_engine
+from Database.database import EXCEL_FILE, load_sqlite
+from entities import OPPORTUNITY_NUMBER, QUOTE_NUMBER
+from helper_functions import LOOKUP_ENGINES, process_pos_replacement_query
+from row_cache import RowCache
+from storage import SQLiteStorage
+
+ID_COUNTS = (1, 10, 20, 50, 100, 200)
+
+
+def make_email(ids):
+    return ("Hi team, please update the POS on the following quotes: "
+            + ", ".join(f"QTID{i}" for i in ids) + ". Thanks!")
+
+
+# (email, quote numbers, opportunity numbers) read from it; with no whole number
+# of the kind, the single-ID reading (the first digits of the first run) is kept
+DIGIT_RUNS = [
+    ("quote 5001189951 and 50011899515001189952 closed", ["5001189951"], ["500118995"]),
+    ("opportunities 500118995, 500118996 and tracking 123456789012345", ["1234567890"], ["500118995", "500118996"]),
+    ("order 50011899515001189952 was closed", ["5001189951"], ["500118995"]),
+]
+
+
+def check_digit_runs():
+    """Multi-ID extraction reads whole numbers; only a lone ID may be the prefix of a longer run."""
+    for engine in LOOKUP_ENGINES.values():
+        if engine.multi_id is None:
+            continue
+        name, _, _, kind, _ = engine.patterns[0]
+        if kind not in (QUOTE_NUMBER, OPPORTUNITY_NUMBER):
+            continue
+        for email, quotes, opportunities in DIGIT_RUNS:
+            expected = quotes if kind == QUOTE_NUMBER else opportunities
+            found = [ids[name] for ids in engine.extract_id_sets(email)]
+            assert found == (expected or [None]), (engine.spec.table, email, found)
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    lookup_engine.row_cache = RowCache(max_size=0)
+    lookup_engine.reply_cache = RowCache(max_size=0)
+    random.seed(22)
+    check_digit_runs()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        os.environ["ROW_CACHE_STAMP"] = os.path.join(tmp, "versions.json")
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_sqlite(EXCEL_FILE, path)
+        lookup_engine.storage = SQLiteStorage(path)
+
+        print(f"POS replacement emails listing N quote IDs, SQLite, row cache off (best of {repeats}, ms)")
+        print(f"{'IDs':>5} {'combined':>10} {'per ID':>10} {'speedup':>8} {'us/ID combined':>15}")
+        for count in ID_COUNTS:
+            ids = random.sample(range(1, 301), count)
+            email = make_email(ids)
+            singles = [make_email([i]) for i in ids]
+            with contextlib.redirect_stdout(io.StringIO()):
+                reply = process_pos_replacement_query(email)
+                combined = best_of(lambda: process_pos_replacement_query(email), repeats)
+                per_id = best_of(lambda: [process_pos_replacement_query(single) for single in singles], repeats)
+            if count > 1:
+                assert f"of the {count} Quote IDs" in reply, reply[:200]
+            print(f"{count:5} {combined * 1e3:10.2f} {per_id * 1e3:10.2f} {per_id / combined:7.1f}x "
+                  f"{combined / count * 1e6:15.1f}")
@@ -0,0 +1,129 @@
+"""Bytes on the wire and rows/sec: ``SELECT *`` lookups vs. projected prepared statements.
+
+Needs the MySQL server from ``db_pool.DB_CONFIG`` with the loaded database.
+Every lookup table is copied (``CREATE TABLE ... LIKE``) into a scratch
+database and filled with synthetic rows: key columns get unique IDs and
+every other VARCHAR column ~``FILL`` characters of text. Key columns are
+indexed there so the transfer, not a table scan, dominates. Run from the
+``Main`` directory:
+
+    python benchmarks/bench_projection.py [rows_per_table] [lookups_per_table]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+
+from db_pool import DB_CONFIG
+from helper_functions import LOOKUP_ENGINES
+
+BENCH_DATABASE = os.environ.get("BENCH_DATABASE", "TE_Email_Bench")
+FILL = 120
+INSERT_BATCH = 1000
+
+
+def key_value(table, column, i):
+    return str(10 ** 9 + i) if column == "quote_id" else f"{column[:3].upper()}{table[:2]}{i}"
+
+
+def build_table(cursor, table, key_columns, rows):
+    cursor.execute(f"DROP TABLE IF EXISTS `{BENCH_DATABASE}`.`{table}`")
+    cursor.execute(f"CREATE TABLE `{BENCH_DATABASE}`.`{table}` LIKE `{DB_CONFIG['database']}`.`{table}`")
+    cursor.execute(f"SHOW COLUMNS FROM `{BENCH_DATABASE}`.`{table}`")
+    columns = [(name, column_type.decode() if isinstance(column_type, bytes) else column_type)
+               for name, column_type, *_ in cursor.fetchall()]
+    for name, column_type in columns:
+        if name in key_columns:
+            # The loader sizes CHAR keys to the sheet's IDs; synthetic IDs are longer
+            if column_type.startswith("char"):
+                cursor.execute(f"ALTER TABLE `{BENCH_DATABASE}`.`{table}` MODIFY `{name}` VARCHAR(32) NOT NULL")
+            cursor.execute(f"CREATE INDEX `idx_{name}` ON `{BENCH_DATABASE}`.`{table}` (`{name}`)")
+    filler = "".join(random.choices(string.ascii_letters + " ", k=FILL))
+    placeholders = ", ".join(["%s"] * len(columns))
+    insert_sql = (f"INSERT INTO `{BENCH_DATABASE}`.`{table}` ({', '.join(f'`{name}`' for name, _ in columns)}) "
+                  f"VALUES ({placeholders})")
+
+    batch = []
+    for i in range(rows):
+        row = []
+        for name, column_type in columns:
+            if name in key_columns:
+                row.append(key_value(table, name, i))
+            elif column_type.startswith("varchar"):
+                row.append(filler)
+            elif column_type.startswith("char"):
+                row.append(filler[:int(column_type[5:-1])])
+            else:
+                row.append(None)
+        batch.append(tuple(row))
+        if len(batch) == INSERT_BATCH:
+            cursor.executemany(insert_sql, batch)
+            batch = []
+    if batch:
+        cursor.executemany(insert_sql, batch)
+
+
+def bytes_sent(connection):
+    cursor = connection.cursor()
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    value = int(cursor.fetchone()[1])
+    cursor.close()
+    return value
+
+
+def select_star(connection, engine, ids):
+    """The pre-projection path: new dictionary cursor, SELECT *, fetchone."""
+    query_sql, id_names, _ = engine.queries[0]
+    table = engine.spec.table
+    where = query_sql.split(" WHERE ", 1)[1].replace(" LIMIT 1", "")
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(f"SELECT * FROM {table} WHERE {where}", tuple(ids[name] for name in id_names))
+    result = cursor.fetchone()
+    cursor.fetchall()
+    cursor.close()
+    return result
+
+
+def run(label, fn, connection, engine, keys):
+    before = bytes_sent(connection)
+    start = time.perf_counter()
+    found = sum(1 for ids in keys if fn(connection, engine, ids))
+    elapsed = time.perf_counter() - start
+    wire = bytes_sent(connection) - before
+    return f"{label} {found / elapsed:9.0f} rows/s {wire / len(keys):8.0f} B/lookup"
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    admin = mysql.connector.connect(host=DB_CONFIG["host"], user=DB_CONFIG["user"], password=DB_CONFIG["password"])
+    cursor = admin.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DATABASE}`")
+
+    print(f"{rows} rows per table, {lookups} lookups per path")
+    for category, engine in LOOKUP_ENGINES.items():
+        lookup = engine.spec.lookups[0]
+        id_names = lookup.ids or lookup.columns
+        build_table(cursor, engine.spec.table, lookup.columns, rows)
+        admin.commit()
+
+        connection = mysql.connector.connect(**dict(DB_CONFIG, database=BENCH_DATABASE))
+        keys = []
+        for i in random.sample(range(rows), min(lookups, rows)):
+            ids = {id_pattern.name: None for id_pattern in engine.spec.ids}
+            ids.update((name, key_value(engine.spec.table, column, i)) for name, column in zip(id_names, lookup.columns))
+            keys.append(ids)
+
+        star = run("SELECT *  ", select_star, connection, engine, keys)
+        projected = run("projected ", lambda conn, eng, ids: eng.fetch(conn, ids), connection, engine, keys)
+        print(f"{category:<38} {star} | {projected}")
+        connection.close()
+
+    cursor.close()
+    admin.close()
@@ -0,0 +1,82 @@
+"""Micro-benchmark: reply rendering per category, compiled templates vs. str.format.
+
+For each of the 17 database-backed categories a synthetic row is rendered as
+a reply (half of them taking the variant, e.g. closed by BUPA, where the
+category has one) and as a not-found reply, both the old way (a values dict
+with ``datetime.now().strftime`` and ``str.format_map`` on the template
+string) and with the engine's compiled ``templates.TEMPLATES`` entry. Outputs
+must be identical. No database is needed. Run from the ``Main`` directory:
+
+    python benchmarks/bench_render.py [renders per category]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper_functions import LOOKUP_ENGINES
+from templates import DATE_FORMAT
+
+
+def legacy_render(engine, result, ids, query):
+    """LookupEngine.render before the templates were compiled."""
+    spec = engine.spec
+    values = dict(ids, date=datetime.now().strftime(DATE_FORMAT))
+    for name, column, default in engine.fields:
+        values[name] = result.get(column, default)
+    if spec.derive is not None:
+        values.update(spec.derive(result, query))
+    variant = spec.variant
+    if variant is not None:
+        value = str(result.get(variant.column) or "").lower()
+        for needle in variant.needles:
+            if needle in value:
+                return variant.template.format_map(values)
+    return spec.template.format_map(values)
+
+
+def legacy_not_found(engine, ids):
+    values = {name: value or "Unknown" for name, value in ids.items()}
+    values["date"] = datetime.now().strftime(DATE_FORMAT)
+    values["ids"] = " and ".join(f"{id_pattern.label}: {ids[id_pattern.name]}"
+                                 for id_pattern in engine.spec.ids if ids[id_pattern.name])
+    return engine.spec.not_found.format_map(values)
+
+
+def sample(engine, variant):
+    ids = {id_pattern.name: f"{id_pattern.name.upper()}-1042" for id_pattern in engine.spec.ids}
+    row = {column: f"Sample {column.replace('_', ' ')} text" for column in engine.columns}
+    if variant and engine.spec.variant:
+        row[engine.spec.variant.column] = f"Closed by {engine.spec.variant.needles[0].upper()}"
+    return row, ids, "Please add the part to the agreement, quote id: 1234567890"
+
+
+def per_call(fn, args, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'category':<40} {'old us':>8} {'new us':>8} {'not-found old':>14} {'new':>6}")
+    totals = [0.0] * 4
+    for category, engine in LOOKUP_ENGINES.items():
+        timings = [0.0] * 4
+        for variant in (False, True):
+            row, ids, query = sample(engine, variant)
+            assert engine.format(row, ids, query) == legacy_render(engine, row, ids, query), category
+            assert engine.render_not_found(ids) == legacy_not_found(engine, ids), category
+            timings[0] += per_call(legacy_render, (engine, row, ids, query), repeat) / 2
+            timings[1] += per_call(engine.format, (row, ids, query), repeat) / 2
+            timings[2] += per_call(legacy_not_found, (engine, ids), repeat) / 2
+            timings[3] += per_call(engine.render_not_found, (ids,), repeat) / 2
+        totals = [total + timing for total, timing in zip(totals, timings)]
+        print(f"{category:<40} {timings[0]:8.2f} {timings[1]:8.2f} {timings[2]:14.2f} {timings[3]:6.2f}")
+    count = len(LOOKUP_ENGINES)
+    print(f"{'mean over ' + str(count) + ' categories':<40} {totals[0] / count:8.2f} {totals[1] / count:8.2f} "
+          f"{totals[2] / count:14.2f} {totals[3] / count:6.2f}")
+    print(f"speedup: replies {totals[0] / totals[1]:.2f}x, not-found {totals[2] / totals[3]:.2f}x; outputs identical")
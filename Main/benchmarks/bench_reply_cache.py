@@ -0,0 +1,82 @@
+"""Repeat questions: replies rendered every time vs. served from the reply cache.
+
+Emails ask about quote and opportunity IDs drawn from a skewed distribution
+(a few IDs asked about again and again, as customers follow up on the same
+quote), across the categories keyed by a single ID. The lookups read an
+SQLite copy of the workbook (``database.load_sqlite``) with the row cache on
+in both runs; the second run also has the reply cache. Run from the ``Main``
+directory:
+
+    python benchmarks/bench_reply_cache.py [emails]
+"""
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lookup_engine
+from Database.database import EXCEL_FILE, load_sqlite
+from entities import QTID
+from helper_functions import LOOKUP_ENGINES
+from row_cache import RowCache
+from storage import SQLiteStorage
+
+
+def make_emails(path, count):
+    """(engine, email) pairs asking about existing IDs, most often about the same few."""
+    connection = sqlite3.connect(path)
+    pool = []
+    for engine in LOOKUP_ENGINES.values():
+        if engine.multi_id is None:
+            continue
+        name, _, _, kind, _ = engine.patterns[0]
+        column = engine.spec.lookups[0].columns[0]
+        for (value,) in connection.execute(f"SELECT `{column}` FROM `{engine.spec.table}` LIMIT 50"):
+            text = f"QTID{value}" if kind == QTID else str(value)
+            if engine.extract_ids(text)[name] == str(value).upper():
+                pool.append((engine, f"Hi, any update on {text}? Thanks"))
+    connection.close()
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    return random.choices(pool, weights=weights, k=count)
+
+
+def run(emails):
+    start = time.perf_counter()
+    replies = [engine(email) for engine, email in emails]
+    return (time.perf_counter() - start) / len(emails) * 1e6, replies
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(24)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        os.environ["ROW_CACHE_STAMP"] = os.path.join(tmp, "versions.json")
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_sqlite(EXCEL_FILE, path)
+        lookup_engine.storage = SQLiteStorage(path)
+        emails = make_emails(path, count)
+
+        print(f"{count} emails over {len({email for _, email in emails})} distinct questions, SQLite, row cache on")
+        print(f"{'reply cache':<12} {'us/email':>9} {'hit rate':>9}")
+        results = []
+        for enabled in (False, True):
+            lookup_engine.row_cache = RowCache()
+            lookup_engine.reply_cache = RowCache(max_size=20000 if enabled else 0, ttl_seconds=3600,
+                                                 negative_ttl_seconds=0)
+            with contextlib.redirect_stdout(io.StringIO()):
+                per_email, replies = run(emails)
+            stats = lookup_engine.reply_cache.stats
+            lookups = stats["hits"] + stats["misses"]
+            print(f"{'on' if enabled else 'off':<12} {per_email:9.1f} "
+                  f"{stats['hits'] / lookups if lookups else 0:9.1%}")
+            results.append((per_email, replies))
+        assert results[0][1] == results[1][1], "cached replies differ from rendered ones"
+        print(f"speedup: {results[0][0] / results[1][0]:.2f}x, replies identical")
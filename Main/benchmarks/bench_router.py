@@ -0,0 +1,109 @@
+"""Micro-benchmark: compiled keyword router vs. the original elif chain.
+
+Run from the ``Main`` directory:
+
+    python benchmarks/bench_router.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router import keyword_router
+
+
+def legacy_route(question):
+    """The original substring chain from route_question, without the prints."""
+    if "pos" in question and ("replace" in question or "update" in question):
+        return "pos_replace"
+    elif "price" in question or "pricing" in question or "discount" in question or "validity" in question:
+        return "general_pricing_queries"
+    elif "piggyback" in question and ("create" in question or "creation" in question or "new" in question):
+        return "piggyback_creation"
+    elif "add" in question and "piggyback" in question:
+        return "adding_parts_to_piggyback"
+    elif any(keyword in question for keyword in ["ship", "debit", "s&d", "fsa", "sandd"]) and not "claim" in question:
+        return "ship_and_debit_queries"
+    elif "reject" in question and "sfdc" in question and not "incorrect" in question:
+        return "opportunities_rejected_sfdc"
+    elif "pending approval" in question and "sfdc" in question:
+        return "pending_approval_sfdc"
+    elif "closed" in question and "gpms" in question and "document" in question:
+        return "quote_closed_gpms_no_document"
+    elif "not reach" in question and "pricing" in question:
+        return "quote_not_reaching_pricing"
+    elif "customer data" in question or "data enquiry" in question or "data request" in question:
+        return "customer_data_enquiries"
+    elif "pending" in question and "gpms" in question:
+        return "quotes_pending_review_gpms"
+    elif "pending" in question and "sfdc" in question and "opportunity" in question:
+        return "opportunities_pending_review_sfdc"
+    elif "incorrect" in question and "reject" in question:
+        return "opportunity_rejected_incorrectly_sfdc"
+    elif "loa" in question or "letter of authorization" in question:
+        return "loa_related_queries"
+    elif "claim" in question and any(term in question for term in ["s&d", "ship", "debit", "reject"]):
+        return "s_and_d_claim_rejection"
+    elif "agreement" in question and ("part" in question or "pn" in question):
+        return "agreement_pn_addition_removal"
+    elif "te.com" in question or "website" in question or "spr" in question:
+        return "te_com_issues"
+    elif "product" in question and any(term in question for term in ["spec", "detail", "information", "available"]):
+        return "product_enquiry"
+    elif "feedback" in question or "suggestion" in question:
+        return "feedback"
+    elif "complaint" in question or "dissatisfied" in question:
+        return "complaint"
+    return None
+
+
+FILLER = (
+    "Thanks for the quick turnaround on this. As discussed on the call, the team "
+    "will follow up with the customer next week regarding the purpose of the "
+    "spring rollout and the corresponding forecast numbers for the region. "
+)
+
+OPENINGS = [
+    "Hi team, can you check why quote 5008486211 has not reached pricing yet?",
+    "Hello, my opportunity OPP829168 is pending review in sfdc, please advise.",
+    "Please help with the LOA for request LOA30283.",
+    "Hi, I'd like to share some feedback on the new portal.",
+    "Can you confirm the status of my order? Thanks.",
+]
+
+
+def make_email(size_bytes, rng):
+    """Build a long email: a short new message followed by a quoted thread."""
+    parts = [rng.choice(OPENINGS), "\n\nRegards,\nJane\n"]
+    depth = 0
+    while sum(len(p) for p in parts) < size_bytes:
+        depth += 1
+        prefix = "> " * depth
+        parts.append(f"\n{prefix}On Mon, Jan {depth % 28 + 1}, 2024 at 10:00 AM John Doe wrote:\n")
+        for _ in range(rng.randint(3, 8)):
+            parts.append(prefix + FILLER + "\n")
+    return "".join(parts)[:size_bytes]
+
+
+def bench(label, fn, emails, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for email in emails:
+            fn(email)
+    elapsed = time.perf_counter() - start
+    per_email = elapsed / (repeat * len(emails)) * 1e6
+    print(f"{label:<12} {per_email:10.1f} us/email")
+
+
+if __name__ == "__main__":
+    rng = random.Random(42)
+    for size_kb in (10, 25, 50):
+        emails = [make_email(size_kb * 1024, rng) for _ in range(50)]
+        print(f"\n--- {size_kb} KB emails ---")
+        bench("legacy", legacy_route, emails, repeat=20)
+        bench("compiled", keyword_router.route, emails, repeat=20)
+
+        disagreements = sum(legacy_route(e) != keyword_router.route(e) for e in emails)
+        print(f"routing differs on {disagreements}/{len(emails)} emails (substring false positives)")
@@ -0,0 +1,151 @@
+"""Lookup latency from 1K to 10M rows: loader schema (typed, keyed) vs. the old all-VARCHAR schema.
+
+Needs the MySQL server from ``db_pool.DB_CONFIG`` and pandas. The table of one
+sheet is recreated in a scratch database at each size, once with the DDL the
+loader now generates (``table_definition``) and once the old way (VARCHAR(255)
+everywhere, no keys), and filled server-side from a digits cross join. Keys
+keep the sheet's format (``OPP`` + base-36 counter of the same width). The
+lookup is the reply service's own prepared statement. The old schema does a
+full scan per lookup, so it is only measured up to ``LEGACY_MAX_ROWS``. Run
+from the ``Main`` directory:
+
+    python benchmarks/bench_scaling.py [table] [lookups]
+"""
+import math
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+import pandas as pd
+
+from Database.database import EXCEL_FILE, HASH_COLUMN, SheetProfile, read_sheet, table_definition
+from db_pool import DB_CONFIG
+from helper_functions import LOOKUP_ENGINES
+
+BENCH_DATABASE = os.environ.get("BENCH_DATABASE", "TE_Email_Bench")
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+LEGACY_MAX_ROWS = 1_000_000
+BASE36 = string.digits + string.ascii_uppercase
+
+
+def key_format(sample):
+    """(prefix, width) of an ID like OPP379423; numeric IDs have no prefix."""
+    sample = str(sample)
+    prefix = re.match(r"\D*", sample).group()
+    return prefix, len(sample) - len(prefix)
+
+
+def key_sql(prefix, width, numeric):
+    if numeric:
+        return "n + 1000000000"
+    return f"CONCAT('{prefix}', LPAD(CONV(n, 10, 36), {width}, '0'))"
+
+
+def key_value(prefix, width, numeric, n):
+    if numeric:
+        return n + 1000000000
+    digits = ""
+    while True:
+        n, remainder = divmod(n, 36)
+        digits = BASE36[remainder] + digits
+        if not n:
+            break
+    return prefix + digits.rjust(width, "0")
+
+
+def legacy_definition(table, df):
+    return (f"CREATE TABLE `{table}` ("
+            + ", ".join(f"`{col}` {'BIGINT UNSIGNED' if col == 'quote_id' else 'VARCHAR(255)'}" for col in df.columns)
+            + ")")
+
+
+def fill(cursor, table, df, keys, rows, hashed):
+    """INSERT ... SELECT ``rows`` rows: key columns from a counter, every other column the sheet's first value."""
+    digits = max(1, math.ceil(math.log10(rows)))
+    n = " + ".join(f"d{i}.d * {10 ** i}" for i in range(digits))
+    tables = ", ".join(f"digits d{i}" for i in range(digits))
+    select, params = [], []
+    for col in df.columns:
+        value = df[col].iloc[0]
+        if col in keys:
+            select.append(key_sql(*keys[col]))
+        elif pd.isna(value):
+            select.append("NULL")
+        else:
+            select.append("%s")
+            params.append(value.item() if hasattr(value, "item") else value)
+    columns = list(df.columns)
+    if hashed:
+        columns.append(HASH_COLUMN)
+        select.append("MD5(n)")
+    cursor.execute(f"INSERT INTO `{table}` ({', '.join(f'`{col}`' for col in columns)}) "
+                   f"SELECT {', '.join(select)} FROM (SELECT {n} AS n FROM {tables}) seq WHERE n < {rows}", params)
+
+
+def measure(connection, query_sql, values, lookups):
+    cursor = connection.cursor(prepared=True, dictionary=True)
+    timings = []
+    for value in random.choices(values, k=lookups):
+        start = time.perf_counter()
+        cursor.execute(query_sql, (value,))
+        found = cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+        assert found, value
+    cursor.close()
+    timings.sort()
+    return timings[len(timings) // 2] * 1e3, timings[int(len(timings) * 0.99)] * 1e3
+
+
+if __name__ == "__main__":
+    table = sys.argv[1] if len(sys.argv) > 1 else "06_sfdc_rejection_queries"
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    engine = next(engine for engine in LOOKUP_ENGINES.values() if engine.spec.table == table)
+    query_sql, _, key_columns = engine.queries[0]
+
+    sheet = next(name for name in pd.ExcelFile(EXCEL_FILE).sheet_names
+                 if name.strip().replace(" ", "_").lower() == table)
+    df = read_sheet(EXCEL_FILE, sheet)
+    key_names = {column for lookup in engine.spec.lookups for column in lookup.columns}
+    keys = {col: key_format(df[col].iloc[0]) + (df[col].dtype.kind in "iu",) for col in key_names}
+    # Widen the counter so 10M keys fit in the sheet's ID width
+    keys = {col: (prefix, max(width, 5), numeric) for col, (prefix, width, numeric) in keys.items()}
+    typed_sql = table_definition(table, SheetProfile.of_frame(table, df))
+    for col, (prefix, width, numeric) in keys.items():
+        if not numeric:
+            typed_sql = re.sub(rf"`{re.escape(col)}` CHAR\(\d+\)", f"`{col}` CHAR({len(prefix) + width})", typed_sql)
+
+    admin = mysql.connector.connect(host=DB_CONFIG["host"], user=DB_CONFIG["user"], password=DB_CONFIG["password"])
+    cursor = admin.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DATABASE}`")
+    cursor.execute(f"USE `{BENCH_DATABASE}`")
+    cursor.execute("DROP TABLE IF EXISTS digits")
+    cursor.execute("CREATE TABLE digits (d TINYINT PRIMARY KEY)")
+    cursor.executemany("INSERT INTO digits VALUES (%s)", [(d,) for d in range(10)])
+    admin.commit()
+
+    connection = mysql.connector.connect(**dict(DB_CONFIG, database=BENCH_DATABASE))
+    print(f"{table}: {lookups} lookups per size on {key_columns} (p50 / p99 ms)")
+    print(f"{'rows':>10} {'typed + keyed':>18} {'old VARCHAR schema':>22}")
+    for rows in SIZES:
+        results = []
+        for label, definition in (("typed", typed_sql), ("legacy", legacy_definition(table, df))):
+            if label == "legacy" and rows > LEGACY_MAX_ROWS:
+                results.append(f"{'(skipped)':>22}")
+                continue
+            cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+            cursor.execute(definition)
+            fill(cursor, table, df, keys, rows, hashed=label == "typed")
+            admin.commit()
+            values = [key_value(*keys[key_columns[0]], random.randrange(rows)) for _ in range(1000)]
+            p50, p99 = measure(connection, query_sql, values, lookups if label == "typed" else max(20, lookups // 50))
+            results.append(f"{p50:9.3f} / {p99:7.3f}" if label == "typed" else f"{p50:11.3f} / {p99:8.3f}")
+        print(f"{rows:>10} {results[0]:>18} {results[1]:>22}")
+    connection.close()
+    cursor.close()
+    admin.close()
@@ -0,0 +1,101 @@
+"""Lookup latency per storage backend: MySQL server vs. embedded SQLite vs. memory-mapped snapshot.
+
+The SQLite file and the snapshot are built from the workbook into a
+temporary directory (``database.load_sqlite``, ``database.export_snapshot``);
+the MySQL side uses the database loaded by ``Database/database.py``
+(``db_pool.DB_CONFIG``) and is skipped when the server is unreachable. Every
+lookup runs the category's first lookup for an ID sampled from the table,
+like an email that misses the row cache (disabled here): the database
+backends check out a connection, the snapshot needs none. Run from the
+``Main`` directory:
+
+    python benchmarks/bench_storage.py [lookups]
+"""
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lookup_engine
+from Database.database import EXCEL_FILE, export_snapshot, load_sqlite
+from db_pool import DatabaseUnavailable
+from helper_functions import LOOKUP_ENGINES
+from row_cache import RowCache
+from snapshot import SnapshotStore
+from storage import MySQLStorage, SQLiteStorage
+
+
+def sample_ids(path, per_table=200):
+    """(engine, ids) pairs for keys that exist, read from the SQLite copy of the workbook."""
+    connection = sqlite3.connect(path)
+    requests = []
+    for engine in LOOKUP_ENGINES.values():
+        _, id_names, key_columns = engine.queries[0]
+        rows = connection.execute(
+            f"SELECT {', '.join(f'`{column}`' for column in key_columns)} FROM `{engine.spec.table}` "
+            f"LIMIT {per_table}").fetchall()
+        for row in rows:
+            ids = {id_pattern.name: None for id_pattern in engine.spec.ids}
+            ids.update(zip(id_names, (str(value) for value in row)))
+            requests.append((engine, ids))
+    connection.close()
+    return requests
+
+
+def database_lookup(engine, ids):
+    with lookup_engine.db_connection() as connection:
+        return engine.fetch(connection, ids)
+
+
+def snapshot_lookup(engine, ids):
+    return engine.cached(ids)[0]
+
+
+def measure(lookup, requests, lookups):
+    for engine, ids in requests[:100]:  # open connections, prepare statements, map the files
+        lookup(engine, ids)
+    timings, found = [], 0
+    for engine, ids in random.choices(requests, k=lookups):
+        start = time.perf_counter()
+        found += lookup(engine, ids) is not None
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return (timings[len(timings) // 2] * 1e6, timings[int(len(timings) * 0.99)] * 1e6,
+            lookups / sum(timings), found)
+
+
+if __name__ == "__main__":
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lookup_engine.row_cache = RowCache(max_size=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        # Keep the reply service's row-cache stamp out of it
+        os.environ["ROW_CACHE_STAMP"] = os.path.join(tmp, "versions.json")
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_sqlite(EXCEL_FILE, path)
+            export_snapshot(EXCEL_FILE, os.path.join(tmp, "snapshot"))
+        requests = sample_ids(path)
+
+        print(f"{lookups} lookups over {len(LOOKUP_ENGINES)} tables, row cache off (microseconds)")
+        print(f"{'backend':<8} {'p50':>8} {'p99':>8} {'lookups/s':>10} {'found':>7}")
+        for backend in (MySQLStorage(), SQLiteStorage(path)):
+            lookup_engine.storage = backend
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    p50, p99, rate, found = measure(database_lookup, requests, lookups)
+            except DatabaseUnavailable as err:
+                print(f"{backend.name:<8} skipped: {err}")
+                continue
+            print(f"{backend.name:<8} {p50:8.1f} {p99:8.1f} {rate:10.0f} {found:7}")
+
+        lookup_engine.snapshot_store = SnapshotStore(os.path.join(tmp, "snapshot"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            p50, p99, rate, found = measure(snapshot_lookup, requests, lookups)
+        print(f"{'snapshot':<8} {p50:8.1f} {p99:8.1f} {rate:10.0f} {found:7}")
@@ -0,0 +1,140 @@
+"""Quoted history stripping: bytes and tokens passed downstream, before and after.
+
+Builds a sample corpus of support emails: short new messages (the
+``Main.py`` test queries and the ``bench_entities`` openers) sent as they are,
+as Gmail-style replies (``On ... wrote:`` and ``>``-quoted history), as
+Outlook replies (``From:`` / ``Sent:`` header blocks, history unquoted) and
+with signatures, mobile footers and disclaimers. Every email is stripped with
+``thread_stripper.strip_thread`` and the new message must come out whole,
+with the same IDs as the message on its own. Tokens are counted the way
+``fast_classifier`` splits text (a proxy for the LLM tokenizer, which is not
+available offline). First, ``REGRESSIONS`` checks the IDs ``Main.initial_state``
+finds in emails whose ID sits after a sign-off, in a signature or in a body
+line that looks like a header. Run from the ``Main`` directory:
+
+    python benchmarks/bench_thread_stripper.py [emails] [quoted replies per email]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_entities import OPENERS, QUOTED, fill
+from Main import initial_state
+from entities import ENTITY_PATTERNS, QTID, scan_entities
+from fast_classifier import TOKEN_PATTERN
+from thread_stripper import strip_thread
+
+QUERIES = [
+    "I need to update the POS on my quote QTID1",
+    "Can I get a price discount on my order, my quote id is QTID45?",
+    "How do I create a new piggyback for ABC Manufacturing my request_id PBK93584, Distributor D Ltd?",
+    "How do I setup a ship and debit agreement my QTID5008486211?",
+    "My opportunity is pending review in sfdc, opp id OPP829168",
+    "I need help with an LOA, request id LOA30283",
+    "I need to add parts to my agreement, agreement id AGR98468 and part number PN-857267",
+    "I can't access TE.com",
+]
+SIGNATURES = [
+    "",
+    "\n\nThanks,\nSam\n",
+    "\n\nBest regards,\nPriya Nair\nPurchasing Manager | ACME Distribution\nPhone +1 555 0199\n",
+    "\n\nRegards\nTom\n\nSent from my iPhone\n",
+    "\n\nThanks & Regards,\nLi Wei\nACME Distribution\n\nCONFIDENTIALITY NOTICE: This e-mail and any attachments are "
+    "confidential and intended solely for the addressee. If you received it in error, please delete it.\n",
+]
+HISTORY_SIGNATURE = "\nBest regards,\nJane Doe\nPricing Desk | TE Connectivity\nPhone +1 555 0100 ext {ext}\n"
+
+
+# (email, QTID values its state must hold)
+REGRESSIONS = [
+    ("Hi team,\nPlease update the POS.\nThanks,\nQuote ID: QTID5\n", ["5"]),
+    ("Hi team,\nPlease update the POS.\nThanks\nJohn Smith\nAccount Manager\nQTID77", ["77"]),
+    ("Please move the quote.\nFrom: ACME Corp, who no longer distribute it\nTo: Beta Ltd: they take over\n"
+     "QTID8 is the quote.\n", ["8"]),
+    ("Please update the POS.\n--\nSam Lee | ref QTID3\nPricing\n", ["3"]),
+    # IDs only in the quoted history are not the question
+    ("Any update?\n\nRegards,\nSam\n\n________________________________\nFrom: Jane <pricing@te.com>\n"
+     "Sent: Monday, January 1, 2024 9:00 AM\nTo: Sam\nSubject: RE: QTID42\n\nQTID42 is approved.\n", []),
+]
+
+
+def check_regressions():
+    for email, expected in REGRESSIONS:
+        found = [entity.value for entity in initial_state(email)["entities"].all(QTID)]
+        assert found == expected, (email, found)
+
+
+def gmail_history(replies):
+    parts = []
+    for depth in range(replies):
+        marks = ">" * (depth + 1)
+        parts.append(f"\n{marks} On Mon, Jan {depth % 28 + 1}, 2024 at 9:{depth % 60:02d} AM Jane Doe "
+                     f"<pricing@te.com> wrote:\n")
+        body = [fill(random.choice(QUOTED)) for _ in range(random.randint(2, 5))]
+        body.append(fill(HISTORY_SIGNATURE))
+        parts.extend(f"{marks} {line}\n" for text in body for line in text.strip().splitlines())
+    return "\nOn Tue, Jan 30, 2024 at 4:12 PM Jane Doe <pricing@te.com> wrote:\n" + "".join(parts)
+
+
+def outlook_history(replies):
+    parts = []
+    for depth in range(replies):
+        parts.append(f"\n________________________________\nFrom: Jane Doe <pricing@te.com>\n"
+                     f"Sent: Monday, January {depth % 28 + 1}, 2024 9:{depth % 60:02d} AM\n"
+                     f"To: Sam <sam@acme.com>\nSubject: RE: Quote update\n\n")
+        parts.extend(fill(random.choice(QUOTED)) + "\n" for _ in range(random.randint(2, 5)))
+        parts.append(fill(HISTORY_SIGNATURE))
+    return "".join(parts)
+
+
+def make_email(replies):
+    """(email, new message) with a random history style."""
+    message = random.choice(QUERIES) if random.random() < 0.5 else fill(random.choice(OPENERS))
+    new = message + random.choice(SIGNATURES)
+    style = random.choice(("none", "gmail", "outlook"))
+    if style == "gmail":
+        return new + gmail_history(replies), message
+    if style == "outlook":
+        return new + outlook_history(replies), message
+    return new, message
+
+
+def ids(text):
+    found = scan_entities(text)
+    return {kind: [entity.value for entity in found.all(kind)] for kind in ENTITY_PATTERNS}
+
+
+def tokens(text):
+    return len(TOKEN_PATTERN.findall(text.lower()))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    replies = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    random.seed(25)
+    check_regressions()
+    corpus = [make_email(random.randint(0, replies)) for _ in range(count)]
+
+    start = time.perf_counter()
+    stripped = [strip_thread(email) for email, _ in corpus]
+    elapsed = time.perf_counter() - start
+
+    for (email, message), result in zip(corpus, stripped):
+        assert result.original is email
+        assert result.text.startswith(message), (result.text[:200], message)
+        assert ids(result.text) == ids(message), result.text[:200]
+
+    before = [(len(email.encode()), tokens(email)) for email, _ in corpus]
+    after = [(len(result.text.encode()), tokens(result.text)) for result in stripped]
+    bytes_before, tokens_before = map(sum, zip(*before))
+    bytes_after, tokens_after = map(sum, zip(*after))
+    print(f"{count} emails, 0-{replies} quoted replies each, "
+          f"{sum(result.stripped for result in stripped)} with history or signatures stripped")
+    print(f"{'':<8} {'before':>10} {'after':>10} {'reduction':>10}")
+    print(f"{'bytes':<8} {bytes_before:10} {bytes_after:10} {1 - bytes_after / bytes_before:10.1%}")
+    print(f"{'tokens':<8} {tokens_before:10} {tokens_after:10} {1 - tokens_after / tokens_before:10.1%}")
+    print(f"stripping: {elapsed / count * 1e6:.1f} us/email; new messages and their IDs kept whole, "
+          f"{len(REGRESSIONS)} regression emails read correctly")
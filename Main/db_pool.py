@@ -0,0 +1,130 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import pooling
+
+from metrics import (DB_POOL_IN_USE, DB_POOL_RECONNECTS, DB_POOL_SIZE, DB_POOL_TIMEOUTS,
+                     DB_POOL_WAITS, timer)
+
+# Connection settings (defaults match the loader in Database/database.py)
+DB_CONFIG = {
+    "host": os.environ.get("MYSQL_HOST", "localhost"),
+    "user": os.environ.get("MYSQL_USER", "root"),
+    "password": os.environ.get("MYSQL_PASSWORD", "12345678"),
+    "database": os.environ.get("MYSQL_DATABASE", "TE_Email_Custom_Database"),
+}
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "5"))
+
+# Attribute on the physical connection holding its prepared cursors, keyed by SQL
+_PREPARED_ATTR = "_email_reply_prepared"
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when no healthy connection could be checked out of the pool."""
+
+
+class ConnectionPool:
+    """Thread-safe MySQL connection pool.
+
+    Wraps ``mysql.connector.pooling.MySQLConnectionPool`` (which fails
+    immediately when exhausted) with a semaphore so callers wait up to
+    ``timeout`` seconds for a free connection. Every checkout is health-checked
+    (``is_connected`` pings the server) and reconnected if it went stale.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT, **config):
+        self.size = size
+        self.timeout = timeout
+        self.config = config or dict(DB_CONFIG)
+        self._slots = threading.BoundedSemaphore(size)
+        self._pool = None
+        self._init_lock = threading.Lock()
+        DB_POOL_SIZE.set(size)
+
+    def _get_pool(self):
+        # Created on first checkout: MySQLConnectionPool opens every connection up front
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=f"email_reply_{id(self)}",
+                        pool_size=self.size,
+                        pool_reset_session=False,
+                        **self.config
+                    )
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Check out a healthy connection; it returns to the pool on exit."""
+        if not self._slots.acquire(blocking=False):
+            DB_POOL_WAITS.inc()
+            with timer("db_pool_wait"):
+                acquired = self._slots.acquire(timeout=self.timeout)
+            if not acquired:
+                DB_POOL_TIMEOUTS.inc()
+                raise DatabaseUnavailable(f"no free connection after {self.timeout:.1f}s")
+
+        try:
+            with timer("db_connect"):
+                try:
+                    connection = self._get_pool().get_connection()
+                    # Health check before reuse; reconnects a stale connection in place
+                    if not connection.is_connected():
+                        DB_POOL_RECONNECTS.inc()
+                        forget_prepared(connection)
+                        connection.reconnect(attempts=2, delay=0)
+                except mysql.connector.Error as err:
+                    print(f" Database Error: {err}")
+                    raise DatabaseUnavailable(str(err)) from err
+        except BaseException:
+            self._slots.release()
+            raise
+
+        DB_POOL_IN_USE.inc()
+        try:
+            yield connection
+        except mysql.connector.Error:
+            # The server may have dropped the session and its statements with it
+            forget_prepared(connection)
+            raise
+        finally:
+            DB_POOL_IN_USE.dec()
+            connection.close()
+            self._slots.release()
+
+
+def _physical(connection):
+    # PooledMySQLConnection is a fresh wrapper per checkout; the socket lives in _cnx
+    return getattr(connection, "_cnx", connection)
+
+
+def prepared_cursor(connection, query_sql: str):
+    """Server-side prepared dictionary cursor for ``query_sql``.
+
+    Cursors are kept on the physical connection, so a statement is prepared
+    once per pooled connection and reused by every later checkout (the pool
+    does not reset sessions, which would deallocate them).
+    """
+    cursors = _physical(connection).__dict__.setdefault(_PREPARED_ATTR, {})
+    cursor = cursors.get(query_sql)
+    if cursor is None:
+        cursor = cursors[query_sql] = connection.cursor(prepared=True, dictionary=True)
+    return cursor
+
+
+def forget_prepared(connection) -> None:
+    """Drop cached prepared cursors, e.g. after a reconnect invalidated them."""
+    cursors = _physical(connection).__dict__.pop(_PREPARED_ATTR, None)
+    for cursor in (cursors or {}).values():
+        try:
+            cursor.close()
+        except mysql.connector.Error:
+            pass
+
+
+# Shared by MySQLStorage (storage.py)
+db_pool = ConnectionPool()
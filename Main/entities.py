@@ -0,0 +1,126 @@
+"""Identifiers found in an email, extracted once and shared.
+
+Every ID the router and the handlers look for is an entity kind with one
+compiled pattern here. ``scan_entities`` returns an ``Entities`` bundle for an
+email that is made once (``Main.py`` keeps it in the graph state) and answers
+``first(kind)`` / ``all(kind)`` with typed ``Entity`` tuples (kind, value,
+start, end), so the router's quote-number check and the handler's ID
+extraction never search the same text for the same kind twice.
+
+Each kind is searched lazily, at most once per email, and ``first`` stops at
+the first match. That is deliberate: Python's ``re`` only skips quickly
+through text to a literal prefix (``QTID``, ``claim``), and one alternation of
+all kinds has to be tried at almost every character of a long quoted thread,
+which measured 15-90x slower than these searches
+(``benchmarks/bench_entities.py``).
+"""
+import re
+from typing import Dict, List, NamedTuple, Optional, Pattern
+
+QTID = "qtid"                              # digits after QTID
+QUOTE_NUMBER = "quote_number"              # first 10 digits of a run of 10 or more
+OPPORTUNITY_NUMBER = "opportunity_number"  # first 9 digits of a run of 9 or more
+BARE_QUOTE_NUMBER = "bare_quote_number"    # exactly 10 digits standing alone
+OPP = "opp"
+REQUEST = "request"                        # piggyback creation requests
+CUSTOMER_REQUEST = "customer_request"      # customer data requests
+PGB = "pgb"
+ADD = "add"
+LOA = "loa"
+AGR = "agr"
+PN = "pn"
+CLAIM = "claim"                            # after "claim id:"
+QUOTE_REF = "quote_ref"                    # 10 digits after "quote id:"
+ISSUE = "issue"                            # after "issue id:" / "issue ticket"
+PART = "part"                              # after "part number:" / "pn" / "p/n"
+
+# Group 1 is the value when the pattern has one, else the whole match
+ENTITY_PATTERNS: Dict[str, Pattern] = {
+    QTID: re.compile(r'QTID(\d+)'),
+    QUOTE_NUMBER: re.compile(r'#?(\d{10})'),
+    OPPORTUNITY_NUMBER: re.compile(r'#?(\d{9})'),
+    BARE_QUOTE_NUMBER: re.compile(r'\b\d{10}\b'),
+    OPP: re.compile(r'OPP\d+'),
+    REQUEST: re.compile(r'PBK\d+|P\d+|REQ\d+'),
+    CUSTOMER_REQUEST: re.compile(r'REQ\d+|CUST\d+|CDE\d+'),
+    PGB: re.compile(r'PGB-\d+'),
+    ADD: re.compile(r'ADD\d+'),
+    LOA: re.compile(r'LOA\d+'),
+    AGR: re.compile(r'AGR\d+'),
+    PN: re.compile(r'PN-\d+'),
+    CLAIM: re.compile(r'claim\s+(?:id|#)?\s*[:=]?\s*(\w+[-\d]*)'),
+    QUOTE_REF: re.compile(r'quote\s+(?:id|#)?\s*[:=]?\s*#?(\d{10})'),
+    ISSUE: re.compile(r'issue\s+(?:id|#|ticket)?\s*[:=]?\s*(\w+[-\d]*)'),
+    PART: re.compile(r'(?:part|pn|p/n)\s+(?:number|#)?\s*[:=]?\s*(\w+[-\d]*)'),
+}
+# all() lists whole numbers only: the prefix patterns above would chop a longer
+# digit run into IDs the email never mentions, so only first() takes a prefix
+LIST_PATTERNS: Dict[str, Pattern] = {
+    QUOTE_NUMBER: re.compile(r'(?<!\d)#?(\d{10})(?!\d)'),
+    OPPORTUNITY_NUMBER: re.compile(r'(?<!\d)#?(\d{9})(?!\d)'),
+}
+_GROUPS = {kind: 1 if pattern.groups else 0 for kind, pattern in ENTITY_PATTERNS.items()}
+
+
+class Entity(NamedTuple):
+    kind: str
+    value: str
+    start: int
+    end: int
+
+
+def _entity(kind: str, match: re.Match) -> Entity:
+    group = _GROUPS[kind]
+    return Entity(kind, match.group(group), match.start(group), match.end(group))
+
+
+class Entities:
+    """Identifiers of one email, each kind searched on first use."""
+
+    __slots__ = ("text", "_first", "_all")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._first: Dict[str, Optional[Entity]] = {}
+        self._all: Dict[str, List[Entity]] = {}
+
+    def first(self, kind: str) -> Optional[Entity]:
+        """Earliest entity of ``kind``, or None."""
+        try:
+            return self._first[kind]
+        except KeyError:
+            pass
+        found = self._all.get(kind) if kind not in LIST_PATTERNS else None
+        if found is not None:
+            entity = found[0] if found else None
+        else:
+            match = ENTITY_PATTERNS[kind].search(self.text)
+            entity = _entity(kind, match) if match else None
+        self._first[kind] = entity
+        return entity
+
+    def all(self, kind: str) -> List[Entity]:
+        """Every (non-overlapping) entity of ``kind``, in text order."""
+        found = self._all.get(kind)
+        if found is None:
+            pattern = LIST_PATTERNS.get(kind) or ENTITY_PATTERNS[kind]
+            found = self._all[kind] = [_entity(kind, match) for match in pattern.finditer(self.text)]
+        return found
+
+    @property
+    def empty(self) -> bool:
+        """Whether the email holds no entity of any kind (each kind searched until one is found)."""
+        return all(self.first(kind) is None for kind in ENTITY_PATTERNS)
+
+    @property
+    def items(self) -> List[Entity]:
+        """Every entity of every kind, in text order."""
+        return sorted((entity for kind in ENTITY_PATTERNS for entity in self.all(kind)),
+                      key=lambda entity: entity.start)
+
+    def __repr__(self) -> str:
+        return f"Entities({self.items!r})"
+
+
+def scan_entities(text: str) -> Entities:
+    return Entities(text)
@@ -0,0 +1,205 @@
+"""Local hashed n-gram classifier used as a cascade stage before the LLM router.
+
+Routing decisions are logged as JSON lines (ROUTING_LOG_PATH). The classifier is
+trained from that log and stored as a NumPy ``.npz`` file. At runtime it answers
+only when its confidence clears the threshold; otherwise the query escalates
+to the LLM.
+
+    python fast_classifier.py train routing_log.jsonl
+    python fast_classifier.py evaluate routing_log.jsonl
+"""
+import argparse
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from routing_cache import normalize_query
+from routing_log import ROUTING_LOG_PATH, read_routing_log
+
+# Next to this module, so the service, the train CLI and the benchmarks share one file wherever they run
+MODEL_PATH = os.environ.get("FAST_CLASSIFIER_PATH",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "fast_classifier.npz"))
+CONFIDENCE_THRESHOLD = float(os.environ.get("FAST_CLASSIFIER_THRESHOLD", "0.85"))
+
+N_FEATURES = 2 ** 16
+TOKEN_PATTERN = re.compile(r"<\w+>|[a-z0-9&.]+")
+
+
+def extract_features(query: str, n_features: int = N_FEATURES) -> np.ndarray:
+    """Hash word unigrams and bigrams of the normalized query into feature indices."""
+    tokens = TOKEN_PATTERN.findall(normalize_query(query))
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return np.unique(np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams), dtype=np.int64, count=len(grams)
+    ))
+
+
+class FastClassifier:
+    """Multinomial logistic regression over hashed binary n-gram features."""
+
+    def __init__(self, classes: List[str], weights: np.ndarray, bias: np.ndarray,
+                 version: int = 1, trained_at: float = 0.0, n_samples: int = 0):
+        self.classes = list(classes)
+        self.weights = weights
+        self.bias = bias
+        self.version = version
+        self.trained_at = trained_at
+        self.n_samples = n_samples
+
+    def predict_proba(self, query: str) -> np.ndarray:
+        features = extract_features(query, self.weights.shape[0])
+        logits = self.bias.copy()
+        if len(features):
+            logits += self.weights[features].sum(axis=0) / np.sqrt(len(features))
+        logits -= logits.max()
+        probs = np.exp(logits)
+        return probs / probs.sum()
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        """Return the most likely category and its probability."""
+        probs = self.predict_proba(query)
+        best = int(probs.argmax())
+        return self.classes[best], float(probs[best])
+
+    @classmethod
+    def train(cls, samples: List[Tuple[str, str]], epochs: int = 8, learning_rate: float = 0.5,
+              l2: float = 1e-6, version: int = 1, seed: int = 0) -> "FastClassifier":
+        """Fit with plain SGD on (query, category) pairs."""
+        classes = sorted({category for _, category in samples})
+        class_index = {category: i for i, category in enumerate(classes)}
+        weights = np.zeros((N_FEATURES, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+
+        encoded = [(extract_features(query), class_index[category]) for query, category in samples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(encoded)
+            rate = learning_rate / (1 + epoch)
+            for features, label in encoded:
+                scale = 1 / np.sqrt(len(features)) if len(features) else 0.0
+                logits = bias + weights[features].sum(axis=0) * scale
+                logits -= logits.max()
+                probs = np.exp(logits)
+                probs /= probs.sum()
+                probs[label] -= 1.0
+                weights[features] -= rate * (probs * scale + l2 * weights[features])
+                bias -= rate * probs
+
+        return cls(classes, weights, bias, version=version, trained_at=time.time(), n_samples=len(samples))
+
+    def save(self, path: str) -> None:
+        """Write the model atomically so running workers never read a partial file."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            weights=self.weights,
+            bias=self.bias,
+            classes=np.array(self.classes),
+            meta=np.array([self.version, self.trained_at, self.n_samples], dtype=np.float64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FastClassifier":
+        with np.load(path) as data:
+            version, trained_at, n_samples = data["meta"]
+            return cls([str(c) for c in data["classes"]], data["weights"], data["bias"],
+                       version=int(version), trained_at=float(trained_at), n_samples=int(n_samples))
+
+
+_model: Optional[FastClassifier] = None
+_model_mtime: Optional[float] = None
+_model_lock = threading.Lock()
+
+
+def get_model() -> Optional[FastClassifier]:
+    """Load (or reload after retraining) the model at MODEL_PATH; None if absent."""
+    global _model, _model_mtime
+    try:
+        mtime = os.path.getmtime(MODEL_PATH)
+    except OSError:
+        return None
+    if mtime != _model_mtime:
+        with _model_lock:
+            if mtime != _model_mtime:
+                _model = FastClassifier.load(MODEL_PATH)
+                _model_mtime = mtime
+                print(f"🧠 Loaded fast classifier v{_model.version} ({_model.n_samples} samples)")
+    return _model
+
+
+def classify_locally(query: str, threshold: float = CONFIDENCE_THRESHOLD) -> Optional[str]:
+    """Return a category if the local model is confident enough, else None (escalate)."""
+    model = get_model()
+    if model is None:
+        return None
+    category, confidence = model.predict(query)
+    if confidence < threshold:
+        return None
+    print(f"🧠 Fast classifier routing to: {category} ({confidence:.2f})")
+    return category
+
+
+def evaluate(records: List[Dict], holdout: float = 0.2, seed: int = 0) -> None:
+    """Train on a split of the log and report how many LLM calls the model would remove."""
+    records = list(records)
+    random.Random(seed).shuffle(records)
+    split = int(len(records) * (1 - holdout))
+    train_set, test_set = records[:split], records[split:]
+
+    # Only emails the LLM actually routed count towards LLM savings
+    llm_test = [r for r in test_set if r.get("source") == "llm"] or test_set
+    model = FastClassifier.train([(r["query"], r["category"]) for r in train_set])
+    predictions = [model.predict(r["query"]) for r in llm_test]
+
+    print(f"Trained on {len(train_set)} samples; evaluating on {len(llm_test)} LLM-routed samples\n")
+    print("threshold | LLM calls removed | accuracy when answered | overall accuracy")
+    for threshold in (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95):
+        answered = [(p, r) for p, r in zip(predictions, llm_test) if p[1] >= threshold]
+        correct = sum(p[0] == r["category"] for p, r in answered)
+        removed = len(answered) / len(llm_test) if llm_test else 0.0
+        precision = correct / len(answered) if answered else 0.0
+        # Escalated samples are assumed correct, since the LLM answers them
+        overall = (correct + len(llm_test) - len(answered)) / len(llm_test) if llm_test else 0.0
+        print(f"{threshold:9.2f} | {removed:17.1%} | {precision:22.1%} | {overall:16.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train or evaluate the local routing classifier.")
+    parser.add_argument("command", choices=["train", "evaluate", "info"])
+    parser.add_argument("log", nargs="?", default=ROUTING_LOG_PATH, help="Routing decision log (JSON lines)")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model file to write or inspect")
+    parser.add_argument("--epochs", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        model = FastClassifier.load(args.model)
+        print(f"version {model.version}, trained {time.ctime(model.trained_at)}, "
+              f"{model.n_samples} samples, {len(model.classes)} classes")
+        return
+
+    if not args.log:
+        parser.error("a routing log path is required (or set ROUTING_LOG_PATH)")
+    records = read_routing_log(args.log)
+
+    if args.command == "evaluate":
+        evaluate(records)
+        return
+
+    version = 1
+    if os.path.exists(args.model):
+        version = FastClassifier.load(args.model).version + 1
+    model = FastClassifier.train([(r["query"], r["category"]) for r in records],
+                                 epochs=args.epochs, version=version)
+    model.save(args.model)
+    print(f"✅ Saved fast classifier v{model.version} ({model.n_samples} samples) to {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""LLM routing: category schema, compact prompts and the Groq client.
+
+Nothing here is imported until the first query misses the rule router, so
+rule-only workers never load langchain or build a Groq client.
+"""
+import os
+import threading
+from typing import List, Literal
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.pydantic_v1 import BaseModel, Field
+
+Category = Literal[
+    "pos_replace",
+    "general_pricing_queries",
+    "piggyback_creation",
+    "adding_parts_to_piggyback",
+    "ship_and_debit_queries",
+    "opportunities_rejected_sfdc",
+    "pending_approval_sfdc",
+    "quote_closed_gpms_no_document",
+    "quote_not_reaching_pricing",
+    "customer_data_enquiries",
+    "quotes_pending_review_gpms",
+    "opportunities_pending_review_sfdc",
+    "opportunity_rejected_incorrectly_sfdc",
+    "loa_related_queries",
+    "s_and_d_claim_rejection",
+    "agreement_pn_addition_removal",
+    "te_com_issues",
+    "product_enquiry",
+    "feedback",
+    "complaint",
+    "fallback"
+]
+
+class RouteQuery(BaseModel):
+    """Route a user query to the correct processing logic."""
+    category: Category = Field(..., description="Classify the user query into one of 21 specific routes.")
+
+class BatchRouteItem(BaseModel):
+    """Routing decision for one query in a batch."""
+    index: int = Field(..., description="The [index] of the query in the batch.")
+    category: Category = Field(..., description="Classify the user query into one of 21 specific routes.")
+
+class BatchRouteQuery(BaseModel):
+    """Route a batch of user queries, one category per query."""
+    routes: List[BatchRouteItem] = Field(..., description="One routing decision per query, in input order.")
+
+# Compact routing prompt: one short line per category. The reply is constrained
+# to the RouteQuery schema, so the model never writes a free-text explanation.
+ROUTER_SYSTEM_PROMPT = """Route TE Connectivity support emails to exactly one category:
+pos_replace: POS replacement/update on a quote
+general_pricing_queries: price adjustment, volume discount, validity, extension
+piggyback_creation: create piggyback under an OEM agreement
+adding_parts_to_piggyback: add parts/POS customers to an existing piggyback
+ship_and_debit_queries: Ship & Debit, FSA to S&D, POS/end customer address
+opportunities_rejected_sfdc: opportunity rejected in SFDC
+pending_approval_sfdc: opportunity pending approval in SFDC
+quote_closed_gpms_no_document: quote closed in GPMS, document missing
+quote_not_reaching_pricing: quote raised but not reaching pricing
+customer_data_enquiries: customer data request
+quotes_pending_review_gpms: quote pending review in GPMS
+opportunities_pending_review_sfdc: opportunity pending review in SFDC
+opportunity_rejected_incorrectly_sfdc: opportunity wrongly rejected in SFDC
+loa_related_queries: Letter of Authorization (LOA)
+s_and_d_claim_rejection: S&D claim rejected
+agreement_pn_addition_removal: add/remove part numbers on an agreement
+te_com_issues: TE.com problems, cannot raise SPR, PN issues
+product_enquiry: general product question
+feedback: feedback or suggestion
+complaint: complaint
+fallback: none of the above
+"""
+
+router_prompt = ChatPromptTemplate.from_messages([
+    ("system", ROUTER_SYSTEM_PROMPT),
+    ("human", "{question}")
+])
+
+# Batch prompt: several queries per request, one structured decision each
+batch_router_prompt = ChatPromptTemplate.from_messages([
+    ("system", ROUTER_SYSTEM_PROMPT + """
+You will receive {count} queries, each prefixed with its [index].
+Return exactly one category for every index.
+"""),
+    ("human", "{questions}")
+])
+
+_llm = None
+_router_chain = None
+_batch_router_chain = None
+_init_lock = threading.Lock()
+
+def get_llm():
+    """Build the Groq client on first use."""
+    global _llm
+    if _llm is None:
+        with _init_lock:
+            if _llm is None:
+                from langchain_groq import ChatGroq
+                
+                # Get API key from environment
+                groq_api_key = os.environ.get("GROQ_API_KEY")
+                if not groq_api_key:
+                    raise ValueError("GROQ_API_KEY is not set")
+                _llm = ChatGroq(groq_api_key=groq_api_key, model_name="llama-3.3-70b-versatile")
+    return _llm
+
+def get_router_chain():
+    """Single-query structured-output routing chain, built on first use."""
+    global _router_chain
+    if _router_chain is None:
+        _router_chain = router_prompt | get_llm().with_structured_output(RouteQuery, include_raw=True)
+    return _router_chain
+
+def get_batch_router_chain():
+    """Batch structured-output routing chain, built on first use."""
+    global _batch_router_chain
+    if _batch_router_chain is None:
+        _batch_router_chain = batch_router_prompt | get_llm().with_structured_output(BatchRouteQuery, include_raw=True)
+    return _batch_router_chain
+
+# Running totals across all routing calls
+llm_usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+llm_usage_lock = threading.Lock()
+
+def record_llm_usage(label, raw, elapsed):
+    """Report prompt/completion token counts and latency for one LLM call."""
+    usage = getattr(raw, "usage_metadata", None) or {}
+    token_usage = getattr(raw, "response_metadata", {}).get("token_usage", {})
+    prompt_tokens = usage.get("input_tokens", token_usage.get("prompt_tokens", 0))
+    completion_tokens = usage.get("output_tokens", token_usage.get("completion_tokens", 0))
+    
+    with llm_usage_lock:
+        llm_usage["calls"] += 1
+        llm_usage["prompt_tokens"] += prompt_tokens
+        llm_usage["completion_tokens"] += completion_tokens
+        llm_usage["seconds"] += elapsed
+    print(f"🧾 {label}: {prompt_tokens} prompt + {completion_tokens} completion tokens in {elapsed * 1000:.0f} ms")
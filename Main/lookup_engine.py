@@ -0,0 +1,450 @@
+"""Table-driven database lookups.
+
+Every database-backed category is described by a ``CategorySpec`` (table, IDs
+to extract, key columns, fields, templates). ``LookupEngine`` does the shared
+work for all of them: extract IDs, fetch the row over a pooled connection,
+pick the template variant and render it. Patterns, SQL and templates
+(compiled into ``templates.TEMPLATES``) are built once when the spec is
+defined, not on every email.
+
+Lookups select only the columns the reply uses and go to the configured
+``storage`` backend: MySQL runs them as server-side prepared statements,
+prepared once per pooled connection; SQLite reads a local file. Rows (and
+not-found results) are read through ``row_cache``; an email answered
+entirely from the cache never checks out a connection. Tables held by a
+memory-mapped ``snapshot`` (when ``SNAPSHOT_DIR`` is set) are answered from it
+instead, without the cache or a connection.
+
+Rendered replies are kept in ``reply_cache`` without their date header, keyed
+by table, IDs, the row's ``_row_hash`` and any values derived from the email,
+so a repeat question about an unchanged row skips the templating (and, with
+the row cached, the database). A changed row has a new hash and never hits an
+old reply; reloads also drop the table's replies, like its cached rows.
+
+``answer_batch`` answers many emails together: the IDs still missing from the
+cache are grouped per table and resolved with one ``WHERE key IN (...)`` query
+per chunk of at most ``BATCH_PARAMS`` parameters.
+
+An email listing several IDs of a single-ID category (e.g. twenty quote IDs
+pasted by a distributor) gets one combined reply: all of them are resolved
+with the same IN() queries and rendered as one section per ID found, followed
+by the IDs that were not.
+"""
+import os
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+from db_pool import DatabaseUnavailable
+from entities import ENTITY_PATTERNS, Entities, scan_entities
+from metrics import DB_NOT_FOUND, current_category, timer
+from row_cache import MISS, match_key, reply_cache, row_cache
+from snapshot import snapshot_store
+from storage import storage
+from tables import Lookup
+from templates import SECTION_SEPARATOR, SIGNATURE, register, reply_header
+
+# Per-row fingerprint written by the loader (database.HASH_COLUMN); keys reply_cache
+ROW_HASH_COLUMN = "_row_hash"
+CONNECT_ERROR = " Unable to connect to the database. Please try again later."
+# Most placeholders bound into one IN() query by answer_batch
+BATCH_PARAMS = int(os.environ.get("LOOKUP_BATCH_PARAMS", "1000"))
+
+
+class IdPattern(NamedTuple):
+    """An identifier to find in the email; group 1 is used when the pattern has one.
+
+    With ``entity`` set, ``pattern`` is that entity kind's and the ID is taken
+    from the email's shared ``Entities`` instead, cut to ``width`` characters.
+    """
+    name: str
+    label: str
+    pattern: Pattern
+    entity: Optional[str] = None
+    width: Optional[int] = None
+
+
+def entity_id(name: str, label: str, kind: str, width: Optional[int] = None) -> IdPattern:
+    """An identifier that is an entity kind of ``entities.py``."""
+    return IdPattern(name, label, ENTITY_PATTERNS[kind], kind, width)
+
+
+class Field(NamedTuple):
+    """Template placeholder filled from ``column`` (defaults to ``name``) of the row."""
+    name: str
+    default: Any = "N/A"
+    column: Optional[str] = None
+
+
+class VariantRule(NamedTuple):
+    """Render ``template`` instead when ``column`` contains any of ``needles`` (e.g. closed by BUPA)."""
+    column: str
+    needles: Tuple[str, ...]
+    template: str
+
+
+class CategorySpec(NamedTuple):
+    category: str
+    table: str
+    ids: Tuple[IdPattern, ...]
+    lookups: Tuple[Lookup, ...]
+    fields: Tuple[Field, ...]
+    template: str
+    not_found: str
+    # Reply when none of the IDs is present; None looks the row up regardless
+    missing_id: Optional[str] = None
+    variant: Optional[VariantRule] = None
+    # Extra placeholders computed from (row, query), and the row columns it reads
+    derive: Optional[Callable[[Dict[str, Any], str], Dict[str, Any]]] = None
+    derive_columns: Tuple[str, ...] = ()
+
+
+def projected_columns(spec: CategorySpec) -> Tuple[str, ...]:
+    """Columns a category's replies read, in first-use order."""
+    columns = [field.column or field.name for field in spec.fields]
+    if spec.variant:
+        columns.append(spec.variant.column)
+    columns.extend(spec.derive_columns)
+    return tuple(dict.fromkeys(columns))
+
+
+def cached_row(key):
+    """Row for ``key`` from the snapshot when it holds the table, else from the row cache (or ``MISS``)."""
+    result = snapshot_store.get(key)
+    return row_cache.get(key) if result is MISS else result
+
+
+def db_connection():
+    """Connection from the storage backend for a lookup; released on exit."""
+    return storage.connection()
+
+
+def fetch_one(cursor, query_sql: str, params: tuple) -> Optional[Dict[str, Any]]:
+    """Run a single-row (LIMIT 1) lookup, recording its latency and not-found results."""
+    with timer("db_query") as labels:
+        cursor.execute(query_sql, params)
+        # fetchall drains the result so the prepared cursor can be executed again
+        rows = cursor.fetchall()
+    result = rows[0] if rows else None
+    if not result:
+        DB_NOT_FOUND.inc(category=labels["category"])
+    return result
+
+
+class LookupEngine:
+    """Answers emails for one category from its ``CategorySpec``."""
+
+    def __init__(self, spec: CategorySpec):
+        self.spec = spec
+        self.columns = projected_columns(spec) + (ROW_HASH_COLUMN,)
+        select = ", ".join(f"`{column}`" for column in self.columns)
+        self.queries = tuple(
+            (f"SELECT {select} FROM `{spec.table}` WHERE "
+             + " AND ".join(f"`{column}` = %s" for column in lookup.columns) + " LIMIT 1",
+             lookup.ids or lookup.columns, lookup.columns)
+            for lookup in spec.lookups
+        )
+        self.patterns = tuple((id_pattern.name, id_pattern.pattern, 1 if id_pattern.pattern.groups else 0,
+                               id_pattern.entity, id_pattern.width)
+                              for id_pattern in spec.ids)
+        self.fields = tuple((field.name, field.column or field.name, field.default) for field in spec.fields)
+        self.id_names = tuple(id_pattern.name for id_pattern in spec.ids)
+        # Categories keyed by one ID answer every ID an email lists
+        self.multi_id = spec.ids[0] if len(spec.ids) == 1 and len(spec.lookups) == 1 else None
+        self.templates = register(spec.category, spec.template, spec.not_found,
+                                  spec.variant.template if spec.variant else None)
+        self.__name__ = f"lookup_{spec.category}"
+
+    def extract_ids(self, query: str, entities: Optional[Entities] = None) -> Dict[str, Optional[str]]:
+        """IDs of the spec found in ``query``; ``entities`` is the email's bundle when the caller has one."""
+        with timer("id_extraction"):
+            if entities is None:
+                entities = scan_entities(query)
+            ids = {}
+            for name, pattern, group, kind, width in self.patterns:
+                if kind:
+                    entity = entities.first(kind)
+                    ids[name] = entity.value[:width].upper() if entity else None
+                else:
+                    match = pattern.search(query)
+                    ids[name] = match.group(group).upper() if match else None
+            return ids
+
+    def extract_id_sets(self, query: str, entities: Optional[Entities] = None) -> List[Dict[str, Optional[str]]]:
+        """One ids dict per distinct ID the email lists, in order; just ``extract_ids`` unless ``multi_id``."""
+        if self.multi_id is None:
+            return [self.extract_ids(query, entities)]
+        if entities is None:
+            entities = scan_entities(query)
+        with timer("id_extraction"):
+            name, pattern, group, kind, width = self.patterns[0]
+            if kind:
+                # A lone ID inside a longer digit run is still read the way first() reads it
+                found = entities.all(kind) or list(filter(None, [entities.first(kind)]))
+                values = [entity.value[:width].upper() for entity in found]
+            else:
+                values = [match.group(group).upper() for match in pattern.finditer(query)]
+            return [{name: value} for value in dict.fromkeys(values)] or [{name: None}]
+
+    def cached(self, ids: Dict[str, Optional[str]]) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        """Answer from the row cache: ``(row, None)`` when resolved, ``(None, i)`` when lookup i is uncached."""
+        table = self.spec.table
+        for i, (query_sql, id_names, key_columns) in enumerate(self.queries):
+            params = tuple([ids[name] for name in id_names])
+            if None in params:
+                continue
+            result = cached_row((table, key_columns, params))
+            if result is MISS:
+                return None, i
+            if result:
+                return result, None
+        return None, None
+
+    def fetch(self, connection, ids: Dict[str, Optional[str]], start: int = 0) -> Optional[Dict[str, Any]]:
+        """Try each lookup in order whose IDs were all found; first row wins.
+
+        Lookup ``start`` goes straight to the database; later fallbacks read
+        through the row cache. Every database result is cached.
+        """
+        table = self.spec.table
+        for i, (query_sql, id_names, key_columns) in enumerate(self.queries[start:], start):
+            params = tuple([ids[name] for name in id_names])
+            if None in params:
+                continue
+            key = (table, key_columns, params)
+            result = cached_row(key) if i > start else MISS
+            if result is MISS:
+                result = fetch_one(storage.lookup_cursor(connection, query_sql), query_sql, params)
+                row_cache.put(key, result)
+            if result:
+                return result
+        return None
+
+    def fetch_many(self, connection, lookup: int, keys: Sequence[tuple]) -> Dict[tuple, Dict[str, Any]]:
+        """Rows for many keys of lookup ``lookup``, one IN() query per chunk; keyed by ``match_key``."""
+        key_columns = self.queries[lookup][2]
+        select = ", ".join(f"`{column}`" for column in dict.fromkeys(self.columns + key_columns))
+        if len(key_columns) == 1:
+            target, placeholder = f"`{key_columns[0]}`", "%s"
+        else:
+            target = "(" + ", ".join(f"`{column}`" for column in key_columns) + ")"
+            placeholder = "(" + ", ".join(["%s"] * len(key_columns)) + ")"
+        per_chunk = max(1, BATCH_PARAMS // len(key_columns))
+
+        rows = {}
+        cursor = storage.cursor(connection)
+        try:
+            for start in range(0, len(keys), per_chunk):
+                chunk = keys[start:start + per_chunk]
+                query_sql = (f"SELECT {select} FROM `{self.spec.table}` "
+                             f"WHERE {target} IN ({', '.join([placeholder] * len(chunk))})")
+                with timer("db_batch_query", self.spec.category):
+                    cursor.execute(query_sql, [value for key in chunk for value in key])
+                    for row in cursor.fetchall():
+                        # Several rows per key: keep the first, like LIMIT 1
+                        rows.setdefault(match_key(row[column] for column in key_columns), row)
+        finally:
+            cursor.close()
+        return rows
+
+    def render(self, result: Dict[str, Any], ids: Dict[str, Optional[str]], query: str) -> str:
+        """The reply for a found row; its body comes from ``reply_cache`` when this row version was rendered before."""
+        spec = self.spec
+        derived = spec.derive(result, query) if spec.derive is not None else None
+        row_hash = result.get(ROW_HASH_COLUMN)
+        key = None
+        if row_hash is not None:
+            key = (spec.table, self.id_names, tuple([ids[name] for name in self.id_names]), row_hash,
+                   tuple(derived.values()) if derived else ())
+            cached = reply_cache.get(key)
+            if cached is not MISS:
+                template, body = cached
+                return template.with_header(body)
+        with timer("template_render"):
+            template, values = self.fill(result, ids, derived)
+            body = template.render_body(values)
+        if key is not None and not template.body_dated:
+            reply_cache.put(key, (template, body))
+        return template.with_header(body)
+
+    def format(self, result: Dict[str, Any], ids: Dict[str, Optional[str]], query: str,
+               section: bool = False) -> str:
+        """Fill the template from ``result``; with ``section``, the body without header and signature."""
+        spec = self.spec
+        template, values = self.fill(result, ids, spec.derive(result, query) if spec.derive is not None else None,
+                                     section)
+        return template.render(values)
+
+    def fill(self, result: Dict[str, Any], ids: Dict[str, Optional[str]], derived: Optional[Dict[str, Any]],
+             section: bool = False):
+        """The template (variant or not) for ``result`` and the values to render it with."""
+        spec = self.spec
+        templates = self.templates
+        if section:
+            template, variant_template = templates.section, templates.variant_section
+        else:
+            template, variant_template = templates.reply, templates.variant
+        values = dict(ids)
+        for name, column, default in self.fields:
+            values[name] = result.get(column, default)
+        if derived:
+            values.update(derived)
+
+        variant = spec.variant
+        if variant is not None:
+            value = str(result.get(variant.column) or "").lower()
+            for needle in variant.needles:
+                if needle in value:
+                    return variant_template, values
+        return template, values
+
+    def render_not_found(self, ids: Dict[str, Optional[str]]) -> str:
+        values = {name: value or "Unknown" for name, value in ids.items()}
+        values["ids"] = " and ".join(f"{id_pattern.label}: {ids[id_pattern.name]}"
+                                     for id_pattern in self.spec.ids if ids[id_pattern.name])
+        return self.templates.not_found.render(values)
+
+    def render_combined(self, id_sets: Sequence[Dict[str, Optional[str]]],
+                        results: Sequence[Optional[Dict[str, Any]]], query: str) -> str:
+        """One reply for several IDs: a section per ID found, then a summary of those not found."""
+        name, label = self.multi_id.name, self.multi_id.label
+        with timer("template_render"):
+            sections, missing = [], []
+            for ids, result in zip(id_sets, results):
+                if result:
+                    sections.append(self.format(result, ids, query, section=True))
+                else:
+                    missing.append(ids[name])
+            parts = [f"**Found {len(sections)} of the {len(id_sets)} {label}s in your email.**"]
+            parts.extend(sections)
+            if missing:
+                parts.append(f"**No information found for {len(missing)} {label}(s):** {', '.join(missing)}  \n"
+                             f"Please verify these IDs and try again.")
+            return reply_header() + SECTION_SEPARATOR.join(parts) + "\n\n" + SIGNATURE
+
+    def answer_many(self, id_sets: Sequence[Dict[str, Optional[str]]], query: str) -> str:
+        """Combined reply for several IDs, resolved together by ``resolve_batch``."""
+        try:
+            results = resolve_batch([(self, ids) for ids in id_sets])
+        except DatabaseUnavailable:
+            return CONNECT_ERROR
+        except storage.errors as err:
+            print(f" Database Error: {err}")
+            return f" Database Error: {err}"
+        return self.render_combined(id_sets, results, query)
+
+    def __call__(self, query: str, entities: Optional[Entities] = None) -> str:
+        spec = self.spec
+        id_sets = self.extract_id_sets(query, entities)
+        if len(id_sets) > 1:
+            return self.answer_many(id_sets, query)
+        ids = id_sets[0]
+        if spec.missing_id and not any(ids.values()):
+            return spec.missing_id
+
+        result, start = self.cached(ids)
+        try:
+            if start is not None:
+                with db_connection() as connection:
+                    result = self.fetch(connection, ids, start)
+        except DatabaseUnavailable:
+            return CONNECT_ERROR
+        except storage.errors as err:
+            print(f" Database Error: {err}")
+            return f" Database Error: {err}"
+
+        if not result:
+            return self.render_not_found(ids)
+        return self.render(result, ids, query)
+
+
+def resolve_batch(requests: Sequence[Tuple[LookupEngine, Dict[str, Optional[str]]]]) -> List[Optional[Dict[str, Any]]]:
+    """Row (or None) for each ``(engine, ids)``, in order, with one IN() query per table and lookup.
+
+    Fallback lookups (e.g. claim ID, then quote ID) run as a further round
+    for the requests the previous round did not find. A connection is only
+    checked out when something is missing from the row cache.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+    steps = [0] * len(requests)
+    pending = range(len(requests))
+    with ExitStack() as stack:
+        connection = None
+        while pending:
+            # (engine, lookup) -> key params -> positions of the requests waiting on it
+            groups: Dict[Tuple[LookupEngine, int], Dict[tuple, List[int]]] = {}
+            for position in pending:
+                engine, ids = requests[position]
+                for lookup in range(steps[position], len(engine.queries)):
+                    _, id_names, key_columns = engine.queries[lookup]
+                    params = tuple([ids[name] for name in id_names])
+                    if None in params:
+                        continue
+                    result = cached_row((engine.spec.table, key_columns, params))
+                    if result is MISS:
+                        groups.setdefault((engine, lookup), {}).setdefault(params, []).append(position)
+                        steps[position] = lookup + 1
+                        break
+                    if result:
+                        results[position] = result
+                        break
+
+            pending = []
+            for (engine, lookup), waiting in groups.items():
+                if connection is None:
+                    connection = stack.enter_context(db_connection())
+                key_columns = engine.queries[lookup][2]
+                rows = engine.fetch_many(connection, lookup, list(waiting))
+                for params, positions in waiting.items():
+                    result = rows.get(match_key(params))
+                    row_cache.put((engine.spec.table, key_columns, params), result)
+                    if result:
+                        for position in positions:
+                            results[position] = result
+                    else:
+                        DB_NOT_FOUND.inc(category=engine.spec.category)
+                        pending.extend(positions)
+    return results
+
+
+def answer_batch(requests: Sequence[Tuple[LookupEngine, str]],
+                 entities: Optional[Sequence[Entities]] = None) -> List[str]:
+    """Replies for many ``(engine, email)`` pairs, resolving their rows together.
+
+    ``entities`` are the emails' ``Entities`` bundles when the caller already has them.
+    An email listing several IDs adds one lookup per ID and gets the combined reply.
+    """
+    replies: List[Optional[str]] = [None] * len(requests)
+    lookups = []
+    for position, (engine, query) in enumerate(requests):
+        id_sets = engine.extract_id_sets(query, entities[position] if entities is not None else None)
+        if engine.spec.missing_id and len(id_sets) == 1 and not any(id_sets[0].values()):
+            replies[position] = engine.spec.missing_id
+        else:
+            lookups.append((position, engine, id_sets, query))
+
+    try:
+        rows = resolve_batch([(engine, ids) for _, engine, id_sets, _ in lookups for ids in id_sets])
+    except DatabaseUnavailable:
+        rows, error = None, CONNECT_ERROR
+    except storage.errors as err:
+        print(f" Database Error: {err}")
+        rows, error = None, f" Database Error: {err}"
+
+    offset = 0
+    for position, engine, id_sets, query in lookups:
+        if rows is None:
+            replies[position] = error
+            continue
+        token = current_category.set(engine.spec.category)
+        try:
+            results = rows[offset:offset + len(id_sets)]
+            offset += len(id_sets)
+            if len(id_sets) > 1:
+                replies[position] = engine.render_combined(id_sets, results, query)
+            elif results[0]:
+                replies[position] = engine.render(results[0], id_sets[0], query)
+            else:
+                replies[position] = engine.render_not_found(id_sets[0])
+        finally:
+            current_category.reset(token)
+    return replies
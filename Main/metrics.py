@@ -0,0 +1,278 @@
+"""In-process latency histograms and counters with Prometheus text exposition.
+
+Stages are timed with ``timer(stage)``; the category label defaults to the
+category of the handler currently running (set by ``instrument_handler``).
+Expose the numbers with ``start_metrics_server(port)`` (GET /metrics),
+``dump_metrics(path)``, or print ``latency_report()`` for p50/p95/p99.
+"""
+import atexit
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Category of the email being handled on this thread / task
+current_category: contextvars.ContextVar = contextvars.ContextVar("current_category", default="unrouted")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+# Label sets seen so far -> sorted key; label cardinality is small (stage x category)
+_label_keys: Dict[tuple, LabelKey] = {}
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    items = tuple(labels.items())
+    key = _label_keys.get(items)
+    if key is None:
+        key = _label_keys[items] = tuple(sorted((name, str(value)) for name, value in items))
+    return key
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, with labels."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels and bucket-interpolated quantiles."""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, key: LabelKey) -> int:
+        return self._series[key][2]
+
+    def series(self) -> List[LabelKey]:
+        with self._lock:
+            return sorted(self._series)
+
+    def quantile(self, q: float, key: LabelKey) -> float:
+        """Estimate a quantile the way PromQL's histogram_quantile does."""
+        with self._lock:
+            counts, _, total = self._series[key]
+            counts = list(counts)
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((key, list(counts), total_sum, count)
+                              for key, (counts, total_sum, count) in self._series.items())
+        for key, counts, total_sum, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total_sum:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+STAGE_LATENCY = Histogram("email_stage_latency_seconds", "Latency of each processing stage.")
+ROUTING_DECISIONS = Counter("email_routing_decisions_total", "Routing decisions by source (rules, cache, local, llm).")
+DB_NOT_FOUND = Counter("email_db_not_found_total", "Database lookups that returned no row.")
+ERRORS = Counter("email_errors_total", "Errors raised or reported per stage.")
+DB_POOL_SIZE = Gauge("email_db_pool_size", "Configured size of the database connection pool.")
+DB_POOL_IN_USE = Gauge("email_db_pool_in_use", "Pooled connections currently checked out.")
+DB_POOL_WAITS = Counter("email_db_pool_waits_total", "Checkouts that had to wait for a free connection.")
+DB_POOL_TIMEOUTS = Counter("email_db_pool_timeouts_total", "Checkouts that gave up waiting for a connection.")
+DB_POOL_RECONNECTS = Counter("email_db_pool_reconnects_total", "Stale pooled connections that were reconnected.")
+ROW_CACHE_LOOKUPS = Counter("email_row_cache_lookups_total", "Row cache lookups per table by result (hits, negative_hits, misses).")
+SNAPSHOT_LOOKUPS = Counter("email_snapshot_lookups_total", "Snapshot lookups per table by result (found, not_found).")
+REPLY_CACHE_LOOKUPS = Counter("email_reply_cache_lookups_total", "Rendered reply cache lookups per table by result (hits, misses).")
+
+REGISTRY = [STAGE_LATENCY, ROUTING_DECISIONS, DB_NOT_FOUND, ERRORS,
+            DB_POOL_SIZE, DB_POOL_IN_USE, DB_POOL_WAITS, DB_POOL_TIMEOUTS, DB_POOL_RECONNECTS,
+            ROW_CACHE_LOOKUPS, SNAPSHOT_LOOKUPS, REPLY_CACHE_LOOKUPS]
+
+
+class timer:
+    """Time a stage; the body may set ``labels["category"]`` once it is known.
+
+    A plain class rather than ``@contextmanager``: it wraps microsecond-scale
+    stages, where the generator machinery would cost more than the work.
+    """
+
+    __slots__ = ("stage", "labels", "start")
+
+    def __init__(self, stage: str, category: Optional[str] = None):
+        self.stage = stage
+        self.labels = {"category": category or current_category.get()}
+
+    def __enter__(self) -> Dict[str, str]:
+        self.start = time.perf_counter()
+        return self.labels
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        category = self.labels["category"]
+        if exc_type is not None and issubclass(exc_type, Exception):
+            ERRORS.inc(stage=self.stage, category=category)
+        STAGE_LATENCY.observe(time.perf_counter() - self.start, stage=self.stage, category=category)
+        return False
+
+
+def instrument_handler(category: str, handler):
+    """Run ``handler`` with its category as the default label and time it as a whole."""
+    @functools.wraps(handler)
+    def instrumented(state):
+        token = current_category.set(category)
+        try:
+            with timer("handler", category):
+                return handler(state)
+        finally:
+            current_category.reset(token)
+    return instrumented
+
+
+def render_metrics() -> str:
+    """All metrics in Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def latency_report() -> str:
+    """p50/p95/p99 per stage and category, estimated from the histogram buckets."""
+    rows = ["stage              category                               count      p50      p95      p99"]
+    for key in STAGE_LATENCY.series():
+        labels = dict(key)
+        count = STAGE_LATENCY.count(key)
+        p50, p95, p99 = (STAGE_LATENCY.quantile(q, key) * 1000 for q in (0.5, 0.95, 0.99))
+        rows.append(f"{labels['stage']:<18} {labels['category']:<38} {count:5d} "
+                    f"{p50:7.1f}ms {p95:7.1f}ms {p99:7.1f}ms")
+    return "\n".join(rows)
+
+
+def dump_metrics(path: str) -> None:
+    """Write the exposition text to ``path`` (e.g. for node_exporter's textfile collector)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write(render_metrics())
+    os.replace(tmp_path, path)
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0"):
+    """Serve GET /metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+def configure_from_env() -> None:
+    """METRICS_PORT starts the HTTP endpoint; METRICS_DUMP_PATH writes a file at exit."""
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        start_metrics_server(int(port))
+    dump_path = os.environ.get("METRICS_DUMP_PATH")
+    if dump_path:
+        atexit.register(dump_metrics, dump_path)
@@ -0,0 +1,147 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+
+class RoutingRule(NamedTuple):
+    """A single rule-based route.
+
+    ``all_of`` is a tuple of keyword groups; every group must have at least one
+    hit for the rule to fire. ``none_of`` keywords veto the rule. A keyword
+    ending in ``*`` is a prefix match (``reject*`` matches "rejected"); all other
+    keywords must match whole words.
+    """
+    category: str
+    priority: int
+    all_of: Tuple[Tuple[str, ...], ...]
+    none_of: Tuple[str, ...] = ()
+
+
+# Rules in priority order (lower number wins), mirroring the original elif chain.
+ROUTING_RULES: List[RoutingRule] = [
+    RoutingRule("pos_replace", 1, (("pos",), ("replace*", "update*"))),
+    RoutingRule("general_pricing_queries", 2, (("price", "prices", "pricing", "discount*", "validity"),)),
+    RoutingRule("piggyback_creation", 3, (("piggyback*",), ("create*", "creation", "new"))),
+    RoutingRule("adding_parts_to_piggyback", 4, (("add", "adding", "added"), ("piggyback*",))),
+    RoutingRule("ship_and_debit_queries", 5, (("ship*", "debit*", "s&d", "fsa", "sandd"),), ("claim*",)),
+    RoutingRule("opportunities_rejected_sfdc", 6, (("reject*",), ("sfdc",)), ("incorrect*",)),
+    RoutingRule("pending_approval_sfdc", 7, (("pending approval",), ("sfdc",))),
+    RoutingRule("quote_closed_gpms_no_document", 8, (("closed",), ("gpms",), ("document*",))),
+    RoutingRule("quote_not_reaching_pricing", 9, (("not reach*",), ("pricing",))),
+    RoutingRule("customer_data_enquiries", 10, (("customer data", "data enquiry", "data request"),)),
+    RoutingRule("quotes_pending_review_gpms", 11, (("pending",), ("gpms",))),
+    RoutingRule("opportunities_pending_review_sfdc", 12, (("pending",), ("sfdc",), ("opportunit*",))),
+    RoutingRule("opportunity_rejected_incorrectly_sfdc", 13, (("incorrect*",), ("reject*",))),
+    RoutingRule("loa_related_queries", 14, (("loa", "loas", "letter of authorization"),)),
+    RoutingRule("s_and_d_claim_rejection", 15, (("claim*",), ("s&d", "ship*", "debit*", "reject*"))),
+    RoutingRule("agreement_pn_addition_removal", 16, (("agreement*",), ("part", "parts", "pn", "pns"))),
+    RoutingRule("te_com_issues", 17, (("te.com", "website", "spr", "sprs"),)),
+    RoutingRule("product_enquiry", 18, (("product*",), ("spec*", "detail*", "information", "available"))),
+    RoutingRule("feedback", 19, (("feedback", "suggestion*"),)),
+    RoutingRule("complaint", 20, (("complaint*", "dissatisfied"),)),
+]
+
+
+def _keyword_pattern(keyword: str) -> str:
+    """Translate a rule keyword into a regex fragment anchored at word boundaries."""
+    body = r"\s+".join(re.escape(word) for word in keyword.rstrip("*").split())
+    tail = "" if keyword.endswith("*") else r"(?!\w)"
+    return rf"(?<!\w){body}{tail}"
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """Compile keywords into a single trie-shaped regex.
+
+    Shared prefixes are factored out so the engine dispatches on one character
+    at a time instead of trying every alternative at every word start. Longer
+    continuations are tried before a shorter keyword ends, so phrases such as
+    "pending approval" win over "pending".
+    """
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in " ".join(keyword.rstrip("*").split()):
+            node = node.setdefault(char, {})
+        node[""] = r"" if keyword.endswith("*") else r"(?!\w)"
+
+    def emit(node: Dict) -> str:
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + emit(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if "" in node:
+            branches.append(node[""])
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return r"\b" + emit(trie)
+
+
+class KeywordRouter:
+    """Single-pass, word-boundary-aware keyword router.
+
+    All rule keywords are compiled into one trie-shaped regex at construction
+    time. ``match`` scans the text once and returns every category whose rule is
+    satisfied, together with its keyword hit count.
+    """
+
+    def __init__(self, rules: List[RoutingRule]):
+        self.rules = sorted(rules, key=lambda rule: rule.priority)
+
+        keywords: List[str] = []
+        for rule in self.rules:
+            for group in rule.all_of:
+                keywords.extend(group)
+            keywords.extend(rule.none_of)
+        self.keywords = list(dict.fromkeys(keywords))
+
+        # Map a normalised match back to the keyword that produced it.
+        self._text_to_keyword = {" ".join(k.rstrip("*").split()): k for k in self.keywords}
+        self._pattern = re.compile(_trie_pattern(self.keywords))
+
+        # A phrase match consumes its words, so record which other keywords it
+        # also satisfies (e.g. "pending approval" implies "pending").
+        self._implied: Dict[str, Set[str]] = {}
+        for keyword in self.keywords:
+            text = keyword.rstrip("*")
+            self._implied[keyword] = {
+                other for other in self.keywords
+                if other != keyword and re.search(_keyword_pattern(other), text)
+            }
+
+    def keyword_hits(self, text: str) -> Dict[str, int]:
+        """Count occurrences of every rule keyword in a single scan of ``text``."""
+        hits: Dict[str, int] = {}
+        for match in self._pattern.finditer(text.lower()):
+            matched = match.group()
+            keyword = self._text_to_keyword.get(matched) or self._text_to_keyword[" ".join(matched.split())]
+            hits[keyword] = hits.get(keyword, 0) + 1
+            for implied in self._implied[keyword]:
+                hits[implied] = hits.get(implied, 0) + 1
+        return hits
+
+    def match(self, text: str) -> List[Tuple[str, int]]:
+        """Return ``(category, score)`` for every satisfied rule, in priority order."""
+        hits = self.keyword_hits(text)
+        matches = []
+        for rule in self.rules:
+            if any(keyword in hits for keyword in rule.none_of):
+                continue
+            score = 0
+            for group in rule.all_of:
+                group_hits = sum(hits.get(keyword, 0) for keyword in group)
+                if not group_hits:
+                    break
+                score += group_hits
+            else:
+                matches.append((rule.category, score))
+        return matches
+
+    def route(self, text: str) -> Optional[str]:
+        """Return the highest-priority matching category, or None for a rule miss."""
+        matches = self.match(text)
+        return matches[0][0] if matches else None
+
+
+# Built once at import time and shared by every caller.
+keyword_router = KeywordRouter(ROUTING_RULES)
@@ -0,0 +1,120 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Identifier patterns masked out of the cache key, most specific first.
+ID_MASKS = [
+    (re.compile(r"\bqtid\s*\d+", re.IGNORECASE), "<qtid>"),
+    (re.compile(r"\bopp\s*\d+", re.IGNORECASE), "<opp>"),
+    (re.compile(r"\bloa\s*\d+", re.IGNORECASE), "<loa>"),
+    (re.compile(r"\bagr\s*\d+", re.IGNORECASE), "<agr>"),
+    (re.compile(r"\bpn-\d+", re.IGNORECASE), "<pn>"),
+    (re.compile(r"\bpgb-\d+", re.IGNORECASE), "<pgb>"),
+    (re.compile(r"\b(?:pbk|req|cust|cde|add)\d+", re.IGNORECASE), "<req>"),
+    (re.compile(r"#?\b\d{10}\b"), "<num10>"),
+    (re.compile(r"#?\b\d{9}\b"), "<num9>"),
+]
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Build the cache key: lowercased, whitespace-collapsed, IDs masked."""
+    key = query.lower()
+    for pattern, mask in ID_MASKS:
+        key = pattern.sub(mask, key)
+    return WHITESPACE.sub(" ", key).strip()
+
+
+class RoutingCache:
+    """LRU + TTL cache of routing decisions with an optional SQLite tier.
+
+    The in-memory tier holds at most ``max_size`` entries. When ``db_path`` is
+    given, every decision is also written to SQLite so it survives restarts;
+    memory misses fall through to disk before counting as a miss.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 7 * 24 * 3600,
+                 db_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS routing_cache "
+                "(query_key TEXT PRIMARY KEY, category TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, query: str) -> Optional[str]:
+        """Return the cached category for ``query``, or None on a miss."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT category, created_at FROM routing_cache WHERE query_key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] < self.ttl_seconds:
+                    self._store(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, query: str, category: str) -> None:
+        """Record the routing decision for ``query``."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            self._store(key, category, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO routing_cache (query_key, category, created_at) VALUES (?, ?, ?)",
+                    (key, category, now),
+                )
+                self._db.execute(
+                    "DELETE FROM routing_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+                )
+                self._db.commit()
+
+    def _store(self, key: str, category: str, created_at: float) -> None:
+        self._entries[key] = (category, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Drop every cached decision from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM routing_cache")
+                self._db.commit()
+
+
+# Shared cache configured from the environment; ROUTING_CACHE_PATH enables the SQLite tier.
+routing_cache = RoutingCache(
+    max_size=int(os.environ.get("ROUTING_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.environ.get("ROUTING_CACHE_TTL", str(7 * 24 * 3600))),
+    db_path=os.environ.get("ROUTING_CACHE_PATH"),
+)
@@ -0,0 +1,24 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+# Final routing decisions are appended here (JSON lines) as classifier training data
+ROUTING_LOG_PATH = os.environ.get("ROUTING_LOG_PATH")
+
+_log_lock = threading.Lock()
+
+
+def log_routing_decision(query: str, category: str, source: str) -> None:
+    """Append a final routing decision to ROUTING_LOG_PATH as training data."""
+    if not ROUTING_LOG_PATH:
+        return
+    line = json.dumps({"query": query, "category": category, "source": source, "ts": time.time()})
+    with _log_lock, open(ROUTING_LOG_PATH, "a", encoding="utf-8") as log_file:
+        log_file.write(line + "\n")
+
+
+def read_routing_log(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as log_file:
+        return [json.loads(line) for line in log_file if line.strip()]
@@ -0,0 +1,201 @@
+"""Read-through cache of support-table rows.
+
+Lookups are cached by ``(table, key columns, key values)``: found rows for
+``ttl_seconds``, not-found results for the shorter ``negative_ttl_seconds`` so
+repeated bad IDs stop reaching MySQL without hiding a row for long once it is
+added. The cache is bounded to ``max_size`` entries (least recently used go
+first).
+
+``Database/database.py`` runs in its own process, so it cannot clear this
+cache directly. Instead it records a version per table it (re)loads in a small
+JSON stamp file (``mark_reloaded``); the cache checks the file at most every
+``check_interval`` seconds and drops the entries of every table whose version
+changed. An incremental load also records the key values of the rows it
+inserted, updated or deleted, and only entries for those keys are dropped.
+``invalidate()`` does the same in-process.
+
+``reply_cache`` is a second instance holding rendered replies (see
+``lookup_engine``), keyed like the rows plus the row's version and dropped
+on the same full reloads. Its keys hold ID names rather than key columns, so
+an incremental load's key values cannot select its entries, and it does not
+need them to: a changed row has a new version and so a new key, and replies
+to the old version are never read again and age out with the TTL.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from metrics import REPLY_CACHE_LOOKUPS, ROW_CACHE_LOOKUPS, Counter
+
+# Default stamp file shared with the loader (Main/Database/.table_versions.json)
+STAMP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Database", ".table_versions.json")
+
+# Returned by ``get`` when the key is not cached (``None`` is a cached not-found)
+MISS = object()
+
+# (table, key columns, key values); reply_cache keys append more fields
+RowKey = Tuple[str, Tuple[str, ...], tuple]
+
+
+def match_key(values: Iterable[Any]) -> tuple:
+    """Normalise key values the way MySQL compares them: case-insensitively, numerically for BIGINT IDs."""
+    key = []
+    for value in values:
+        value = str(value).strip().upper()
+        key.append((value.lstrip("0") or "0") if value.isdigit() else value)
+    return tuple(key)
+
+
+def _read_versions(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def mark_reloaded(tables: Iterable[str], path: Optional[str] = None,
+                  changes: Optional[Dict[str, Dict[str, List[Any]]]] = None) -> None:
+    """Record a new version for each reloaded table (called by the loader).
+
+    ``changes`` maps a table to ``{key column: changed values}``; tables
+    without an entry are treated as entirely replaced.
+    """
+    path = path or os.environ.get("ROW_CACHE_STAMP", STAMP_PATH)
+    changes = changes or {}
+    versions = _read_versions(path)
+    for table in tables:
+        keys = changes.get(table)
+        versions[table] = {"version": uuid.uuid4().hex,
+                           "keys": {column: [str(value) for value in values] for column, values in keys.items()}
+                           if keys is not None else None}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(versions, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class RowCache:
+    """LRU + TTL cache of lookup rows with negative caching and reload invalidation."""
+
+    def __init__(self, max_size: int = 50000, ttl_seconds: float = 900, negative_ttl_seconds: float = 60,
+                 stamp_path: Optional[str] = None, check_interval: float = 1.0, name: str = "Row cache",
+                 lookups: Counter = ROW_CACHE_LOOKUPS, versioned: bool = False):
+        self.name = name
+        self.lookups = lookups
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.stamp_path = stamp_path
+        self.check_interval = check_interval
+        # Keys include the row version, so changed key values need not be dropped
+        self.versioned = versioned
+        self._entries: "OrderedDict[RowKey, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._stamp_mtime = None
+        self._versions: Dict[str, Any] = _read_versions(stamp_path) if stamp_path else {}
+        self.stats: Dict[str, int] = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0,
+                                      "invalidations": 0}
+
+    def get(self, key: RowKey) -> Any:
+        """Cached row for ``key``, ``None`` for a cached not-found, or ``MISS``."""
+        if self.max_size <= 0:
+            return MISS
+        now = time.monotonic()
+        if self.stamp_path and now >= self._next_check:
+            self._check_stamp(now)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now < entry[1]:
+                self._entries.move_to_end(key)
+                result = "hits" if entry[0] is not None else "negative_hits"
+                self.stats[result] += 1
+            else:
+                if entry:
+                    del self._entries[key]
+                result = "misses"
+                self.stats[result] += 1
+        self.lookups.inc(result=result, table=key[0])
+        return MISS if result == "misses" else entry[0]
+
+    def put(self, key: RowKey, row: Optional[Dict[str, Any]]) -> None:
+        """Cache ``row`` (``None`` for not found) under ``key``; rows must not be mutated afterwards."""
+        ttl = self.ttl_seconds if row is not None else self.negative_ttl_seconds
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (row, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        """Drop the cached rows of ``table``, or of every table."""
+        with self._lock:
+            if table is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == table]:
+                    del self._entries[key]
+            self.stats["invalidations"] += 1
+
+    def invalidate_keys(self, table: str, keys: Dict[str, Iterable[Any]]) -> None:
+        """Drop the cached rows of ``table`` looked up by any of the given key column values."""
+        changed = {column: {match_key((value,)) for value in values} for column, values in keys.items()}
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == table and any(
+                match_key((value,)) in changed.get(column, ()) for column, value in zip(key[1], key[2]))]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += 1
+
+    def _check_stamp(self, now: float) -> None:
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.stat(self.stamp_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._stamp_mtime:
+            return
+        self._stamp_mtime = mtime
+        versions = _read_versions(self.stamp_path)
+        changed = {table for table in set(versions) | set(self._versions)
+                   if versions.get(table) != self._versions.get(table)}
+        self._versions = versions
+        for table in changed:
+            entry = versions.get(table)
+            keys = entry.get("keys") if isinstance(entry, dict) else None
+            if keys is None:
+                print(f"🗃️ {self.name}: {table} was reloaded, dropping its entries")
+                self.invalidate(table)
+            elif not self.versioned:
+                print(f"🗃️ {self.name}: {table} changed, dropping entries for "
+                      f"{sum(len(values) for values in keys.values())} key values")
+                self.invalidate_keys(table, keys)
+
+
+# Shared cache configured from the environment; ROW_CACHE_SIZE=0 disables it.
+row_cache = RowCache(
+    max_size=int(os.environ.get("ROW_CACHE_SIZE", "50000")),
+    ttl_seconds=float(os.environ.get("ROW_CACHE_TTL", "900")),
+    negative_ttl_seconds=float(os.environ.get("ROW_CACHE_NEGATIVE_TTL", "60")),
+    stamp_path=os.environ.get("ROW_CACHE_STAMP", STAMP_PATH),
+)
+
+# Rendered replies; REPLY_CACHE_SIZE=0 disables it. Entries are keyed by row
+# version, so the TTL only bounds how long unused replies are kept.
+reply_cache = RowCache(
+    max_size=int(os.environ.get("REPLY_CACHE_SIZE", "20000")),
+    ttl_seconds=float(os.environ.get("REPLY_CACHE_TTL", "3600")),
+    negative_ttl_seconds=0,
+    stamp_path=os.environ.get("ROW_CACHE_STAMP", STAMP_PATH),
+    name="Reply cache",
+    lookups=REPLY_CACHE_LOOKUPS,
+    versioned=True,
+)
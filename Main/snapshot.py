@@ -0,0 +1,282 @@
+"""Columnar, memory-mapped snapshots of the support tables.
+
+The support tables are read-mostly reference data, so ``Database/database.py
+--backend snapshot`` can export them as NumPy arrays: one array per column
+(text as a single UTF-8 buffer plus row offsets) and, per lookup key, the
+64-bit hashes of the key values sorted, with the row each belongs to. The
+service maps the files read-only (``np.load(mmap_mode="r")``), so a lookup is
+a binary search and a few slices with no database connection, and every
+worker process shares the same pages through the OS page cache.
+
+Each export is written to a new directory under ``versions/``; ``CURRENT``
+names the live one and is replaced atomically once the version is complete.
+Readers check ``CURRENT`` at most every ``check_interval`` seconds and switch
+tables over between lookups. The previous version is kept on disk for
+readers that have not switched yet.
+"""
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from metrics import SNAPSHOT_LOOKUPS
+from row_cache import MISS, RowKey, match_key
+
+# Default snapshot root (Main/Database/snapshot)
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Database", "snapshot")
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+# Array typecodes of the numeric column kinds; everything else is "text"
+KIND_TYPECODES = {"int": "q", "uint": "Q", "float": "d"}
+
+
+def key_hash(values: Iterable[Any]) -> int:
+    """Stable 64-bit hash of key values, equal for values MySQL would compare equal (see ``match_key``)."""
+    return _hash_key(match_key(values))
+
+
+def _hash_key(key: tuple) -> int:
+    digest = hashlib.blake2b("\x1f".join(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class _ColumnBuilder:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.nulls = bytearray()
+        if kind == "text":
+            self.values = bytearray()
+            self.offsets = array("q", [0])
+        else:
+            self.values = array(KIND_TYPECODES[kind])
+
+    def append(self, value: Any) -> None:
+        if self.kind == "text":
+            if value is not None:
+                self.values += str(value).encode("utf-8")
+            self.offsets.append(len(self.values))
+        else:
+            self.values.append(0 if value is None else value)
+        self.nulls.append(value is None)
+
+    def truncate(self, rows: int) -> None:
+        """Drop a partly appended row."""
+        del self.nulls[rows:]
+        if self.kind == "text":
+            del self.offsets[rows + 1:]
+            del self.values[self.offsets[-1]:]
+        else:
+            del self.values[rows:]
+
+    def save(self, prefix: str) -> bool:
+        """Write the column's arrays; returns whether it has NULLs (and so a nulls file)."""
+        import numpy as np
+
+        if self.kind == "text":
+            np.save(f"{prefix}.data.npy", np.frombuffer(self.values, dtype=np.uint8))
+            np.save(f"{prefix}.offsets.npy", np.frombuffer(self.offsets, dtype=np.int64))
+        else:
+            np.save(f"{prefix}.values.npy", np.frombuffer(self.values, dtype=self.values.typecode))
+        nullable = any(self.nulls)
+        if nullable:
+            np.save(f"{prefix}.nulls.npy", np.frombuffer(self.nulls, dtype=np.bool_))
+        return nullable
+
+
+class SnapshotWriter:
+    """Writes a new snapshot version; readers only see it after ``publish``."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.environ.get("SNAPSHOT_DIR") or SNAPSHOT_DIR
+        self.version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.directory = os.path.join(self.root, "versions", self.version)
+        os.makedirs(self.directory)
+        self.tables: Dict[str, Any] = {}
+
+    def add_table(self, table: str, columns: Sequence[str], kinds: Sequence[str], rows: Iterable[tuple],
+                  keys: Sequence[Tuple[str, ...]]) -> Tuple[int, int]:
+        """Write one table and an index per key column tuple; returns ``(rows written, rows failed)``.
+
+        A row whose value does not fit its column (e.g. an integer out of
+        range) is skipped, like the INSERT of that row would fail.
+        """
+        builders = [_ColumnBuilder(kind) for kind in kinds]
+        positions = [[columns.index(column) for column in key] for key in keys]
+        hashes = [(array("q"), array("q")) for _ in keys]
+        written = failed = 0
+        for row in rows:
+            try:
+                for builder, value in zip(builders, row):
+                    builder.append(value)
+            except (TypeError, ValueError, OverflowError):
+                for builder in builders:
+                    builder.truncate(written)
+                failed += 1
+                continue
+            for key_positions, (key_hashes, key_rows) in zip(positions, hashes):
+                values = [row[i] for i in key_positions]
+                if None not in values:
+                    key_hashes.append(key_hash(values))
+                    key_rows.append(written)
+            written += 1
+
+        import numpy as np
+
+        directory = os.path.join(self.directory, table)
+        os.makedirs(directory)
+        nullable = [builder.save(os.path.join(directory, str(i))) for i, builder in enumerate(builders)]
+        for i, (key_hashes, key_rows) in enumerate(hashes):
+            key_hashes = np.frombuffer(key_hashes, dtype=np.int64)
+            # Stable, so rows sharing a key stay in sheet order and the first one wins, like LIMIT 1
+            order = np.argsort(key_hashes, kind="stable")
+            np.save(os.path.join(directory, f"key{i}.hash.npy"), key_hashes[order])
+            np.save(os.path.join(directory, f"key{i}.row.npy"), np.frombuffer(key_rows, dtype=np.int64)[order])
+        self.tables[table] = {"rows": written, "columns": [list(column) for column in zip(columns, kinds, nullable)],
+                              "keys": [list(key) for key in keys]}
+        return written, failed
+
+    def publish(self, keep: int = 2) -> None:
+        """Make this version current, then delete all but the newest ``keep`` versions."""
+        with open(os.path.join(self.directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "tables": self.tables}, f, indent=2)
+        tmp_path = os.path.join(self.root, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.version)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+
+        versions_dir = os.path.join(self.root, "versions")
+        for version in sorted(os.listdir(versions_dir))[:-keep]:
+            if version != self.version:
+                shutil.rmtree(os.path.join(versions_dir, version), ignore_errors=True)
+
+
+def _mapped(path: str) -> memoryview:
+    # A memoryview over the mapping: indexing it returns Python ints/floats/bools without NumPy scalars.
+    # NumPy is imported on the first snapshot opened, so a service without snapshots never loads it.
+    import numpy as np
+
+    return memoryview(np.load(path, mmap_mode="r").view(np.ndarray))
+
+
+class TableSnapshot:
+    """One table of a snapshot version, memory-mapped."""
+
+    def __init__(self, directory: str, entry: Dict[str, Any]):
+        self.rows = entry["rows"]
+        self.columns: List[Tuple[str, Any, Any, Any]] = []
+        for i, (name, kind, nullable) in enumerate(entry["columns"]):
+            prefix = os.path.join(directory, str(i))
+            if kind == "text":
+                values, offsets = _mapped(f"{prefix}.data.npy"), _mapped(f"{prefix}.offsets.npy")
+            else:
+                values, offsets = _mapped(f"{prefix}.values.npy"), None
+            self.columns.append((name, values, offsets, _mapped(f"{prefix}.nulls.npy") if nullable else None))
+        names = [column[0] for column in self.columns]
+        self.indexes = {
+            tuple(key): (_mapped(os.path.join(directory, f"key{i}.hash.npy")),
+                         _mapped(os.path.join(directory, f"key{i}.row.npy")),
+                         [names.index(column) for column in key])
+            for i, key in enumerate(entry["keys"])
+        }
+
+    def value(self, column: int, row: int) -> Any:
+        name, values, offsets, nulls = self.columns[column]
+        if nulls is not None and nulls[row]:
+            return None
+        if offsets is not None:
+            return str(values[offsets[row]:offsets[row + 1]], "utf-8")
+        return values[row]
+
+    def row(self, row: int) -> Dict[str, Any]:
+        # value() inlined: this runs for every column of every row served
+        result = {}
+        for name, values, offsets, nulls in self.columns:
+            if nulls is not None and nulls[row]:
+                result[name] = None
+            elif offsets is not None:
+                result[name] = str(values[offsets[row]:offsets[row + 1]], "utf-8")
+            else:
+                result[name] = values[row]
+        return result
+
+    def find(self, key_columns: Tuple[str, ...], params: tuple) -> Any:
+        """First row whose key columns match ``params``, ``None`` if there is none, ``MISS`` if not indexed."""
+        index = self.indexes.get(key_columns)
+        if index is None:
+            return MISS
+        hashes, rows, positions = index
+        wanted = match_key(params)
+        target = _hash_key(wanted)
+        i = bisect.bisect_left(hashes, target)
+        while i < len(hashes) and hashes[i] == target:
+            row = rows[i]
+            if match_key([self.value(position, row) for position in positions]) == wanted:
+                return self.row(row)
+            i += 1
+        return None
+
+
+def load_version(root: str, version: str) -> Dict[str, TableSnapshot]:
+    directory = os.path.join(root, "versions", version)
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    return {table: TableSnapshot(os.path.join(directory, table), entry)
+            for table, entry in manifest["tables"].items()}
+
+
+class SnapshotStore:
+    """Serves lookups from the current snapshot version under ``root``; disabled when ``root`` is None."""
+
+    def __init__(self, root: Optional[str] = None, check_interval: float = 1.0):
+        self.root = root
+        self.check_interval = check_interval
+        self.version: Optional[str] = None
+        self._tables: Dict[str, TableSnapshot] = {}
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+
+    def get(self, key: RowKey) -> Any:
+        """Row for ``key``, ``None`` if the snapshot has no such row, or ``MISS`` if it does not hold the table."""
+        if self.root is None:
+            return MISS
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._check_current(now)
+        table = self._tables.get(key[0])
+        if table is None:
+            return MISS
+        result = table.find(key[1], key[2])
+        if result is not MISS:
+            SNAPSHOT_LOOKUPS.inc(result="found" if result is not None else "not_found", table=key[0])
+        return result
+
+    def _check_current(self, now: float) -> None:
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            try:
+                with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                    version = f.read().strip()
+            except OSError:
+                version = None
+            if version == self.version:
+                return
+            try:
+                tables = load_version(self.root, version) if version else {}
+            except (OSError, ValueError, KeyError) as err:
+                print(f"🗃️ Snapshot: could not open version {version}: {err}")
+                return
+            # One assignment: lookups see either the old tables or the new ones
+            self._tables, self.version = tables, version
+            print(f"🗃️ Snapshot: serving version {version} ({len(tables)} tables)")
+
+
+# Shared store; set SNAPSHOT_DIR to serve lookups from the snapshot written there.
+snapshot_store = SnapshotStore(os.environ.get("SNAPSHOT_DIR") or None)
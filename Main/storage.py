@@ -0,0 +1,148 @@
+"""Storage backends the lookups read support-table rows from.
+
+``MySQLStorage`` is the pooled MySQL server (``db_pool``). ``SQLiteStorage``
+reads the same tables from an embedded SQLite file written by
+``Database/database.py --backend sqlite``, so a single-node deployment skips
+the network round trip and a load test needs no server.
+
+Both hand out connections with ``connection()`` and dictionary cursors whose
+SQL uses MySQL-style ``%s`` placeholders and backtick identifiers, so
+``lookup_engine`` builds its queries once for either. The backend is picked
+with ``STORAGE_BACKEND`` (``mysql`` or ``sqlite``; ``SQLITE_PATH`` for the file).
+"""
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+import mysql.connector
+
+from db_pool import ConnectionPool, DatabaseUnavailable, db_pool, prepared_cursor
+
+# Default SQLite file, next to the workbook the loader reads
+SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Database", "TE_Email_Custom_Database.sqlite3")
+
+
+class Storage(ABC):
+    """Interface of a lookup backend; a backend missing a method cannot be created."""
+
+    name = ""
+    # Exceptions a lookup may raise besides DatabaseUnavailable
+    errors: Tuple[type, ...] = ()
+
+    @abstractmethod
+    def connection(self):
+        """Context manager yielding a connection; raises DatabaseUnavailable when there is none."""
+
+    @abstractmethod
+    def lookup_cursor(self, connection, query_sql: str):
+        """Dictionary cursor for a single-row lookup run many times (prepared where the backend can)."""
+
+    @abstractmethod
+    def cursor(self, connection):
+        """Dictionary cursor for one-off queries such as a batch IN(); the caller closes it."""
+
+
+class MySQLStorage(Storage):
+    """The MySQL server, through a connection pool and server-side prepared statements."""
+
+    name = "mysql"
+    errors = (mysql.connector.Error,)
+
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self.pool = pool or db_pool
+
+    def connection(self):
+        return self.pool.connection()
+
+    def lookup_cursor(self, connection, query_sql: str):
+        return prepared_cursor(connection, query_sql)
+
+    def cursor(self, connection):
+        return connection.cursor(dictionary=True)
+
+
+def _dict_row(cursor, row) -> Dict[str, Any]:
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    """sqlite3 cursor taking the ``%s`` placeholders of the MySQL queries."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._cursor = connection.cursor()
+
+    def execute(self, query_sql: str, params=()):
+        self._cursor.execute(query_sql.replace("%s", "?"), params)
+
+    def executemany(self, query_sql: str, rows):
+        self._cursor.executemany(query_sql.replace("%s", "?"), rows)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteStorage(Storage):
+    """A read-only SQLite file, one connection per thread.
+
+    The loader replaces the file atomically, so each checkout compares the
+    file's inode and mtime with the ones the thread's connection was opened
+    on and reopens it after a reload.
+    """
+
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _open(self, identity) -> sqlite3.Connection:
+        try:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False,
+                                         cached_statements=256)
+        except sqlite3.Error as err:
+            print(f" Database Error: {err}")
+            raise DatabaseUnavailable(f"{self.path}: {err}") from err
+        connection.row_factory = _dict_row
+        self._local.connection, self._local.identity = connection, identity
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError as err:
+            raise DatabaseUnavailable(f"{self.path}: {err.strerror}") from err
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.identity != identity:
+            if connection is not None:
+                connection.close()
+            connection = self._open(identity)
+        yield connection
+
+    def lookup_cursor(self, connection, query_sql: str):
+        # sqlite3 caches the compiled statement per connection (cached_statements)
+        return SQLiteCursor(connection)
+
+    def cursor(self, connection):
+        return SQLiteCursor(connection)
+
+
+def storage_from_env() -> Storage:
+    backend = os.environ.get("STORAGE_BACKEND", "mysql").lower()
+    if backend == "sqlite":
+        return SQLiteStorage(os.environ.get("SQLITE_PATH", SQLITE_PATH))
+    if backend != "mysql":
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected 'mysql' or 'sqlite')")
+    return MySQLStorage()
+
+
+# Shared by every lookup helper
+storage = storage_from_env()
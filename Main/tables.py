@@ -0,0 +1,36 @@
+"""Lookup keys of the support tables, shared by the reply service and the loader.
+
+Each table's lookups are tried in order: ``helper_functions`` looks a row up
+by the first key and falls back to the others, and ``Database/database.py``
+makes the first key the table's primary key (when its values are unique) and
+indexes the others. This module has no dependencies, so the offline loader
+reads the keys without importing the service's handlers.
+"""
+from typing import NamedTuple, Tuple
+
+
+class Lookup(NamedTuple):
+    """Key columns matched against the extracted IDs (same names when ``ids`` is empty)."""
+    columns: Tuple[str, ...]
+    ids: Tuple[str, ...] = ()
+
+
+TABLE_LOOKUPS = {
+    "01_pos_replacemnt": (Lookup(("quote_id",)),),
+    "02_general_pricing_queries": (Lookup(("quote_id",)),),
+    "03_piggyback_creation_queries": (Lookup(("request_id",)),),
+    "04_adding_parts_pos_queries": (Lookup(("pgb-4023", "add88632"), ("piggyback_id", "add_id")),),
+    "05_ship_debit_queries": (Lookup(("quote_id",)),),
+    "06_sfdc_rejection_queries": (Lookup(("opportunity_id",)),),
+    "07_sfdc_pendingapproval_queries": (Lookup(("opportunity_id",)),),
+    "08_cases_where_gpms": (Lookup(("quote_id",)),),
+    "09_gpms_sfdc": (Lookup(("quote_id",)),),
+    "10_customer_data_enquiries": (Lookup(("request_id",)),),
+    "11_gpms_pending_quotes_queries": (Lookup(("quote_id",)),),
+    "12_sfdc_pending_opp_queries": (Lookup(("opportunity_id",)),),
+    "13_reply_to_requestor": (Lookup(("opportunity_id",)),),
+    "14_loa_queries": (Lookup(("loa_request_id",)),),
+    "15_s_d_claim_rejection": (Lookup(("claim_id",)), Lookup(("quote_id",))),
+    "16_agreement_pn_addition": (Lookup(("agreement_id",)), Lookup(("part_number",))),
+    "17_te_com_issues_queries": (Lookup(("issue_id",)), Lookup(("part_number",))),
+}
@@ -0,0 +1,137 @@
+"""Reply templates, compiled once when the category specs are defined.
+
+Each template string is split with ``string.Formatter`` into its literal text
+and named placeholders, so a reply is one pass filling a copy of that list and
+a ``"".join`` instead of re-parsing the template with ``str.format`` for
+every email. ``{date}`` always renders today's date, which is formatted once
+and reused until midnight, as is the dated header replies open with.
+
+``TEMPLATES`` holds the compiled templates of every category: the reply, the
+variant reply (e.g. closed by BUPA), the not-found reply, and the reply and
+variant as sections of a combined multi-ID reply.
+"""
+import string
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+DATE_FORMAT = "%B %d, %Y"
+SIGNATURE = "**Best Regards,**  \nTE Connectivity Support Team"
+REPLY_HEADER = "📅 **Date:** {date}\n\n"
+SECTION_SEPARATOR = "\n\n---\n\n"
+
+
+def reply_template(body: str) -> str:
+    """Wrap a template body with the dated header and signature every reply carries."""
+    return REPLY_HEADER + body + "\n\n" + SIGNATURE
+
+
+def not_found_template(title: str, reasons: Tuple[str, ...], advice: str) -> str:
+    """The "No information found" reply shared by most categories."""
+    reason_lines = "\n".join(f"- {reason}" for reason in reasons)
+    return (f"\n📅 **Date:** {{date}}\n\n**{title}**\n\nPossible reasons:\n{reason_lines}\n\n"
+            f"{advice}\n\n{SIGNATURE}\n")
+
+
+def section_template(template: str) -> str:
+    """A ``reply_template`` reply without its header and signature, for one section of a combined reply."""
+    if template.startswith(REPLY_HEADER):
+        template = template[len(REPLY_HEADER):]
+    if template.endswith(SIGNATURE):
+        template = template[:-len(SIGNATURE)]
+    return template.strip("\n")
+
+
+class DailyText:
+    """``datetime.now().strftime(fmt)`` for the current day, recomputed after midnight."""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self._text = ""
+        self._expires = 0.0
+
+    def __call__(self) -> str:
+        if time.time() >= self._expires:
+            now = datetime.now()
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            self._text = now.strftime(self.fmt)
+            self._expires = midnight.timestamp()
+        return self._text
+
+
+today = DailyText(DATE_FORMAT)
+reply_header = DailyText(REPLY_HEADER.replace("{date}", DATE_FORMAT))
+
+
+class Template:
+    """A ``str.format`` template of named placeholders (no ``.attr``/``[key]``/``!r``), pre-split for rendering.
+
+    A template opening with the reply header (after blank lines) is kept as
+    that header and a body, so the body can be rendered (and cached) once
+    and dated with ``with_header`` whenever it is sent.
+    """
+
+    __slots__ = ("text", "lead", "dated", "parts", "slots", "body_dated")
+
+    def __init__(self, text: str):
+        self.text = text
+        body = text.lstrip("\n")
+        self.dated = body.startswith(REPLY_HEADER)
+        if self.dated:
+            self.lead = text[:len(text) - len(body)]
+            body = body[len(REPLY_HEADER):]
+        else:
+            self.lead, body = "", text
+        parts: List[str] = []
+        slots: List[Tuple[int, str, str]] = []
+        for literal, name, spec, conversion in string.Formatter().parse(body):
+            if literal:
+                parts.append(literal)
+            if name is not None:
+                if conversion or not name or name.isdigit() or "." in name or "[" in name:
+                    raise ValueError(f"Unsupported placeholder {{{name}}} in template: {text[:60]!r}")
+                slots.append((len(parts), name, spec))
+                parts.append("")
+        self.parts = parts
+        self.slots = tuple(slots)
+        # Whether the body itself shows the date (and so is only valid today)
+        self.body_dated = any(name == "date" for _, name, _ in slots)
+
+    def render_body(self, values: Mapping[str, Any]) -> str:
+        """The template after its header, filled from ``values`` (``date`` comes from the daily cache)."""
+        parts = self.parts.copy()
+        for i, name, spec in self.slots:
+            value = today() if name == "date" else values[name]
+            parts[i] = value if value.__class__ is str and not spec else format(value, spec)
+        return "".join(parts)
+
+    def with_header(self, body: str) -> str:
+        """A rendered body with today's header in front, when the template has one."""
+        return self.lead + reply_header() + body if self.dated else body
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        return self.with_header(self.render_body(values))
+
+
+class CategoryTemplates(NamedTuple):
+    reply: Template
+    not_found: Template
+    section: Template
+    variant: Optional[Template] = None
+    variant_section: Optional[Template] = None
+
+
+# Compiled templates per category, filled as the specs are defined
+TEMPLATES: Dict[str, CategoryTemplates] = {}
+
+
+def register(category: str, reply: str, not_found: str, variant: Optional[str] = None) -> CategoryTemplates:
+    """Compile a category's templates into ``TEMPLATES``."""
+    templates = TEMPLATES[category] = CategoryTemplates(
+        reply=Template(reply),
+        not_found=Template(not_found),
+        section=Template(section_template(reply)),
+        variant=Template(variant) if variant is not None else None,
+        variant_section=Template(section_template(variant)) if variant is not None else None,
+    )
+    return templates
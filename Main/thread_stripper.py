@@ -0,0 +1,165 @@
+"""Strip quoted history, signatures and disclaimers from an email before routing.
+
+Replies arrive with the whole thread below the new message: Gmail-style
+``On <date>, <name> wrote:`` attributions, ``>``-quoted lines, Outlook
+``-----Original Message-----`` / ``From:`` ``Sent:`` ``To:`` ``Subject:``
+header blocks, signatures and legal disclaimers. None of it is the question,
+yet every router, classifier, ID search and LLM prompt paid for it (and old
+IDs in the history could be picked up as the one being asked about).
+
+``strip_lines`` reads an email line by line and stops at the first line of
+quoted history, so the rest of the thread is never scanned; it only looks a
+few lines ahead to confirm a header block, a wrapped attribution or a
+sign-off. ``>``-quoted lines between new lines (inline answers) are dropped
+and the new lines kept. Forwarded messages are not history, since the
+forwarded text is usually what is being asked about, and are kept.
+
+A line holding an ID (any ``entities.ENTITY_PATTERNS`` match) is never taken
+for a header or a signature: after a sign-off, ``-- `` or a disclaimer only
+the lines without IDs are dropped, so "Thanks,\nQuote ID: QTID5" keeps its ID.
+
+``strip_thread`` returns a ``StrippedEmail`` with the new content as ``text``
+and the untouched email as ``original``; ``without_history()`` is the email
+with only the quoted history removed (signatures kept), for callers that
+find no ID in ``text``. An email with nothing left after stripping keeps its
+original text.
+"""
+import io
+import re
+from collections import deque
+from typing import Iterable, Iterator, List, NamedTuple
+
+from entities import BARE_QUOTE_NUMBER, ENTITY_PATTERNS, OPPORTUNITY_NUMBER, QUOTE_NUMBER
+
+# Single-line markers of the start of the quoted history
+ATTRIBUTION = re.compile(r"^\s*On\s.+\bwrote:\s*$", re.IGNORECASE)      # On Mon, 1 Jan 2024, Jane <j@x.com> wrote:
+ORIGINAL_MESSAGE = re.compile(r"^\s*-{2,}\s*Original Message\s*-{2,}\s*$", re.IGNORECASE)
+# Markers confirmed by the lines after them
+ATTRIBUTION_START = re.compile(r"^\s*On\s.*\d", re.IGNORECASE)           # an attribution wrapped before "wrote:"
+WROTE = re.compile(r"\bwrote:\s*$", re.IGNORECASE)
+HEADER_FROM = re.compile(r"^\s*\*?From:\*?\s", re.IGNORECASE)
+# Outlook and forwarded headers always carry the sent date; To:/Subject: lines alone are too common in a body
+HEADER_SENT = re.compile(r"^\s*\*?(?:Sent|Date):\*?\s", re.IGNORECASE)
+OUTLOOK_RULE = re.compile(r"^\s*_{10,}\s*$")
+QUOTED = re.compile(r"^\s*>")
+# The header block after these belongs to the forwarded message, which is kept
+FORWARDED = re.compile(r"^\s*(?:-{2,}\s*Forwarded message\s*-{2,}|Begin forwarded message:)\s*$", re.IGNORECASE)
+# Lines without IDs after these are signature or disclaimer
+SIGNATURE_DELIMITER = re.compile(r"^--\s*$")
+MOBILE_SIGNATURE = re.compile(r"^\s*Sent from my\s", re.IGNORECASE)
+DISCLAIMER = re.compile(r"^\s*(?:confidentiality notice|disclaimer\b|this (?:e-?mail|message)\b.*"
+                        r"\b(?:confidential|privileged|intended (?:solely|only)))", re.IGNORECASE)
+# A sign-off is only a signature when a few short lines (name, title, phone) end the new content
+SIGN_OFF = re.compile(r"^\s*(?:(?:best|kind|warm|warmest|many)\s+)?(?:regards|wishes|thanks|thank you|cheers|"
+                      r"sincerely|best|br)(?:\s*(?:and|&)\s*regards)?\s*[,.!]?\s*$", re.IGNORECASE)
+SIGNATURE_LINES = 6
+SIGNATURE_WORDS = 8
+SENTENCE_END = re.compile(r"[.?!:]\s*$")
+# How far a From: line looks for the rest of its header block
+HEADER_LOOKAHEAD = 4
+# Whether a line holds any ID: the quote and opportunity number kinds all need a run of 9 digits,
+# and one search for that is cheaper than their three patterns tried at every position
+ID_CHECKS = [pattern for kind, pattern in ENTITY_PATTERNS.items()
+             if kind not in (QUOTE_NUMBER, OPPORTUNITY_NUMBER, BARE_QUOTE_NUMBER)] + [re.compile(r"\d{9}")]
+
+
+class StrippedEmail(NamedTuple):
+    text: str          # the new content, passed downstream
+    original: str      # the email as received
+
+    @property
+    def stripped(self) -> bool:
+        return self.text is not self.original
+
+    def without_history(self) -> str:
+        """The original email up to its quoted history, signatures and disclaimers included."""
+        if not self.stripped:
+            return self.original
+        return "".join(strip_lines(io.StringIO(self.original), signatures=False)).strip() or self.original
+
+
+class _Lookahead:
+    """A line iterator that can peek a few lines ahead without consuming them."""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._ahead = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return self._ahead.popleft() if self._ahead else next(self._lines)
+
+    def peek(self, count: int) -> List[str]:
+        """Up to ``count`` next lines (fewer at the end of the email)."""
+        while len(self._ahead) < count:
+            try:
+                self._ahead.append(next(self._lines))
+            except StopIteration:
+                break
+        return list(self._ahead)[:count]
+
+
+def _has_entity(line: str) -> bool:
+    return any(pattern.search(line) for pattern in ID_CHECKS)
+
+
+def _history_starts(line: str, lines: _Lookahead) -> bool:
+    if ATTRIBUTION.match(line) or ORIGINAL_MESSAGE.match(line):
+        starts = True
+    elif ATTRIBUTION_START.match(line):
+        starts = any(WROTE.search(ahead) for ahead in lines.peek(1))
+    elif HEADER_FROM.match(line):
+        starts = any(HEADER_SENT.match(ahead) and not _has_entity(ahead) for ahead in lines.peek(HEADER_LOOKAHEAD))
+    elif OUTLOOK_RULE.match(line):
+        starts = any(HEADER_FROM.match(ahead) for ahead in lines.peek(2))
+    else:
+        return False
+    return starts and not _has_entity(line)
+
+
+def _signature_follows(lines: _Lookahead) -> bool:
+    """Whether the lines after a sign-off are a short signature ending the new content."""
+    ahead = lines.peek(SIGNATURE_LINES + 1)
+    for count, line in enumerate(ahead):
+        if (QUOTED.match(line) or ATTRIBUTION.match(line) or ORIGINAL_MESSAGE.match(line)
+                or HEADER_FROM.match(line) or OUTLOOK_RULE.match(line) or DISCLAIMER.match(line)):
+            return True
+        # A sentence after "Thanks!" is more of the message, not a name or title
+        if count == SIGNATURE_LINES or len(line.split()) > SIGNATURE_WORDS or SENTENCE_END.search(line):
+            return False
+    return True
+
+
+def strip_lines(lines: Iterable[str], signatures: bool = True) -> Iterator[str]:
+    """The lines of new content, stopping at the quoted history (the rest of ``lines`` is not read).
+
+    With ``signatures`` off only the quoted history is removed.
+    """
+    lines = _Lookahead(lines)
+    content = forwarded = signature = False
+    for line in lines:
+        if forwarded and HEADER_FROM.match(line):
+            forwarded = False
+        elif _history_starts(line, lines):
+            return
+        forwarded = forwarded or bool(FORWARDED.match(line))
+        if QUOTED.match(line):
+            continue
+        if signatures and not signature:
+            signature = bool(SIGNATURE_DELIMITER.match(line) or MOBILE_SIGNATURE.match(line)
+                             or DISCLAIMER.match(line)
+                             or content and SIGN_OFF.match(line) and _signature_follows(lines))
+        if signature and (not line.strip() or not _has_entity(line)):
+            continue
+        content = content or bool(line.strip())
+        yield line
+
+
+def strip_thread(email: str) -> StrippedEmail:
+    """The email's new content, with the original kept alongside."""
+    text = "".join(strip_lines(io.StringIO(email)))
+    if len(text) == len(email):
+        return StrippedEmail(email, email)
+    return StrippedEmail(text.strip() or email, email)